@@ -1,23 +1,400 @@
+import asyncio
 import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from app.config import Config
 from app.platforms.bybit_client import BybitClient
 from app.platforms.okx_client import OkxClient
 from app.platforms.tbank_client import TBankClient
 from app.platforms.ibkr_client import IBKRClient
+from app.platforms.price_oracle import get_price_oracle
+from app.platforms.crypto_streams import BybitWalletStream, OkxAccountStream
+from app.utils import metrics, perf, profiling, tracing
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.rate_limiter import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
+_PLATFORM_SECONDS = metrics.histogram(
+    "portfolio_platform_fetch_seconds",
+    "Duration of one platform's fetch, including retries and fallbacks",
+    ("platform",),
+)
+_PLATFORM_FETCHES = metrics.counter(
+    "portfolio_platform_fetches_total",
+    "Platform fetches by outcome (ok, error, circuit_open, rate_limited)",
+    ("platform", "outcome"),
+)
+_SNAPSHOT_SECONDS = metrics.histogram(
+    "portfolio_snapshot_seconds",
+    "Duration of a full portfolio summary across all platforms",
+)
+
+_account_pool: ThreadPoolExecutor | None = None
+_account_pool_lock = threading.Lock()
+
+
+def _get_account_pool() -> ThreadPoolExecutor:
+    """Bounded pool for per-account requests, shared by all aggregators."""
+    global _account_pool
+    with _account_pool_lock:
+        if _account_pool is None:
+            _account_pool = ThreadPoolExecutor(
+                max_workers=Config.ACCOUNT_FETCH_WORKERS, thread_name_prefix="account"
+            )
+        return _account_pool
+
+
+def fx_outline(fx: dict | None, now: datetime) -> str:
+    """USD/RUB rate, where it came from and how old it is, e.g. '92.50 tbank 3m'."""
+    if not fx:
+        return "n/a (no T-Bank rate)"
+    text = f"{fx['rate']:.2f} {fx['source']}"
+    as_of = fx.get("as_of")
+    if as_of is not None and as_of.tzinfo is not None:
+        age = max(0.0, (now - as_of).total_seconds())
+        text += f" {age / 60:.0f}m" if age < 5400 else f" {age / 3600:.0f}h"
+    return text
+
+
+class PlatformError(RuntimeError):
+    """Error reported by a platform client in its result dict (already logged)."""
+
+
+class StaleResultError(PlatformError):
+    """A platform's circuit is open; `fields` holds its last known good result."""
+
+    def __init__(self, message: str, fields: dict):
+        super().__init__(message)
+        self.fields = fields
+
 
 class Aggregator:
-    def __init__(self):
-        self.bybit = BybitClient()
-        self.okx = OkxClient()
-        self.tbank = TBankClient()
-        self.ibkr = IBKRClient()
+    # Human-readable platform labels, in the order results are displayed
+    PLATFORM_LABELS = {
+        "bybit": "ByBit",
+        "okx": "OKX",
+        "tbank": "T-Bank",
+        "ibkr": "IBKR",
+    }
+
+    # Recent fetch durations kept per platform for latency percentiles
+    LATENCY_SAMPLES = 50
+
+    def __init__(self, credentials: dict | None = None):
+        """
+        `credentials` describes one portfolio (see tenants.py); without it the
+        credentials from .env are used.
+        """
+        if credentials is None:
+            credentials = {
+                "bybit_accounts": Config.BYBIT_ACCOUNTS,
+                "okx_accounts": Config.OKX_ACCOUNTS,
+                "tbank_token": Config.TBANK_API_TOKEN,
+                "ibkr_flex_token": Config.IBKR_FLEX_TOKEN,
+                "ibkr_query_id": Config.IBKR_QUERY_ID,
+            }
+
+        # One client per configured (sub-)account
+        self.bybit_clients = [
+            BybitClient(acc["api_key"], acc["api_secret"], acc["name"])
+            for acc in credentials.get("bybit_accounts", [])
+        ]
+        self.okx_clients = [
+            OkxClient(acc["api_key"], acc["api_secret"], acc["passphrase"], acc["name"])
+            for acc in credentials.get("okx_accounts", [])
+        ]
+        self.tbank = TBankClient(credentials.get("tbank_token") or "")
+        self.ibkr = IBKRClient(
+            credentials.get("ibkr_flex_token") or "",
+            credentials.get("ibkr_query_id") or "",
+            credentials.get("ibkr_cache_file"),
+        )
         # FX and other platforms to be added later
 
-    def get_portfolio_summary(self):
-        summary = {
+        self._account_pool = _get_account_pool()
+
+        # Live crypto equity over WebSockets (keyed by client), read instead
+        # of REST while healthy
+        self.streams = {}
+        if Config.CRYPTO_STREAMING:
+            for client in self.bybit_clients:
+                if client.client:
+                    self.streams[client] = BybitWalletStream(client)
+            for client in self.okx_clients:
+                if client.client:
+                    self.streams[client] = OkxAccountStream(client)
+
+        # One breaker per platform so an outage fails fast instead of paying
+        # the full timeout/retry cost on every snapshot
+        self.breakers = {
+            platform: CircuitBreaker(
+                self.PLATFORM_LABELS[platform],
+                failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+                base_backoff=Config.CIRCUIT_BACKOFF_SECONDS,
+                max_backoff=Config.CIRCUIT_MAX_BACKOFF_SECONDS,
+                excluded_exceptions=(RateLimitExceeded,),
+            )
+            for platform in self.PLATFORM_LABELS
+        }
+
+        # Seconds taken by recent successful fetches, per platform
+        self.latencies = {
+            platform: deque(maxlen=self.LATENCY_SAMPLES)
+            for platform in self.PLATFORM_LABELS
+        }
+        # Breakdown of the most recent snapshots, newest last (see /perf)
+        self.runs = deque(maxlen=Config.PERF_HISTORY_SIZE)
+
+    def start_streams(self) -> None:
+        """Start the WebSocket streams; must be called from the running loop."""
+        for stream in self.streams.values():
+            stream.start()
+
+    async def stop_streams(self) -> None:
+        for stream in self.streams.values():
+            await stream.stop()
+
+    def _account_snapshot(self, client) -> tuple[float, dict]:
+        """
+        One account's (USD equity, {coin: quantity}). Equity and coins are read
+        live from the account's stream when possible, else over REST; coins
+        are only collected when the crypto breakdown is enabled.
+        """
+        stream = self.streams.get(client)
+        equity = stream.get_equity() if stream else None
+        include_coins = Config.INCLUDE_CRYPTO_BREAKDOWN
+        with tracing.span("account", account=client.name, streamed=equity is not None):
+            if equity is None:
+                return client.get_account_snapshot(include_coins)
+            if not include_coins:
+                return equity, {}
+            coins = stream.get_coins()
+            return equity, (client.get_coin_balances() if coins is None else coins)
+
+    def _fetch_exchange_accounts(self, platform: str, clients: list) -> dict:
+        """
+        Fetch every account of one exchange concurrently on the bounded pool,
+        so latency is that of the slowest account. Failed accounts are listed
+        with an error; the platform fails only if every account failed.
+        """
+        label = self.PLATFORM_LABELS[platform]
+        futures = [
+            (
+                client,
+                self._account_pool.submit(
+                    perf.in_context(profiling.propagate(self._account_snapshot)),
+                    client,
+                ),
+            )
+            for client in clients
+        ]
+
+        total = 0.0
+        accounts = []
+        coins = {}
+        errors = []
+        for client, future in futures:
+            try:
+                usd, account_coins = future.result()
+            except Exception as e:
+                logger.error(f"{label} account {client.name} error: {e}")
+                accounts.append({"name": client.name, "usd": 0.0, "error": str(e)})
+                errors.append(e)
+                continue
+            accounts.append({"name": client.name, "usd": round(usd, 2)})
+            total += usd
+            for coin, qty in account_coins.items():
+                coins[coin] = coins.get(coin, 0.0) + qty
+
+        if len(errors) == len(clients):
+            raise errors[0]
+
+        return {
+            f"{platform}_usd": total,
+            f"{platform}_accounts": accounts,
+            f"{platform}_coins": coins,
+        }
+
+    @tracing.span("crypto_breakdown")
+    def _add_crypto_breakdown(self, summary: dict) -> None:
+        """
+        Merge per-coin holdings of all exchanges by symbol, value them with one
+        cached bulk price lookup and store the result as
+        summary["crypto_breakdown"]: [{"coin", "amount", "usd"}, ...], largest
+        first, with holdings under CRYPTO_BREAKDOWN_MIN_USD collapsed into
+        "Other". Computed once per snapshot; the message and pie chart reuse it.
+        """
+        coins = {}
+        for key in ("bybit_coins", "okx_coins"):
+            for coin, qty in summary.pop(key, {}).items():
+                coins[coin] = coins.get(coin, 0.0) + qty
+        if not Config.INCLUDE_CRYPTO_BREAKDOWN or not coins:
+            return
+
+        prices = get_price_oracle().get_usd_prices(coins)
+        breakdown = []
+        other_usd = 0.0
+        for coin, qty in coins.items():
+            usd = qty * prices.get(coin, 0.0)
+            if usd < Config.CRYPTO_BREAKDOWN_MIN_USD:
+                other_usd += usd
+            else:
+                breakdown.append({"coin": coin, "amount": qty, "usd": round(usd, 2)})
+
+        breakdown.sort(key=lambda e: e["usd"], reverse=True)
+        if other_usd > 0:
+            breakdown.append(
+                {"coin": "Other", "amount": None, "usd": round(other_usd, 2)}
+            )
+        summary["crypto_breakdown"] = breakdown
+
+    def enabled_platforms(self) -> list[str]:
+        """Return the platform keys that have credentials configured."""
+        platforms = []
+        if self.bybit_clients:
+            platforms.append("bybit")
+        if self.okx_clients:
+            platforms.append("okx")
+        if self.tbank.token:
+            platforms.append("tbank")
+        if self.ibkr.token and self.ibkr.query_id:
+            platforms.append("ibkr")
+        return platforms
+
+    def fetch_platform(self, platform: str, runs: dict | None = None) -> dict:
+        """
+        Fetch a single platform and return the summary fields it contributes.
+        Raises on failure; blocking, so call it from a worker thread in async code.
+
+        Calls go through the platform's circuit breaker and request budget.
+        While the circuit is open or the budget is exhausted,
+        StaleResultError carries the last known value instead.
+
+        `runs`, if given, receives the fetch's perf.PlatformRun (timing,
+        cache use, retries and fallbacks) under the platform key.
+        """
+        with perf.platform_run(platform) as run, tracing.span(
+            f"fetch {platform}"
+        ) as current:
+            if runs is not None:
+                runs[platform] = run
+            started = time.monotonic()
+            try:
+                return self._guarded_fetch(platform)
+            except StaleResultError:
+                run.status = "stale"
+                raise
+            except Exception:
+                run.status = "error"
+                raise
+            finally:
+                run.seconds = time.monotonic() - started
+                if current is not None:
+                    current.set(status=run.status, cache=run.cache_result())
+
+    def _guarded_fetch(self, platform: str) -> dict:
+        """fetch_platform through the breaker, with latency and outcome metrics."""
+        breaker = self.breakers[platform]
+        started = time.monotonic()
+        try:
+            fields = breaker.call(self._fetch_platform, platform)
+        except CircuitOpenError as e:
+            _PLATFORM_FETCHES.inc(platform=platform, outcome="circuit_open")
+            reason = f"unavailable (next probe in {e.retry_in:.0f}s)"
+            self._raise_stale(platform, reason, e)
+        except RateLimitExceeded as e:
+            _PLATFORM_FETCHES.inc(platform=platform, outcome="rate_limited")
+            self._raise_stale(platform, "rate limited", e)
+        except Exception:
+            _PLATFORM_SECONDS.observe(time.monotonic() - started, platform=platform)
+            _PLATFORM_FETCHES.inc(platform=platform, outcome="error")
+            raise
+
+        elapsed = time.monotonic() - started
+        self.latencies[platform].append(elapsed)
+        _PLATFORM_SECONDS.observe(elapsed, platform=platform)
+        _PLATFORM_FETCHES.inc(platform=platform, outcome="ok")
+        return fields
+
+    def latency_percentile(self, platform: str, pct: float = 95) -> float | None:
+        """Nearest-rank percentile of recent fetch durations, None without samples."""
+        samples = sorted(self.latencies[platform])
+        if not samples:
+            return None
+        rank = max(1, math.ceil(pct / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def estimated_fetch_seconds(self, default: float) -> float:
+        """
+        Expected duration of a full snapshot: platforms are fetched
+        concurrently, so it is the p95 of the slowest one. `default` is used
+        while any enabled platform has no history yet.
+        """
+        estimates = [self.latency_percentile(p) for p in self.enabled_platforms()]
+        if None in estimates:
+            return default
+        return max(estimates, default=0.0)
+
+    def refresh_ibkr_cache(self) -> None:
+        """Download today's IBKR report now, so snapshots are served from cache."""
+        if "ibkr" not in self.enabled_platforms():
+            return
+        result = self.ibkr.get_portfolio_summary(force_refresh=True)
+        if "error" in result:
+            logger.warning(f"IBKR cache refresh failed: {result['error']}")
+        else:
+            logger.info(
+                f"IBKR cache refreshed (report date: {result.get('report_date')})"
+            )
+
+    def _raise_stale(self, platform: str, reason: str, error: Exception):
+        """Re-raise `error` as StaleResultError when a last known value exists."""
+        breaker = self.breakers[platform]
+        if breaker.last_value is None:
+            raise error
+        perf.fallback(platform, "last_known_value")
+        as_of = breaker.last_success_at.strftime("%H:%M")
+        raise StaleResultError(
+            f"{reason}, showing last known value from {as_of}", breaker.last_value
+        ) from error
+
+    def _fetch_platform(self, platform: str) -> dict:
+        if platform == "bybit":
+            return self._fetch_exchange_accounts("bybit", self.bybit_clients)
+
+        if platform == "okx":
+            return self._fetch_exchange_accounts("okx", self.okx_clients)
+
+        if platform == "tbank":
+            tbank_data = self.tbank.get_portfolio_summary()
+            if "error" in tbank_data:
+                raise PlatformError(tbank_data["error"])
+            fields = {
+                "tbank_rub": tbank_data.get("total_rub", 0.0),
+                "tbank_usd": tbank_data.get("total_usd", 0.0),
+                "tbank_accounts": tbank_data.get("accounts", []),
+            }
+            if "positions" in tbank_data:
+                fields["tbank_positions"] = tbank_data["positions"]
+            if "fx" in tbank_data:
+                fields["tbank_fx"] = tbank_data["fx"]
+            return fields
+
+        if platform == "ibkr":
+            ibkr_data = self.ibkr.get_portfolio_summary()
+            if "error" in ibkr_data:
+                raise PlatformError(ibkr_data["error"])
+            return {"ibkr_usd": ibkr_data.get("total_usd", 0.0)}
+
+        raise ValueError(f"Unknown platform: {platform}")
+
+    def _new_summary(self) -> dict:
+        return {
             "bybit_usd": 0.0,
             "okx_usd": 0.0,
             "tbank_rub": 0.0,
@@ -27,52 +404,108 @@ class Aggregator:
             "errors": {},
         }
 
-        # ByBit
-        if Config.BYBIT_API_KEY:
-            try:
-                summary["bybit_usd"] = self.bybit.get_balance_usd()
-            except Exception as e:
-                summary["errors"]["bybit"] = str(e)
-                logger.error(f"Bybit aggregation error: {e}")
+    def _apply_result(self, summary, platform, fields=None, error=None):
+        """Merge one platform's fields (or its error) into the summary."""
+        if error is not None:
+            summary["errors"][platform] = str(error)
+            if isinstance(error, StaleResultError):
+                summary.update(error.fields)
+            # Platform clients already log their own reported errors
+            if not isinstance(error, PlatformError):
+                label = self.PLATFORM_LABELS.get(platform, platform)
+                logger.error(f"{label} aggregation error: {error}")
+        else:
+            summary.update(fields)
 
-        # OKX
-        if Config.OKX_API_KEY:
-            try:
-                summary["okx_usd"] = self.okx.get_balance_usd()
-            except Exception as e:
-                summary["errors"]["okx"] = str(e)
-                logger.error(f"OKX aggregation error: {e}")
+        summary["crypto_usd"] = summary["bybit_usd"] + summary["okx_usd"]
 
-        # T-Bank
-        if Config.TBANK_API_TOKEN:
+    @tracing.span("snapshot")
+    def get_portfolio_summary(self):
+        """Fetch every configured platform one after another (blocking)."""
+        started = time.monotonic()
+        summary = self._new_summary()
+        runs = {}
+
+        for platform in self.enabled_platforms():
             try:
-                tbank_data = self.tbank.get_portfolio_summary()
-                if "error" in tbank_data:
-                    summary["errors"]["tbank"] = tbank_data["error"]
-                else:
-                    summary["tbank_rub"] = tbank_data.get("total_rub", 0.0)
-                    summary["tbank_usd"] = tbank_data.get("total_usd", 0.0)
-                    summary["tbank_accounts"] = tbank_data.get("accounts", [])
+                fields = self.fetch_platform(platform, runs)
             except Exception as e:
-                summary["errors"]["tbank"] = str(e)
-                logger.error(f"T-Bank aggregation error: {e}")
+                self._apply_result(summary, platform, error=e)
+            else:
+                self._apply_result(summary, platform, fields)
 
-        # IBKR Flex (Passive)
-        if Config.IBKR_FLEX_TOKEN and Config.IBKR_QUERY_ID:
-            try:
-                ibkr_data = self.ibkr.get_portfolio_summary()
-                if "error" in ibkr_data:
-                    summary["errors"]["ibkr"] = ibkr_data["error"]
+        self._add_crypto_breakdown(summary)
+        self._record_run(summary, runs, time.monotonic() - started)
+        return summary
+
+    async def get_portfolio_summary_async(self, on_progress=None):
+        """
+        Fetch every configured platform concurrently in worker threads.
+
+        While fetches are in flight the summary carries a "pending" list of
+        platform keys. `on_progress(summary)` is awaited after each platform
+        completes, so callers can render partial results; the key is removed
+        before the final summary is returned.
+        """
+        with tracing.span("snapshot"):
+            return await self._gather_summary(on_progress)
+
+    async def _gather_summary(self, on_progress) -> dict:
+        started = time.monotonic()
+        summary = self._new_summary()
+        runs = {}
+        tasks = {
+            asyncio.create_task(asyncio.to_thread(self.fetch_platform, p, runs)): p
+            for p in self.enabled_platforms()
+        }
+        summary["pending"] = list(tasks.values())
+
+        remaining = set(tasks)
+        while remaining:
+            done, remaining = await asyncio.wait(
+                remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                platform = tasks[task]
+                summary["pending"].remove(platform)
+                error = task.exception()
+                if error is not None:
+                    self._apply_result(summary, platform, error=error)
                 else:
-                    summary["ibkr_usd"] = ibkr_data.get("total_usd", 0.0)
-            except Exception as e:
-                summary["errors"]["ibkr"] = str(e)
-                logger.error(f"IBKR aggregation error: {e}")
+                    self._apply_result(summary, platform, task.result())
 
-        summary["crypto_usd"] = summary["bybit_usd"] + summary["okx_usd"]
+            if on_progress and remaining:
+                await on_progress(summary)
 
+        summary.pop("pending", None)
+        await asyncio.to_thread(self._add_crypto_breakdown, summary)
+        self._record_run(summary, runs, time.monotonic() - started)
         return summary
 
+    def _record_run(self, summary: dict, runs: dict, seconds: float) -> None:
+        """Keep one snapshot's breakdown for /perf and log its outline."""
+        _SNAPSHOT_SECONDS.observe(seconds)
+        record = {
+            "at": datetime.now(Config.get_timezone_obj()),
+            "seconds": seconds,
+            "platforms": [runs[p] for p in self.PLATFORM_LABELS if p in runs],
+            "fx": summary.get("tbank_fx"),
+        }
+        self.runs.append(record)
+
+        outline = ", ".join(
+            f"{run.platform} {run.status} {run.seconds:.2f}s"
+            for run in record["platforms"]
+        )
+        logger.info(
+            "Snapshot in %.2fs (%s); FX %s",
+            seconds,
+            outline or "no platforms",
+            fx_outline(record["fx"], record["at"]),
+            extra={"duration_ms": round(seconds * 1000, 1)},
+        )
+
+    @tracing.span("format")
     def format_message(self, summary):
 
         from datetime import datetime
@@ -87,6 +520,20 @@ class Aggregator:
             symbol = "$" if currency == "USD" else "₽"
             return f"{symbol}{s}"
 
+        def account_lines(accounts):
+            # Per-account breakdown, only worth showing for several accounts
+            if len(accounts) < 2:
+                return []
+            return [
+                f"  · {acc['name']}: "
+                + (
+                    "ERROR"
+                    if "error" in acc
+                    else f"<code>{fmt(acc['usd'], 'USD')}</code>"
+                )
+                for acc in accounts
+            ]
+
         # T-Bank
         tbank_rub_val = summary.get("tbank_rub", 0.0)
         tbank_usd_val = summary.get("tbank_usd", 0.0)
@@ -108,6 +555,10 @@ class Aggregator:
         grand_total_usd = crypto_usd + tbank_usd_val + ibkr_usd
         grand_total_rub = tbank_rub_val + ((crypto_usd + ibkr_usd) * implied_rate)
 
+        # Platforms still being fetched (progressive rendering)
+        pending = set(summary.get("pending", ()))
+        loading = "<i>⏳ loading…</i>"
+
         # Build Message
         lines = []
         lines.append(f"<b>Portfolio summary {current_date}</b>")
@@ -115,6 +566,9 @@ class Aggregator:
 
         lines.append("<b>T-BANK RUB</b>")
 
+        if "tbank" in pending:
+            lines.append(f"Total T-BANK: {loading}")
+            lines.append("")
         tbank_accounts = summary.get("tbank_accounts", [])
         if tbank_accounts:
             for acc in tbank_accounts:
@@ -122,36 +576,59 @@ class Aggregator:
         if "tbank" in summary["errors"]:
             lines.append(f"⚠️ ERROR: {summary['errors']['tbank']}")
 
-        lines.append("Total T-BANK")
-        lines.append(f"RUB: <code>{fmt(tbank_rub_val, 'RUB')}</code>")
-        lines.append(f"USD: <code>{fmt(tbank_usd_val, 'USD')}</code>")
-        lines.append("")
+        if "tbank" not in pending:
+            lines.append("Total T-BANK")
+            lines.append(f"RUB: <code>{fmt(tbank_rub_val, 'RUB')}</code>")
+            lines.append(f"USD: <code>{fmt(tbank_usd_val, 'USD')}</code>")
+            lines.append("")
 
         lines.append("<b>CRYPTO USD</b>")
 
         bybit_line = f"ByBit: <code>{fmt(bybit_usd, 'USD')}</code>"
-        if "bybit" in summary["errors"]:
+        if "bybit" in pending:
+            bybit_line = f"ByBit: {loading}"
+        elif "bybit" in summary["errors"]:
             bybit_line += f" (ERROR)"
         lines.append(bybit_line)
+        lines.extend(account_lines(summary.get("bybit_accounts", [])))
 
         okx_line = f"OKX: <code>{fmt(okx_usd, 'USD')}</code>"
-        if "okx" in summary["errors"]:
+        if "okx" in pending:
+            okx_line = f"OKX: {loading}"
+        elif "okx" in summary["errors"]:
             okx_line += f" (ERROR)"
         lines.append(okx_line)
+        lines.extend(account_lines(summary.get("okx_accounts", [])))
+
+        if summary.get("crypto_breakdown"):
+            lines.append("By coin:")
+        for entry in summary.get("crypto_breakdown", []):
+            lines.append(f"  {entry['coin']}: <code>{fmt(entry['usd'], 'USD')}</code>")
 
-        lines.append(f"Total crypto: <code>{fmt(crypto_usd, 'USD')}</code>")
+        if {"bybit", "okx"} & pending:
+            lines.append(f"Total crypto: {loading}")
+        else:
+            lines.append(f"Total crypto: <code>{fmt(crypto_usd, 'USD')}</code>")
         lines.append("")
 
         # IBKR Section
-        if Config.IBKR_FLEX_TOKEN:
+        if self.ibkr.token:
             lines.append("<b>STOCKS USD</b>")
             ibkr_line = f"IBKR: <code>{fmt(ibkr_usd, 'USD')}</code>"
-            if "ibkr" in summary["errors"]:
+            if "ibkr" in pending:
+                ibkr_line = f"IBKR: {loading}"
+            elif "ibkr" in summary["errors"]:
                 ibkr_line += f" (ERROR: {summary['errors']['ibkr']})"
             lines.append(ibkr_line)
             lines.append("")
 
         lines.append(f"<b>TOTAL</b>")
+        if pending:
+            waiting = ", ".join(
+                label for p, label in self.PLATFORM_LABELS.items() if p in pending
+            )
+            lines.append(f"<i>⏳ waiting for {waiting}…</i>")
+            return "\n".join(lines)
         lines.append(f"USD: <code>{fmt(grand_total_usd, 'USD')}</code>")
         lines.append(f"RUB: <code>{fmt(grand_total_rub, 'RUB')}</code>")
 
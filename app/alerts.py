@@ -0,0 +1,177 @@
+"""
+alerts.py — threshold and drawdown alerts evaluated on every snapshot.
+
+ALERT_RULES is a ";"-separated list of rules:
+
+    total_below:50000          USD total below 50 000
+    drawdown:5%:7d             USD total more than 5% below its 7-day high
+    platform_change:10%        any platform's USD value moved more than 10%
+                               since the previous snapshot
+    platform_change:okx:10%    same, for one platform only
+
+State is kept in memory and updated incrementally: the rolling N-day high
+is a monotonic deque (amortized O(1) per snapshot), seeded once from the
+history file, and platform changes compare with the previous snapshot
+only. Each rule has a cooldown (ALERT_COOLDOWN_MINUTES) so a persisting
+condition does not alert on every snapshot.
+"""
+
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from app import history_manager
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ("bybit", "okx", "tbank", "ibkr")
+
+
+def _usd(value: float) -> str:
+    return f"${value:,.0f}".replace(",", " ")
+
+
+def _parse_pct(value: str) -> float:
+    return float(value.strip().rstrip("%"))
+
+
+def _parse_days(value: str) -> int:
+    return int(value.strip().lower().rstrip("d"))
+
+
+class _RollingMax:
+    """Maximum over a sliding time window via a monotonic (decreasing) deque."""
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        self._items = deque()  # (timestamp, value), values strictly decreasing
+
+    def add(self, at: datetime, value: float) -> None:
+        while self._items and self._items[-1][1] <= value:
+            self._items.pop()
+        self._items.append((at, value))
+        while self._items[0][0] < at - self.window:
+            self._items.popleft()
+
+    def max(self) -> float | None:
+        return self._items[0][1] if self._items else None
+
+
+class AlertRule:
+    """One parsed rule; `check` returns an alert text or None."""
+
+    def __init__(self, spec: str):
+        self.spec = spec.strip()
+        kind, _, args = self.spec.partition(":")
+        self.kind = kind.strip().lower()
+        parts = [p for p in args.split(":") if p.strip()]
+
+        try:
+            if self.kind == "total_below":
+                (self.threshold,) = (float(p) for p in parts)
+            elif self.kind == "drawdown":
+                pct, days = parts
+                self.pct = _parse_pct(pct)
+                self.days = _parse_days(days)
+                self.high = _RollingMax(timedelta(days=self.days))
+            elif self.kind == "platform_change":
+                self.platform = parts[0].strip().lower() if len(parts) == 2 else None
+                self.pct = _parse_pct(parts[-1])
+                if self.platform and self.platform not in PLATFORMS:
+                    raise ValueError(f"unknown platform {self.platform!r}")
+            else:
+                raise ValueError(f"unknown rule type {self.kind!r}")
+        except ValueError as e:
+            raise ValueError(f"Invalid alert rule {self.spec!r}: {e}") from None
+
+    def check(self, usd: float, platforms: dict, previous: dict, at: datetime):
+        if self.kind == "total_below":
+            if usd < self.threshold:
+                return f"Total <code>{_usd(usd)}</code> is below {_usd(self.threshold)}"
+            return None
+
+        if self.kind == "drawdown":
+            self.high.add(at, usd)
+            high = self.high.max()
+            if high and (high - usd) / high * 100 > self.pct:
+                drop = (high - usd) / high * 100
+                return (
+                    f"Total <code>{_usd(usd)}</code> is {drop:.1f}% below its "
+                    f"{self.days}-day high of {_usd(high)}"
+                )
+            return None
+
+        # platform_change
+        moves = []
+        for platform, value in platforms.items():
+            if self.platform and platform != self.platform:
+                continue
+            before = previous.get(platform)
+            if not before:
+                continue
+            change = (value - before) / before * 100
+            if abs(change) > self.pct:
+                moves.append(
+                    f"{platform}: {_usd(before)} → {_usd(value)} ({change:+.1f}%)"
+                )
+        if moves:
+            return "Platform balance moved since last snapshot:\n" + "\n".join(moves)
+        return None
+
+
+class AlertEngine:
+    """Evaluates one portfolio's rules on each snapshot."""
+
+    def __init__(self, rules: str, history_file: str):
+        self.rules = [AlertRule(spec) for spec in rules.split(";") if spec.strip()]
+        self.history_file = history_file
+        self._previous = {}  # platform -> USD value in the last snapshot
+        self._fired_at = {}  # rule spec -> monotonic time of last alert
+        self._seeded = False
+
+    def _seed(self) -> None:
+        """Load the rolling highs from history, once."""
+        self._seeded = True
+        drawdowns = [r for r in self.rules if r.kind == "drawdown"]
+        if not drawdowns:
+            return
+        days = max(r.days for r in drawdowns)
+        entries = history_manager.get_history(days, self.history_file)
+        for entry in reversed(entries):  # oldest first
+            at = datetime.strptime(entry["date"], "%d-%m-%Y")
+            for rule in drawdowns:
+                rule.high.add(at, entry["USD"])
+
+    def evaluate(self, summary: dict, usd: float) -> list[str]:
+        """Update state with a snapshot and return the alerts to send."""
+        if not self.rules:
+            return []
+        if not self._seeded:
+            self._seed()
+
+        now = datetime.now()
+        errors = summary.get("errors", {})
+        # Failed platforms report stale or zero values; leave them out
+        platforms = {
+            p: summary.get(f"{p}_usd", 0.0) for p in PLATFORMS if p not in errors
+        }
+
+        alerts = []
+        cooldown = Config.ALERT_COOLDOWN_MINUTES * 60
+        for rule in self.rules:
+            if errors and rule.kind != "platform_change":
+                # The total is incomplete while a platform is failing
+                continue
+            message = rule.check(usd, platforms, self._previous, now)
+            if message is None:
+                continue
+            last = self._fired_at.get(rule.spec)
+            if last is not None and time.monotonic() - last < cooldown:
+                continue
+            self._fired_at[rule.spec] = time.monotonic()
+            alerts.append(message)
+
+        self._previous.update(platforms)
+        return alerts
@@ -10,9 +10,16 @@ import io
 import logging
 from datetime import datetime
 
+from app.utils import metrics
+
 logger = logging.getLogger(__name__)
 
+_RENDER_SECONDS = metrics.histogram(
+    "portfolio_chart_render_seconds", "Duration of chart rendering", ("chart",)
+)
+
 
+@metrics.timed(_RENDER_SECONDS, chart="portfolio")
 def build_portfolio_chart(
     entries: list[dict], currency: str = "USD", line_color: str = "#4A90D9"
 ) -> io.BytesIO:
@@ -126,6 +133,7 @@ def build_portfolio_chart(
     return buf
 
 
+@metrics.timed(_RENDER_SECONDS, chart="pie")
 def build_pie_chart(summary: dict) -> io.BytesIO:
     """
     Build a pie chart showing current portfolio allocation by platform.
@@ -156,6 +164,21 @@ def build_pie_chart(summary: dict) -> io.BytesIO:
     values_raw = [crypto_usd, ibkr_usd, tbank_usd]
     colors_raw = ["#4A90D9", "#27AE60", "#E67E22"]
 
+    # Split the crypto slice by coin when the snapshot carries a breakdown.
+    # Coin values are scaled to the exchange-reported crypto total so the
+    # slices still add up to it.
+    breakdown = summary.get("crypto_breakdown") or []
+    breakdown_total = sum(e["usd"] for e in breakdown)
+    if breakdown_total > 0 and crypto_usd > 0:
+        scale = crypto_usd / breakdown_total
+        blues = plt.get_cmap("Blues")
+        labels_raw = [e["coin"] for e in breakdown] + labels_raw[1:]
+        values_raw = [e["usd"] * scale for e in breakdown] + values_raw[1:]
+        colors_raw = [
+            blues(0.85 - 0.5 * i / max(len(breakdown) - 1, 1))
+            for i in range(len(breakdown))
+        ] + colors_raw[1:]
+
     # Drop zero-value segments
     data = [(l, v, c) for l, v, c in zip(labels_raw, values_raw, colors_raw) if v > 0]
 
@@ -1,3 +1,4 @@
+import json
 import os
 import pytz
 from dotenv import load_dotenv
@@ -5,10 +6,65 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _parse_accounts(value: str | None, fields: tuple[str, ...]) -> list[dict]:
+    """
+    Parse a named credential list: "name:field1:field2,name2:field1:field2".
+    The last field takes the remainder, so it may itself contain ":".
+    """
+    accounts = []
+    for index, item in enumerate((value or "").split(","), start=1):
+        item = item.strip()
+        if not item:
+            continue
+        parts = item.split(":", len(fields))
+        if len(parts) != len(fields) + 1 or not all(parts):
+            # Never echo the entry: without a name its first field is a key
+            raise ValueError(
+                f"Malformed account entry #{index}: expected "
+                f"{len(fields) + 1} non-empty fields (name:{':'.join(fields)}), "
+                f"got {sum(1 for part in parts if part)}"
+            )
+        accounts.append({"name": parts[0], **dict(zip(fields, parts[1:]))})
+    return accounts
+
+
+def _load_tenants(path: str | None) -> dict[str, dict]:
+    """
+    Load the tenant registry: a JSON object mapping chat IDs to credential
+    sets, e.g. {"123456789": {"name": "alice", "bybit_accounts": [...]}}.
+    """
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected an object keyed by chat ID")
+    return {str(chat_id).strip(): entry for chat_id, entry in data.items()}
+
+
 class Config:
     # Telegram
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    # Bot API server (override to point at a local Bot API server or test stub)
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+    # Extra chats (IDs or @channel) that receive the scheduled report
+    REPORT_RECIPIENTS = [
+        c.strip() for c in os.getenv("REPORT_RECIPIENTS", "").split(",") if c.strip()
+    ]
+    # Bot-wide send budget and attempts per recipient for report delivery
+    # (every message is tried at least once)
+    DELIVERY_GLOBAL_PER_SECOND = int(os.getenv("DELIVERY_GLOBAL_PER_SECOND", 30))
+    DELIVERY_MAX_ATTEMPTS = max(int(os.getenv("DELIVERY_MAX_ATTEMPTS", 4)), 1)
+
+    # Webhook mode: set WEBHOOK_URL (public base URL of the reverse proxy) to
+    # receive updates over HTTPS instead of long polling
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram").strip("/")
+    WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
 
     # Schedule
     TIMEZONE = os.getenv("TIMEZONE", "Europe/Paris")
@@ -20,52 +76,199 @@ class Config:
     FX_PROVIDER = os.getenv("FX_PROVIDER", "ECB")
     FX_TTL_MINUTES = int(os.getenv("FX_TTL_MINUTES", 60))
 
+    # Several portfolios in one process: JSON file of chat ID -> credentials
+    TENANTS_FILE = os.getenv("TENANTS_FILE")
+    TENANTS = _load_tenants(TENANTS_FILE)
+    # Scheduled fetches of all tenants are spread over this many minutes
+    TENANT_SPREAD_MINUTES = int(os.getenv("TENANT_SPREAD_MINUTES", 10))
+
+    # Size of the keep-alive connection pool shared by all HTTP clients
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 20))
+
+    # Prometheus-format /metrics endpoint (off unless METRICS_PORT is set)
+    METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)
+    METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
+    # Event-loop heartbeat (0 disables the monitor) and the blocking time
+    # after which the loop thread's stack is logged
+    LOOP_MONITOR_INTERVAL_SECONDS = float(
+        os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", 0.25)
+    )
+    LOOP_STALL_SECONDS = float(os.getenv("LOOP_STALL_SECONDS", 0.5))
+
+    # Finished traces kept for /trace (0 disables tracing) and the optional
+    # OTLP/HTTP collector they are also sent to, e.g. http://127.0.0.1:4318
+    TRACE_HISTORY_SIZE = int(os.getenv("TRACE_HISTORY_SIZE", 50))
+    OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT")
+    OTLP_SERVICE_NAME = os.getenv("OTLP_SERVICE_NAME", "portfolio-bot")
+
+    # Chats or users allowed to run /profile and /memsnap (off when empty)
+    ADMIN_CHAT_IDS = {
+        c.strip() for c in os.getenv("ADMIN_CHAT_IDS", "").split(",") if c.strip()
+    }
+    # Functions listed per sort order in /profile reports, longest window
+    PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", 40))
+    PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", 300))
+    # Stack frames kept per allocation once /memsnap starts tracemalloc
+    TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 1))
+
     # Bybit
     BYBIT_API_KEY = os.getenv("BYBIT_API_KEY")
     BYBIT_API_SECRET = os.getenv("BYBIT_API_SECRET")
+    # Several (sub-)accounts: BYBIT_ACCOUNTS=main:key:secret,sub1:key:secret
+    BYBIT_ACCOUNTS = _parse_accounts(
+        os.getenv("BYBIT_ACCOUNTS"), ("api_key", "api_secret")
+    ) or (
+        [{"name": "Main", "api_key": BYBIT_API_KEY, "api_secret": BYBIT_API_SECRET}]
+        if BYBIT_API_KEY
+        else []
+    )
 
     # OKX
     OKX_API_KEY = os.getenv("OKX_API_KEY")
     OKX_API_SECRET = os.getenv("OKX_API_SECRET")
     OKX_API_PASSPHRASE = os.getenv("OKX_API_PASSPHRASE")
+    # Several (sub-)accounts: OKX_ACCOUNTS=main:key:secret:passphrase,...
+    OKX_ACCOUNTS = _parse_accounts(
+        os.getenv("OKX_ACCOUNTS"), ("api_key", "api_secret", "passphrase")
+    ) or (
+        [
+            {
+                "name": "Main",
+                "api_key": OKX_API_KEY,
+                "api_secret": OKX_API_SECRET,
+                "passphrase": OKX_API_PASSPHRASE,
+            }
+        ]
+        if OKX_API_KEY
+        else []
+    )
+    # Upper bound on concurrent per-account balance requests
+    ACCOUNT_FETCH_WORKERS = int(os.getenv("ACCOUNT_FETCH_WORKERS", 4))
+
+    # REST base URLs (balances and the shared price oracle's spot tickers);
+    # point them at tools/fake_exchanges for offline runs
+    BYBIT_REST_URL = os.getenv("BYBIT_REST_URL", "https://api.bybit.com")
+    OKX_REST_URL = os.getenv("OKX_REST_URL", "https://www.okx.com")
+    PRICE_CACHE_TTL_SECONDS = int(os.getenv("PRICE_CACHE_TTL_SECONDS", 60))
+
+    # Live crypto balances over private WebSockets (optional)
+    CRYPTO_STREAMING = os.getenv("CRYPTO_STREAMING", "false").lower() == "true"
+    BYBIT_WS_URL = os.getenv("BYBIT_WS_URL", "wss://stream.bybit.com/v5/private")
+    OKX_WS_URL = os.getenv("OKX_WS_URL", "wss://ws.okx.com:8443/ws/v5/private")
+    STREAM_RESYNC_MINUTES = int(os.getenv("STREAM_RESYNC_MINUTES", 15))
+    STREAM_MAX_BACKOFF_SECONDS = int(os.getenv("STREAM_MAX_BACKOFF_SECONDS", 60))
 
     # T-Bank
     TBANK_API_TOKEN = os.getenv("TBANK_API_TOKEN")
+    # gRPC endpoint override (host:port); empty means the SDK's production target
+    TBANK_TARGET = os.getenv("TBANK_TARGET")
+    # Per-instrument valuation (enables /positions)
+    TBANK_POSITIONS_MODE = (
+        os.getenv("TBANK_POSITIONS_MODE", "false").lower() == "true"
+    )
+    POSITIONS_TOP_N = int(os.getenv("POSITIONS_TOP_N", 10))
 
     # IBKR (Flex Query)
     IBKR_FLEX_TOKEN = os.getenv("IBKR_FLEX_TOKEN")
     IBKR_QUERY_ID = os.getenv("IBKR_QUERY_ID")
+    # Flex Web Service servlet base (SendRequest / GetStatement live under it)
+    IBKR_FLEX_BASE_URL = os.getenv(
+        "IBKR_FLEX_BASE_URL", "https://www.interactivebrokers.com/Universal/servlet"
+    )
 
     # Behavior
     INCLUDE_CRYPTO_BREAKDOWN = (
         os.getenv("INCLUDE_CRYPTO_BREAKDOWN", "true").lower() == "true"
     )
+    # Coins worth less than this (USD) are grouped as "Other" in the breakdown
+    CRYPTO_BREAKDOWN_MIN_USD = float(os.getenv("CRYPTO_BREAKDOWN_MIN_USD", 50))
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # "text" (default) or "json": one JSON object per line, with platform,
+    # duration_ms, attempt and cache_hit fields where the call site has them
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    # At most LOG_SAMPLE_BURST INFO/DEBUG lines per call site in every
+    # LOG_SAMPLE_WINDOW_SECONDS; the rest are only counted (0, the default,
+    # turns sampling off)
+    LOG_SAMPLE_WINDOW_SECONDS = float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", 0))
+    LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", 5))
+    # Minimum seconds between progressive edits of the /status message
+    STATUS_EDIT_INTERVAL_SECONDS = float(
+        os.getenv("STATUS_EDIT_INTERVAL_SECONDS", 1.0)
+    )
+
+    # Alert rules evaluated on every snapshot (see app/alerts.py)
+    ALERT_RULES = os.getenv("ALERT_RULES", "")
+    ALERT_COOLDOWN_MINUTES = int(os.getenv("ALERT_COOLDOWN_MINUTES", 360))
+
+    # Scheduled reports whose USD total moved less than both thresholds since
+    # the last full report are skipped or shortened (0 disables a threshold)
+    REPORT_MIN_CHANGE_USD = float(os.getenv("REPORT_MIN_CHANGE_USD", 0))
+    REPORT_MIN_CHANGE_PCT = float(os.getenv("REPORT_MIN_CHANGE_PCT", 0))
+    REPORT_SUPPRESS_MODE = os.getenv("REPORT_SUPPRESS_MODE", "short").lower()
+
+    # Scheduled jobs start up to this long before their slot to prefetch data
+    PREFETCH_MAX_LEAD_SECONDS = int(os.getenv("PREFETCH_MAX_LEAD_SECONDS", 120))
+    # IBKR's daily report is downloaded this long before WINDOW_START_HOUR
+    IBKR_REFRESH_LEAD_MINUTES = int(os.getenv("IBKR_REFRESH_LEAD_MINUTES", 10))
+
+    # Reuse a summary for /pie_chart and /positions while younger than this
+    SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", 300))
+    # Snapshots kept per portfolio for the /perf breakdown
+    PERF_HISTORY_SIZE = int(os.getenv("PERF_HISTORY_SIZE", 20))
+
+    # Circuit breaker (per platform)
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))
+    CIRCUIT_BACKOFF_SECONDS = int(os.getenv("CIRCUIT_BACKOFF_SECONDS", 60))
+    CIRCUIT_MAX_BACKOFF_SECONDS = int(os.getenv("CIRCUIT_MAX_BACKOFF_SECONDS", 1800))
+
+    # Request budgets per platform, "<requests>/<seconds>"
+    RATE_LIMITS = {
+        "bybit": os.getenv("RATE_LIMIT_BYBIT", "10/1"),
+        "okx": os.getenv("RATE_LIMIT_OKX", "5/2"),
+        "tbank": os.getenv("RATE_LIMIT_TBANK", "50/60"),
+        "ibkr": os.getenv("RATE_LIMIT_IBKR", "10/60"),
+    }
+    # Longest a call may queue for budget before the last known value is served
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", 5))
 
     @classmethod
     def validate(cls):
         missing = []
         if not cls.TELEGRAM_BOT_TOKEN:
             missing.append("TELEGRAM_BOT_TOKEN")
-        if not cls.TELEGRAM_CHAT_ID:
-            missing.append("TELEGRAM_CHAT_ID")
-
-        if not cls.BYBIT_API_KEY:
-            missing.append("BYBIT_API_KEY")
-        if not cls.BYBIT_API_SECRET:
-            missing.append("BYBIT_API_SECRET")
-        if not cls.OKX_API_KEY:
-            missing.append("OKX_API_KEY")
-        if not cls.OKX_API_SECRET:
-            missing.append("OKX_API_SECRET")
-        if not cls.OKX_API_PASSPHRASE:
-            missing.append("OKX_API_PASSPHRASE")
+        if cls.WEBHOOK_URL and not cls.WEBHOOK_SECRET_TOKEN:
+            missing.append("WEBHOOK_SECRET_TOKEN")
+
+        # With a tenant registry the .env portfolio is optional
+        if not cls.TENANTS:
+            if not cls.TELEGRAM_CHAT_ID:
+                missing.append("TELEGRAM_CHAT_ID")
+
+            # A BYBIT_ACCOUNTS / OKX_ACCOUNTS list replaces the single key pair
+            if not os.getenv("BYBIT_ACCOUNTS"):
+                if not cls.BYBIT_API_KEY:
+                    missing.append("BYBIT_API_KEY")
+                if not cls.BYBIT_API_SECRET:
+                    missing.append("BYBIT_API_SECRET")
+            if not os.getenv("OKX_ACCOUNTS"):
+                if not cls.OKX_API_KEY:
+                    missing.append("OKX_API_KEY")
+                if not cls.OKX_API_SECRET:
+                    missing.append("OKX_API_SECRET")
+                if not cls.OKX_API_PASSPHRASE:
+                    missing.append("OKX_API_PASSPHRASE")
 
         if missing:
             raise ValueError(
                 f"Missing required environment variables: {', '.join(missing)}"
             )
 
+    @classmethod
+    def webhook_endpoint(cls) -> str:
+        """Full public URL Telegram should POST updates to."""
+        return f"{cls.WEBHOOK_URL.rstrip('/')}/{cls.WEBHOOK_PATH}"
+
     @classmethod
     def get_timezone_obj(cls):
         return pytz.timezone(cls.TIMEZONE)
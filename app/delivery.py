@@ -0,0 +1,126 @@
+"""
+delivery.py — fan-out of one formatted report to many chats.
+
+Every send goes through a global token bucket (Telegram allows about 30
+messages per second per bot) and a per-chat bucket (one message per second
+in private chats, 20 per minute in groups and channels). Recipients are
+delivered concurrently and retried independently: RetryAfter waits exactly
+as long as Telegram asks, connection errors back off exponentially, and
+permanent errors (blocked bot, unknown chat) are not retried. Neither is a
+timeout: Telegram may already have delivered the message, and a retry would
+send the report twice.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncTokenBucket:
+    """`capacity` sends per `per_seconds`; waiters are served in FIFO order."""
+
+    def __init__(self, capacity: int, per_seconds: float):
+        self.capacity = max(1, capacity)
+        self.rate = self.capacity / per_seconds
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1.0
+                self._updated = time.monotonic()
+            self.tokens -= 1
+
+
+def _retry_delay(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+def _is_group(chat_id) -> bool:
+    """Groups and channels have negative IDs or are addressed by @username."""
+    chat_id = str(chat_id)
+    return chat_id.startswith(("-", "@"))
+
+
+class SendQueue:
+    """Rate-limited, retrying delivery of messages through one Bot."""
+
+    GROUP_LIMIT = (20, 60.0)
+    PRIVATE_LIMIT = (1, 1.0)
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._global = _AsyncTokenBucket(Config.DELIVERY_GLOBAL_PER_SECOND, 1.0)
+        self._per_chat = {}
+
+    def _chat_bucket(self, chat_id) -> _AsyncTokenBucket:
+        bucket = self._per_chat.get(str(chat_id))
+        if bucket is None:
+            limit = self.GROUP_LIMIT if _is_group(chat_id) else self.PRIVATE_LIMIT
+            bucket = self._per_chat[str(chat_id)] = _AsyncTokenBucket(*limit)
+        return bucket
+
+    async def send(self, chat_id, text: str, **kwargs):
+        """Send one message, retrying transient failures. Returns the Message."""
+        attempts = Config.DELIVERY_MAX_ATTEMPTS
+        for attempt in range(1, attempts + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self._global.acquire()
+            try:
+                return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            except RetryAfter as e:
+                if attempt == attempts:
+                    raise
+                delay = _retry_delay(e)
+                logger.warning(
+                    f"Delivery to {chat_id} throttled, retrying in {delay:g}s"
+                )
+            except (Forbidden, BadRequest):
+                # Blocked bot, unknown chat, bad markup — retrying will not help
+                raise
+            except TimedOut:
+                # The request may have reached Telegram; a retry could duplicate it
+                raise
+            except NetworkError as e:
+                if attempt == attempts:
+                    raise
+                delay = 2 ** (attempt - 1)
+                logger.warning(
+                    f"Delivery to {chat_id} failed (attempt {attempt}/{attempts}), "
+                    f"retrying in {delay}s: {e}"
+                )
+            await asyncio.sleep(delay)
+
+    async def deliver(self, chat_ids, text: str, **kwargs) -> dict:
+        """
+        Send the same message to every chat concurrently. Returns
+        {chat_id: Message or the exception that made delivery give up}.
+        """
+        chat_ids = list(dict.fromkeys(str(c) for c in chat_ids))
+        results = await asyncio.gather(
+            *(self.send(chat_id, text, **kwargs) for chat_id in chat_ids),
+            return_exceptions=True,
+        )
+        outcome = dict(zip(chat_ids, results))
+        for chat_id, result in outcome.items():
+            if isinstance(result, Exception):
+                logger.error(f"Delivery to {chat_id} failed: {result}")
+        return outcome
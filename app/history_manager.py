@@ -3,39 +3,51 @@ import logging
 import os
 from datetime import datetime, timedelta
 
+from app.utils import metrics
+
 logger = logging.getLogger(__name__)
 
-# Path to the JSON file storing daily portfolio snapshots
-_HISTORY_FILE = os.path.join(
+_IO_SECONDS = metrics.histogram(
+    "portfolio_history_io_seconds",
+    "Duration of history file reads and writes",
+    ("operation",),
+)
+
+# Directory for history files and caches
+DATA_DIR = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "data",
-    "portfolio_history.json",
 )
 
+# Path to the JSON file storing daily portfolio snapshots
+_HISTORY_FILE = os.path.join(DATA_DIR, "portfolio_history.json")
+
 
-def _load() -> dict:
+@metrics.timed(_IO_SECONDS, operation="load")
+def _load(path: str = _HISTORY_FILE) -> dict:
     """Load the history JSON from disk. Returns empty dict on failure."""
-    if not os.path.exists(_HISTORY_FILE):
+    if not os.path.exists(path):
         return {}
     try:
-        with open(_HISTORY_FILE, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     except Exception as e:
         logger.error(f"Failed to load portfolio history: {e}")
         return {}
 
 
-def _save(data: dict) -> None:
+@metrics.timed(_IO_SECONDS, operation="save")
+def _save(data: dict, path: str = _HISTORY_FILE) -> None:
     """Persist the history dict to disk."""
-    os.makedirs(os.path.dirname(_HISTORY_FILE), exist_ok=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
     try:
-        with open(_HISTORY_FILE, "w", encoding="utf-8") as f:
+        with open(path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
     except Exception as e:
         logger.error(f"Failed to save portfolio history: {e}")
 
 
-def save_snapshot(usd: float, rub: float) -> None:
+def save_snapshot(usd: float, rub: float, path: str = _HISTORY_FILE) -> None:
     """
     Save (or overwrite) today's portfolio snapshot.
 
@@ -43,21 +55,21 @@ def save_snapshot(usd: float, rub: float) -> None:
     Value: {"USD": <amount>, "RUB": <amount>}
     """
     today_key = datetime.now().strftime("%d-%m-%Y")
-    data = _load()
+    data = _load(path)
     data[today_key] = {"USD": round(usd, 2), "RUB": round(rub, 2)}
-    _save(data)
+    _save(data, path)
     logger.info(
         f"Portfolio snapshot saved for {today_key}: USD={usd:.2f}, RUB={rub:.2f}"
     )
 
 
-def get_history(days: int = 30) -> list[dict]:
+def get_history(days: int = 30, path: str = _HISTORY_FILE) -> list[dict]:
     """
     Return up to `days` most-recent daily snapshots, sorted newest-first.
 
     Each element: {"date": "DD-MM-YYYY", "USD": <float>, "RUB": <float>}
     """
-    data = _load()
+    data = _load(path)
 
     # Build a list of (date_obj, key, values) for sorting
     entries = []
@@ -1,5 +1,6 @@
 import logging
 from app.config import Config
+from app.utils import metrics
 from app.utils.logging_redaction import setup_logging
 from app.telegram_client import TelegramBot
 
@@ -16,6 +17,7 @@ def main():
         # Probably better to crash for now so user fixes it.
         # But for development we might want to proceed.
 
+    metrics.start_server()
     bot = TelegramBot()
     bot.run()
 
@@ -1,6 +1,9 @@
 import logging
 from pybit.unified_trading import HTTP
 from app.config import Config
+from app.platforms.price_oracle import get_price_oracle
+from app.utils import http, perf, rate_limiter
+from app.utils.rate_limiter import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -8,20 +11,12 @@ logger = logging.getLogger(__name__)
 class BybitClient:
     ASSET_OVERVIEW_PATH = "/v5/asset/asset-overview"
 
-    STABLECOINS_1_TO_1_USD = {
-        "USD",
-        "USDT",
-        "USDC",
-        "USDE",
-        "USDD",
-        "FDUSD",
-        "PYUSD",
-        "TUSD",
-    }
-
-    def __init__(self):
-        self.api_key = Config.BYBIT_API_KEY
-        self.api_secret = Config.BYBIT_API_SECRET
+    def __init__(self, api_key=None, api_secret=None, name="Main"):
+        self.name = name
+        # Structured fields of this account's log lines (see LOG_FORMAT=json)
+        self._log_extra = {"platform": "bybit", "account": name}
+        self.api_key = api_key or Config.BYBIT_API_KEY
+        self.api_secret = api_secret or Config.BYBIT_API_SECRET
         self.client = None
 
         if self.api_key and self.api_secret:
@@ -29,10 +24,21 @@ class BybitClient:
                 self.client = HTTP(
                     testnet=False, api_key=self.api_key, api_secret=self.api_secret
                 )
+                # Signed requests carry their own headers, so accounts can
+                # share one connection pool
+                self.client.client = http.get_session()
+                self.client.endpoint = Config.BYBIT_REST_URL.rstrip("/")
             except Exception as e:
-                logger.error(f"Failed to initialize Bybit client: {e}")
+                logger.error(
+                    "Failed to initialize Bybit client %s: %s",
+                    name,
+                    e,
+                    extra=self._log_extra,
+                )
         else:
-            logger.warning("Bybit API credentials not found.")
+            logger.warning(
+                "Bybit API credentials not found for %s.", name, extra=self._log_extra
+            )
 
     def get_balance_usd(self) -> float:
         """
@@ -44,36 +50,64 @@ class BybitClient:
         endpoint is unavailable for the current API key or SDK.
         """
         if not self.client:
-            logger.error("Bybit client not initialized.")
+            logger.error("Bybit client not initialized.", extra=self._log_extra)
             raise RuntimeError("Bybit client not initialized")
 
         try:
             return self._get_asset_overview_balance_usd()
 
+        except RateLimitExceeded:
+            # Out of budget — the fallback would only spend more requests
+            raise
         except Exception as e:
             logger.warning(
                 "Bybit asset overview failed, falling back to legacy balance "
-                f"aggregation: {e}"
+                "aggregation: %s",
+                e,
+                extra=self._log_extra,
             )
+            perf.fallback("bybit", "legacy_wallets")
             try:
                 unified_total_usd = self._get_unified_balance_usd()
                 fund_total_usd = self._get_fund_balance_usd()
                 return unified_total_usd + fund_total_usd
             except Exception as fallback_error:
-                logger.error(f"Error fetching Bybit balance: {fallback_error}")
+                logger.error(
+                    "Error fetching Bybit balance: %s",
+                    fallback_error,
+                    extra=self._log_extra,
+                )
                 raise
 
+    def get_account_snapshot(self, include_coins: bool = False) -> tuple[float, dict]:
+        """Return (total USD equity, {coin: quantity}); coins only if requested."""
+        total_usd = self.get_balance_usd()
+        coins = self.get_coin_balances() if include_coins else {}
+        return total_usd, coins
+
+    def get_coin_balances(self) -> dict:
+        """Coin quantities across the Unified Trading and Funding wallets."""
+        if not self.client:
+            raise RuntimeError("Bybit client not initialized")
+
+        holdings = self._get_unified_holdings()
+        for coin, qty in self._get_fund_holdings().items():
+            holdings[coin] = holdings.get(coin, 0.0) + qty
+        return holdings
+
     def _get_asset_overview_balance_usd(self) -> float:
-        response = self.client._submit_request(
-            method="GET",
-            path=f"{self.client.endpoint}{self.ASSET_OVERVIEW_PATH}",
-            query={"valuationCurrency": "USD"},
-            auth=True,
-        )
+        rate_limiter.acquire("bybit")
+        with perf.api_call("bybit", "asset_overview"):
+            response = self.client._submit_request(
+                method="GET",
+                path=f"{self.client.endpoint}{self.ASSET_OVERVIEW_PATH}",
+                query={"valuationCurrency": "USD"},
+                auth=True,
+            )
 
         if response.get("retCode") != 0:
             msg = f"Bybit asset overview API Error: {response.get('retMsg')}"
-            logger.error(msg)
+            logger.error(msg, extra=self._log_extra)
             raise RuntimeError(msg)
 
         result = response.get("result", {})
@@ -84,7 +118,10 @@ class BybitClient:
 
         account_list = result.get("list", [])
         if not account_list:
-            logger.warning("Bybit asset overview: No accounts found in response.")
+            logger.warning(
+                "Bybit asset overview: No accounts found in response.",
+                extra=self._log_extra,
+            )
             return 0.0
 
         return sum(float(account.get("totalEquity") or 0.0) for account in account_list)
@@ -92,72 +129,71 @@ class BybitClient:
     def _get_unified_balance_usd(self) -> float:
         # Request the UNIFIED account from Bybit. This is the trading account
         # equity that the previous bot version already used.
-        response = self.client.get_wallet_balance(accountType="UNIFIED")
+        rate_limiter.acquire("bybit")
+        with perf.api_call("bybit", "wallet_balance"):
+            response = self.client.get_wallet_balance(accountType="UNIFIED")
 
         if response.get("retCode") != 0:
             msg = f"Bybit UNIFIED API Error: {response.get('retMsg')}"
-            logger.error(msg)
+            logger.error(msg, extra=self._log_extra)
             raise RuntimeError(msg)
 
         result = response.get("result", {})
         list_accounts = result.get("list", [])
 
         if not list_accounts:
-            logger.warning("Bybit UNIFIED: No accounts found in response.")
+            logger.warning(
+                "Bybit UNIFIED: No accounts found in response.", extra=self._log_extra
+            )
             return 0.0
 
         account_info = list_accounts[0]
         return float(account_info.get("totalEquity", 0.0))
 
+    def _get_unified_holdings(self) -> dict:
+        rate_limiter.acquire("bybit")
+        with perf.api_call("bybit", "wallet_balance"):
+            response = self.client.get_wallet_balance(accountType="UNIFIED")
+
+        if response.get("retCode") != 0:
+            msg = f"Bybit UNIFIED API Error: {response.get('retMsg')}"
+            logger.error(msg, extra=self._log_extra)
+            raise RuntimeError(msg)
+
+        holdings = {}
+        for account in response.get("result", {}).get("list", [])[:1]:
+            for balance in account.get("coin", []):
+                coin = (balance.get("coin") or "").upper()
+                wallet_balance = float(balance.get("walletBalance") or 0.0)
+                if coin and wallet_balance > 0:
+                    holdings[coin] = holdings.get(coin, 0.0) + wallet_balance
+        return holdings
+
     def _get_fund_balance_usd(self) -> float:
+        holdings = self._get_fund_holdings()
+
+        # One cached bulk lookup prices every coin in the wallet
+        prices = get_price_oracle().get_usd_prices(holdings)
+        # Coins no venue can price are logged by the oracle and count as 0
+        return sum(qty * prices.get(coin, 0.0) for coin, qty in holdings.items())
+
+    def _get_fund_holdings(self) -> dict:
         # Request the FUND account from Bybit. The mobile app total can include
         # this wallet, but it is not included in UNIFIED totalEquity.
-        response = self.client.get_coins_balance(accountType="FUND")
+        rate_limiter.acquire("bybit")
+        with perf.api_call("bybit", "fund_balance"):
+            response = self.client.get_coins_balance(accountType="FUND")
 
         if response.get("retCode") != 0:
             msg = f"Bybit FUND API Error: {response.get('retMsg')}"
-            logger.error(msg)
+            logger.error(msg, extra=self._log_extra)
             raise RuntimeError(msg)
 
         balances = response.get("result", {}).get("balance", [])
-        total_fund_usd = 0.0
-
+        holdings = {}
         for balance in balances:
-            coin = balance.get("coin", "")
+            coin = (balance.get("coin") or "").upper()
             wallet_balance = float(balance.get("walletBalance") or 0.0)
-            if wallet_balance <= 0:
-                continue
-
-            usd_rate = self._get_coin_usd_rate(coin)
-            total_fund_usd += wallet_balance * usd_rate
-
-        return total_fund_usd
-
-    def _get_coin_usd_rate(self, coin: str) -> float:
-        coin = (coin or "").upper()
-        if not coin:
-            return 0.0
-
-        if coin in self.STABLECOINS_1_TO_1_USD:
-            return 1.0
-
-        for quote_coin in ("USDT", "USDC"):
-            if coin == quote_coin:
-                return 1.0
-
-            response = self.client.get_tickers(
-                category="spot", symbol=f"{coin}{quote_coin}"
-            )
-            if response.get("retCode") != 0:
-                continue
-
-            tickers = response.get("result", {}).get("list", [])
-            if not tickers:
-                continue
-
-            last_price = tickers[0].get("lastPrice")
-            if last_price:
-                return float(last_price)
-
-        logger.warning(f"Bybit FUND: Could not price coin {coin} in USD. Ignoring it.")
-        return 0.0
+            if coin and wallet_balance > 0:
+                holdings[coin] = holdings.get(coin, 0.0) + wallet_balance
+        return holdings
@@ -0,0 +1,400 @@
+"""
+crypto_streams.py — live crypto equity over Bybit and OKX private WebSockets.
+
+Each stream logs in, subscribes to the balance channel (Bybit `wallet`,
+OKX `account`) and keeps the latest equity and coin quantities in memory,
+so snapshots can read crypto balances without any REST call. After every
+(re)connect — i.e. after any gap in the stream — and every
+STREAM_RESYNC_MINUTES the value is resynced over REST; until such a resync
+succeeds the stream is not trusted and snapshots use REST. Reconnects use
+exponential backoff with jitter.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+
+import websockets
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# _parse_equity result for a balance push whose equity field is empty
+UNVALUED = object()
+
+
+class _PrivateBalanceStream:
+    """Shared connect / login / reconnect / resync loop for one exchange."""
+
+    NAME = ""
+    HEARTBEAT_SECONDS = 20
+    RESYNC_RETRY_SECONDS = 60
+
+    def __init__(self, client, url: str):
+        self.client = client
+        self.url = url
+        self.connected = False
+        self.updated_at: float | None = None  # monotonic time of last value
+        # Structured fields of this stream's log lines (see LOG_FORMAT=json)
+        self._log_extra = {"platform": self.NAME.lower(), "account": client.name}
+
+        self._live = None  # equity reported by the stream itself
+        self._offset = 0.0  # REST-only part of the balance (see subclasses)
+        self._coins = None  # {coin: quantity} reported by the stream itself
+        self._coin_offset = {}  # REST-only holdings (see subclasses)
+        self._last_resync = 0.0
+        self._synced = False  # a REST resync succeeded since the last connect
+        self._task: asyncio.Task | None = None
+        self._resync_task: asyncio.Task | None = None
+
+    # --- public API ---------------------------------------------------
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"{self.NAME}-stream")
+
+    async def stop(self) -> None:
+        for task in (self._task, self._resync_task):
+            if task:
+                task.cancel()
+        if self._task:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.connected = False
+
+    def get_equity(self) -> float | None:
+        """Live USD equity, or None when the stream cannot be trusted."""
+        if not self.connected or not self._synced or self._live is None:
+            return None
+        return self._live + self._offset
+
+    def get_coins(self) -> dict | None:
+        """Live {coin: quantity}, or None when the stream cannot be trusted."""
+        if not self.connected or not self._synced or self._coins is None:
+            return None
+        coins = dict(self._coins)
+        for coin, qty in self._coin_offset.items():
+            coins[coin] = coins.get(coin, 0.0) + qty
+        return coins
+
+    # --- connection loop ----------------------------------------------
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.url, open_timeout=10) as ws:
+                    await self._login(ws)
+                    await self._subscribe(ws)
+                    logger.info("%s stream connected", self.NAME, extra=self._log_extra)
+                    backoff = 1.0
+
+                    # Anything may have changed while we were disconnected
+                    self._synced = False
+                    await self._resync()
+                    self.connected = True
+
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        async for raw in ws:
+                            self._handle_raw(raw)
+                            self._maybe_schedule_resync()
+                    finally:
+                        heartbeat.cancel()
+                logger.warning(
+                    "%s stream closed by server", self.NAME, extra=self._log_extra
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    "%s stream error: %s", self.NAME, e, extra=self._log_extra
+                )
+            finally:
+                self.connected = False
+
+            delay = backoff + random.uniform(0, backoff / 2)
+            logger.info(
+                "%s stream reconnecting in %.1fs",
+                self.NAME,
+                delay,
+                extra=self._log_extra,
+            )
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, Config.STREAM_MAX_BACKOFF_SECONDS)
+
+    async def _heartbeat(self, ws) -> None:
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_SECONDS)
+            await ws.send(self._ping_message())
+
+    def _handle_raw(self, raw) -> None:
+        if raw == "pong":
+            return
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.debug(
+                "%s stream: ignoring non-JSON frame %r",
+                self.NAME,
+                raw,
+                extra=self._log_extra,
+            )
+            return
+        equity = self._parse_equity(message)
+        if equity is UNVALUED:
+            # Let snapshots use REST until a valued push or resync, not say $0
+            self._live = None
+        elif equity is not None:
+            self._live = equity
+            self.updated_at = time.monotonic()
+        coins = self._parse_coins(message)
+        if coins is not None:
+            self._coins = coins
+
+    def _maybe_schedule_resync(self) -> None:
+        interval = Config.STREAM_RESYNC_MINUTES * 60
+        if not self._synced:
+            # Not trusted until a resync succeeds: retry sooner
+            interval = min(interval, self.RESYNC_RETRY_SECONDS)
+        due = time.monotonic() - self._last_resync >= interval
+        if due and (self._resync_task is None or self._resync_task.done()):
+            self._resync_task = asyncio.create_task(self._resync())
+
+    async def _resync(self) -> None:
+        """
+        Re-read the balance over REST in a worker thread, then apply it here
+        on the loop. A push that arrived meanwhile is newer than the REST
+        reading, so it is kept; the REST-only offsets are always applied.
+        """
+        self._last_resync = time.monotonic()
+        pushed_at = self.updated_at
+        try:
+            values = await asyncio.to_thread(self._rest_resync)
+            if self.updated_at == pushed_at:
+                self._live = values["live"]
+                if "coins" in values:
+                    self._coins = values["coins"]
+            self._offset = values.get("offset", 0.0)
+            if "coin_offset" in values:
+                self._coin_offset = values["coin_offset"]
+            self._synced = True
+            self.updated_at = time.monotonic()
+            logger.info(
+                "%s stream resynced over REST", self.NAME, extra=self._log_extra
+            )
+        except Exception as e:
+            # Keep streaming; the next gap or interval retries the resync
+            logger.warning(
+                "%s REST resync failed: %s", self.NAME, e, extra=self._log_extra
+            )
+
+    async def _expect(self, ws, predicate, what: str) -> dict:
+        """Read frames until one satisfies `predicate`, failing after a timeout."""
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"{self.NAME} stream: no {what} reply") from None
+            if raw == "pong":
+                continue
+            message = json.loads(raw)
+            if predicate(message):
+                return message
+            self._handle_raw(raw)
+
+    # --- exchange specifics -------------------------------------------
+
+    async def _login(self, ws) -> None:
+        raise NotImplementedError
+
+    async def _subscribe(self, ws) -> None:
+        raise NotImplementedError
+
+    def _parse_equity(self, message: dict):
+        """
+        Equity from a balance push: a float, UNVALUED if the push has an
+        empty equity field, or None if the message is not a balance push.
+        """
+        raise NotImplementedError
+
+    def _parse_coins(self, message: dict) -> dict | None:
+        """New {coin: quantity} from a balance push, or None if it has none."""
+        raise NotImplementedError
+
+    def _ping_message(self) -> str:
+        raise NotImplementedError
+
+    def _rest_resync(self) -> dict:
+        """
+        Read the balance over REST (runs in a worker thread, so it must not
+        touch the stream's state): {"live": equity the stream also reports,
+        "offset": REST-only equity, "coins": {coin: qty} the stream also
+        reports, "coin_offset": REST-only {coin: qty}}. Only "live" is required.
+        """
+        raise NotImplementedError
+
+
+class BybitWalletStream(_PrivateBalanceStream):
+    """
+    Bybit v5 private `wallet` topic.
+
+    The topic only reports the Unified Trading account, while REST also counts
+    Funding and other buckets. The REST-only part (equity and, with the crypto
+    breakdown on, Funding coins) is kept as an offset refreshed on every resync.
+    """
+
+    NAME = "Bybit"
+
+    def __init__(self, client):
+        super().__init__(client, Config.BYBIT_WS_URL)
+
+    async def _login(self, ws) -> None:
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(
+            self.client.api_secret.encode(),
+            f"GET/realtime{expires}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        await ws.send(
+            json.dumps(
+                {"op": "auth", "args": [self.client.api_key, expires, signature]}
+            )
+        )
+        reply = await self._expect(ws, lambda m: m.get("op") == "auth", "auth")
+        if not reply.get("success"):
+            raise RuntimeError(f"Bybit stream auth failed: {reply.get('ret_msg')}")
+
+    async def _subscribe(self, ws) -> None:
+        await ws.send(json.dumps({"op": "subscribe", "args": ["wallet"]}))
+        reply = await self._expect(
+            ws, lambda m: m.get("op") == "subscribe", "subscribe"
+        )
+        if not reply.get("success"):
+            raise RuntimeError(f"Bybit wallet subscribe failed: {reply.get('ret_msg')}")
+
+    def _parse_equity(self, message: dict):
+        if message.get("topic") != "wallet":
+            return None
+        for account in message.get("data", []):
+            if account.get("accountType") == "UNIFIED":
+                equity = account.get("totalEquity")
+                return float(equity) if equity else UNVALUED
+        return None
+
+    def _parse_coins(self, message: dict) -> dict | None:
+        if message.get("topic") != "wallet":
+            return None
+        for account in message.get("data", []):
+            if account.get("accountType") == "UNIFIED" and "coin" in account:
+                # Every push lists all of the account's coins
+                holdings = {}
+                for balance in account["coin"]:
+                    coin = (balance.get("coin") or "").upper()
+                    qty = float(balance.get("walletBalance") or 0.0)
+                    if coin and qty > 0:
+                        holdings[coin] = holdings.get(coin, 0.0) + qty
+                return holdings
+        return None
+
+    def _ping_message(self) -> str:
+        return json.dumps({"op": "ping"})
+
+    def _rest_resync(self) -> dict:
+        total = self.client.get_balance_usd()
+        unified = self.client._get_unified_balance_usd()
+        values = {"live": unified, "offset": total - unified}
+        if Config.INCLUDE_CRYPTO_BREAKDOWN:
+            values["coins"] = self.client._get_unified_holdings()
+            values["coin_offset"] = self.client._get_fund_holdings()
+        return values
+
+
+class OkxAccountStream(_PrivateBalanceStream):
+    """OKX v5 private `account` channel; `totalEq` is the full USD equity."""
+
+    NAME = "OKX"
+
+    def __init__(self, client):
+        super().__init__(client, Config.OKX_WS_URL)
+
+    async def _login(self, ws) -> None:
+        timestamp = str(int(time.time()))
+        digest = hmac.new(
+            self.client.api_secret.encode(),
+            f"{timestamp}GET/users/self/verify".encode(),
+            hashlib.sha256,
+        ).digest()
+        args = {
+            "apiKey": self.client.api_key,
+            "passphrase": self.client.passphrase,
+            "timestamp": timestamp,
+            "sign": base64.b64encode(digest).decode(),
+        }
+        await ws.send(json.dumps({"op": "login", "args": [args]}))
+        reply = await self._expect(
+            ws, lambda m: m.get("event") in ("login", "error"), "login"
+        )
+        if reply.get("event") != "login" or reply.get("code") != "0":
+            raise RuntimeError(f"OKX stream login failed: {reply.get('msg')}")
+
+    async def _subscribe(self, ws) -> None:
+        await ws.send(json.dumps({"op": "subscribe", "args": [{"channel": "account"}]}))
+        reply = await self._expect(
+            ws, lambda m: m.get("event") in ("subscribe", "error"), "subscribe"
+        )
+        if reply.get("event") != "subscribe":
+            raise RuntimeError(f"OKX account subscribe failed: {reply.get('msg')}")
+
+    def _parse_equity(self, message: dict):
+        if message.get("arg", {}).get("channel") != "account":
+            return None
+        data = message.get("data", [])
+        if not data:
+            return None
+        equity = data[0].get("totalEq")
+        # Empty on some account modes: a push may then list only the changed
+        # currencies, so it cannot be valued here; REST values it per currency
+        return float(equity) if equity else UNVALUED
+
+    def _parse_coins(self, message: dict) -> dict | None:
+        if message.get("arg", {}).get("channel") != "account":
+            return None
+        data = message.get("data", [])
+        if not data or "details" not in data[0]:
+            return None
+        # Event-driven pushes may list only the currencies that changed
+        holdings = dict(self._coins or {})
+        for detail in data[0]["details"]:
+            coin = (detail.get("ccy") or "").upper()
+            qty = float(detail.get("eq") or 0.0)
+            if not coin:
+                continue
+            if qty > 0:
+                holdings[coin] = qty
+            else:
+                holdings.pop(coin, None)
+        return holdings
+
+    def _ping_message(self) -> str:
+        return "ping"
+
+    def _rest_resync(self) -> dict:
+        # One balance request carries both the equity and the coins
+        equity, coins = self.client.get_account_snapshot(
+            Config.INCLUDE_CRYPTO_BREAKDOWN
+        )
+        values = {"live": equity}
+        if Config.INCLUDE_CRYPTO_BREAKDOWN:
+            values["coins"] = coins
+        return values
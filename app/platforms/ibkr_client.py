@@ -2,34 +2,40 @@ import logging
 import json
 import os
 import time
-import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from requests.exceptions import ConnectionError, Timeout
 from app.config import Config
+from app.utils import http, perf, rate_limiter
+from app.utils.rate_limiter import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
+# Structured fields of every log line below (see LOG_FORMAT=json)
+_LOG_EXTRA = {"platform": "ibkr"}
 
 
 class IBKRClient:
-    def __init__(self):
-        self.token = Config.IBKR_FLEX_TOKEN
-        self.query_id = Config.IBKR_QUERY_ID
-        self.base_url = "https://www.interactivebrokers.com/Universal/servlet/FlexStatementService.SendRequest"
-        self.download_url = "https://www.interactivebrokers.com/Universal/servlet/FlexStatementService.GetStatement"
-        self.cache_file = os.path.join(
+    def __init__(self, token=None, query_id=None, cache_file=None):
+        self.token = Config.IBKR_FLEX_TOKEN if token is None else token
+        self.query_id = Config.IBKR_QUERY_ID if query_id is None else query_id
+        servlet = Config.IBKR_FLEX_BASE_URL.rstrip("/")
+        self.base_url = f"{servlet}/FlexStatementService.SendRequest"
+        self.download_url = f"{servlet}/FlexStatementService.GetStatement"
+        self.cache_file = cache_file or os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
             "data",
             "ibkr_cache.json",
         )
 
         if not self.token or not self.query_id:
-            logger.warning("IBKR Flex credentials not set.")
+            logger.warning("IBKR Flex credentials not set.", extra=_LOG_EXTRA)
 
-    def get_portfolio_summary(self) -> dict:
+    def get_portfolio_summary(self, force_refresh: bool = False) -> dict:
         """
         Fetches the portfolio summary via Flex Query.
         Retries up to 3 times on transient network/DNS errors.
+        `force_refresh` bypasses the daily cache (used by the scheduled
+        pre-window refresh).
         Returns:
             {"total_usd": float, "error": str|None}
         """
@@ -37,17 +43,20 @@ class IBKRClient:
             return {"total_usd": 0.0}
 
         cached = self._load_cache()
-        if cached and not self._should_refresh_cache(cached):
+        if cached and not force_refresh and not self._should_refresh_cache(cached):
+            perf.cache_lookup("ibkr", "hit")
             logger.info(
                 "Using cached IBKR Flex result from %s (report date: %s)",
                 cached.get("fetched_at", "?"),
                 cached.get("report_date", "?"),
+                extra={**_LOG_EXTRA, "cache_hit": True},
             )
             return {
                 "total_usd": cached.get("total_usd", 0.0),
                 "report_date": cached.get("report_date"),
             }
 
+        perf.cache_lookup("ibkr", "miss")
         last_error: Exception | None = None
         for attempt in range(3):
             try:
@@ -55,22 +64,52 @@ class IBKRClient:
                 if "error" not in result:
                     self._save_cache(result)
                 return result
+            except RateLimitExceeded as e:
+                if not cached:
+                    raise
+                logger.warning(
+                    "IBKR request budget exhausted, serving cached result: %s",
+                    e,
+                    extra={**_LOG_EXTRA, "cache_hit": True},
+                )
+                perf.fallback("ibkr", "cache")
+                return {
+                    "total_usd": cached.get("total_usd", 0.0),
+                    "report_date": cached.get("report_date"),
+                }
             except (ConnectionError, Timeout, OSError) as e:
                 last_error = e
                 if attempt < 2:
+                    perf.retry("ibkr")
                     wait = 2 ** (attempt + 1)  # 2 s, then 4 s
                     logger.warning(
-                        f"IBKR network error (attempt {attempt + 1}/3), retrying in {wait}s: {e}"
+                        "IBKR network error (attempt %d/3), retrying in %ds: %s",
+                        attempt + 1,
+                        wait,
+                        e,
+                        extra={**_LOG_EXTRA, "attempt": attempt + 1},
                     )
                     time.sleep(wait)
             except Exception as e:
                 # Non-retryable error (e.g. bad XML, HTTP 4xx) — fail immediately
-                logger.error(f"IBKR Flex Query Error: {e}")
+                logger.error(
+                    "IBKR Flex Query Error: %s",
+                    e,
+                    extra={**_LOG_EXTRA, "attempt": attempt + 1},
+                )
                 return {"total_usd": 0.0, "error": str(e)}
 
-        logger.error(f"IBKR: all 3 attempts failed: {last_error}")
+        logger.error(
+            "IBKR: all 3 attempts failed: %s",
+            last_error,
+            extra={**_LOG_EXTRA, "attempt": 3},
+        )
         if cached:
-            logger.warning("Falling back to cached IBKR Flex result after fetch failure.")
+            logger.warning(
+                "Falling back to cached IBKR Flex result after fetch failure.",
+                extra={**_LOG_EXTRA, "cache_hit": True},
+            )
+            perf.fallback("ibkr", "cache")
             return {
                 "total_usd": cached.get("total_usd", 0.0),
                 "report_date": cached.get("report_date"),
@@ -85,7 +124,7 @@ class IBKRClient:
             with open(self.cache_file, "r", encoding="utf-8") as f:
                 return json.load(f)
         except Exception as e:
-            logger.warning(f"Failed to read IBKR cache: {e}")
+            logger.warning("Failed to read IBKR cache: %s", e, extra=_LOG_EXTRA)
             return None
 
     def _save_cache(self, result: dict) -> None:
@@ -99,7 +138,7 @@ class IBKRClient:
             with open(self.cache_file, "w", encoding="utf-8") as f:
                 json.dump(payload, f, indent=2)
         except Exception as e:
-            logger.warning(f"Failed to write IBKR cache: {e}")
+            logger.warning("Failed to write IBKR cache: %s", e, extra=_LOG_EXTRA)
 
     def _should_refresh_cache(self, cached: dict) -> bool:
         fetched_at = cached.get("fetched_at")
@@ -128,12 +167,17 @@ class IBKRClient:
     def _fetch_report(self) -> dict:
         """Single attempt to fetch the IBKR Flex report. Raises on network errors."""
         # Step 1: Request the report
-        logger.info("Requesting IBKR Flex Report...")
-        resp = requests.get(
-            self.base_url,
-            params={"t": self.token, "q": self.query_id, "v": "3"},
-            timeout=10,
+        logger.info(
+            "Requesting IBKR Flex Report...",
+            extra={**_LOG_EXTRA, "cache_hit": False},
         )
+        rate_limiter.acquire("ibkr")
+        with perf.api_call("ibkr", "send_request"):
+            resp = http.get_session().get(
+                self.base_url,
+                params={"t": self.token, "q": self.query_id, "v": "3"},
+                timeout=10,
+            )
         resp.raise_for_status()
 
         # Parse step 1 XML
@@ -144,14 +188,20 @@ class IBKRClient:
             ref_code = root.find("ReferenceCode").text
             base_url = root.find("Url").text
 
-            logger.info(f"IBKR Report generated. Reference: {ref_code}. Downloading...")
+            logger.info(
+                "IBKR Report generated. Reference: %s. Downloading...",
+                ref_code,
+                extra=_LOG_EXTRA,
+            )
 
             # Step 2: Download the report
-            dl_resp = requests.get(
-                base_url,
-                params={"t": self.token, "q": ref_code, "v": "3"},
-                timeout=30,
-            )
+            rate_limiter.acquire("ibkr")
+            with perf.api_call("ibkr", "get_statement"):
+                dl_resp = http.get_session().get(
+                    base_url,
+                    params={"t": self.token, "q": ref_code, "v": "3"},
+                    timeout=30,
+                )
             dl_resp.raise_for_status()
 
             # Parse step 2 XML (Actual Report)
@@ -161,7 +211,7 @@ class IBKRClient:
             error_code = root.find("ErrorCode")
             error_msg = root.find("ErrorMessage")
             msg = f"IBKR Error {error_code.text if error_code is not None else '?'}: {error_msg.text if error_msg is not None else '?'}"
-            logger.error(msg)
+            logger.error(msg, extra=_LOG_EXTRA)
             return {"total_usd": 0.0, "error": msg}
 
     def _parse_report(self, xml_content) -> dict:
@@ -231,7 +281,9 @@ class IBKRClient:
                 # Collect tags from flex_stmt children
                 tags_found = [elem.tag for elem in flex_stmt]
                 logger.warning(
-                    f"Could not find NAV in IBKR report. Tags in FlexStatement: {tags_found}"
+                    "Could not find NAV in IBKR report. Tags in FlexStatement: %s",
+                    tags_found,
+                    extra=_LOG_EXTRA,
                 )
                 if equity_summary is not None:
                     # Log attributes of EquitySummaryInBase itself? No, incorrect. Just log entries if any.
@@ -247,5 +299,5 @@ class IBKRClient:
             return {"total_usd": nav, "report_date": report_date}
 
         except Exception as e:
-            logger.error(f"Error parsing IBKR XML: {e}")
+            logger.error("Error parsing IBKR XML: %s", e, extra=_LOG_EXTRA)
             return {"total_usd": 0.0, "error": f"Parse Error: {e}"}
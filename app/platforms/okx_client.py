@@ -1,15 +1,18 @@
 import logging
 from okx.restapi.Account import AccountClient
 from app.config import Config
+from app.platforms.price_oracle import get_price_oracle
+from app.utils import perf, rate_limiter
 
 logger = logging.getLogger(__name__)
 
 
 class OkxClient:
-    def __init__(self):
-        self.api_key = Config.OKX_API_KEY
-        self.api_secret = Config.OKX_API_SECRET
-        self.passphrase = Config.OKX_API_PASSPHRASE
+    def __init__(self, api_key=None, api_secret=None, passphrase=None, name="Main"):
+        self.name = name
+        self.api_key = api_key or Config.OKX_API_KEY
+        self.api_secret = api_secret or Config.OKX_API_SECRET
+        self.passphrase = passphrase or Config.OKX_API_PASSPHRASE
         # simulation=False for live, True for testnet.
         # For now assuming live as per PRD "default".
         self.simulation = False
@@ -23,23 +26,37 @@ class OkxClient:
                     apisecret=self.api_secret,
                     passphrase=self.passphrase,
                     simulation=self.simulation,
+                    domain=Config.OKX_REST_URL.rstrip("/"),
                 )
             except Exception as e:
-                logger.error(f"Failed to initialize OKX client: {e}")
+                logger.error(f"Failed to initialize OKX client {name}: {e}")
         else:
-            logger.warning("OKX API credentials not found.")
+            logger.warning(f"OKX API credentials not found for {name}.")
 
     def get_balance_usd(self) -> float:
         """
         Fetches the total equity in USD from the OKX Account.
         """
+        return self.get_account_snapshot()[0]
+
+    def get_coin_balances(self) -> dict:
+        """Coin quantities (equity per currency) of the trading account."""
+        return self.get_account_snapshot(include_coins=True)[1]
+
+    def get_account_snapshot(self, include_coins: bool = False) -> tuple[float, dict]:
+        """
+        Return (total USD equity, {coin: quantity}) from a single balance
+        request; coins are only collected if requested.
+        """
         if not self.client:
             logger.error("OKX client not initialized.")
             raise RuntimeError("OKX client not initialized")
 
         try:
             # Get Balance
-            result = self.client.get_balance()
+            rate_limiter.acquire("okx")
+            with perf.api_call("okx", "balance"):
+                result = self.client.get_balance()
 
             # result example: {'code': '0', 'data': [{'totalEq': '...', ...}], 'msg': ''}
 
@@ -52,14 +69,43 @@ class OkxClient:
             data = result.get("data", [])
             if not data:
                 logger.warning("OKX: No data found in balance response.")
-                return 0.0
+                return 0.0, {}
+
+            details = data[0].get("details", [])
+            coins = {}
+            if include_coins:
+                for detail in details:
+                    coin = (detail.get("ccy") or "").upper()
+                    qty = float(detail.get("eq") or 0.0)
+                    if coin and qty > 0:
+                        coins[coin] = coins.get(coin, 0.0) + qty
 
             # data[0] contains the account overview
             # totalEq: Total equity in USD
-            total_equity = data[0].get("totalEq", 0.0)
+            total_equity = data[0].get("totalEq")
+            if total_equity:
+                return float(total_equity), coins
 
-            return float(total_equity)
+            # totalEq can be empty for some account modes; value per currency
+            perf.fallback("okx", "per_currency_valuation")
+            return self._value_details(details), coins
 
         except Exception as e:
             logger.error(f"Error fetching OKX balance: {e}")
             raise
+
+    def _value_details(self, details: list) -> float:
+        """Sum per-currency equity, using eqUsd when given, else oracle prices."""
+        total = 0.0
+        unpriced = {}
+        for detail in details:
+            if detail.get("eqUsd"):
+                total += float(detail["eqUsd"])
+            elif detail.get("eq"):
+                coin = detail.get("ccy", "").upper()
+                unpriced[coin] = unpriced.get(coin, 0.0) + float(detail["eq"])
+
+        if unpriced:
+            prices = get_price_oracle().get_usd_prices(unpriced)
+            total += sum(qty * prices.get(coin, 0.0) for coin, qty in unpriced.items())
+        return total
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+
+from app.config import Config
+from app.utils import http, perf, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class PriceOracle:
+    """
+    USD prices for crypto coins, shared by all exchange clients.
+
+    Each venue's prices come from ONE bulk spot-tickers request that is cached
+    for PRICE_CACHE_TTL_SECONDS, so pricing a whole wallet costs at most one
+    request per venue per TTL window. Coins missing on the first venue fall
+    back to the next one.
+    """
+
+    STABLECOINS_1_TO_1_USD = {
+        "USD",
+        "USDT",
+        "USDC",
+        "USDE",
+        "USDD",
+        "FDUSD",
+        "PYUSD",
+        "TUSD",
+    }
+
+    # Quote currencies accepted as USD, in order of preference
+    USD_QUOTES = ("USDT", "USDC")
+
+    VENUES = ("bybit", "okx")
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._session = http.get_session()
+        self._tables = {}  # venue -> (fetched_at monotonic, {coin: usd price})
+        self._locks = {venue: threading.Lock() for venue in self.VENUES}
+
+    def get_usd_price(self, coin: str) -> float:
+        return self.get_usd_prices([coin]).get((coin or "").upper(), 0.0)
+
+    def get_usd_prices(self, coins) -> dict:
+        """
+        Return {COIN: usd_price} for every coin that could be priced.
+        Coins that no venue lists are logged and left out.
+        """
+        prices = {}
+        missing = set()
+        for coin in coins:
+            coin = (coin or "").upper()
+            if not coin:
+                continue
+            if coin in self.STABLECOINS_1_TO_1_USD:
+                prices[coin] = 1.0
+            else:
+                missing.add(coin)
+
+        for venue in self.VENUES:
+            if not missing:
+                break
+            table = self._get_table(venue)
+            for coin in list(missing):
+                if coin in table:
+                    prices[coin] = table[coin]
+                    missing.discard(coin)
+
+        if missing:
+            logger.warning(f"Price oracle: no USD price for {sorted(missing)}")
+        return prices
+
+    def _get_table(self, venue: str) -> dict:
+        # One lock per venue: concurrent callers share a single bulk request
+        with self._locks[venue]:
+            cached = self._tables.get(venue)
+            if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+                self.hits += 1
+                perf.cache_lookup("price_oracle", "hit")
+                return cached[1]
+
+            self.misses += 1
+            perf.cache_lookup("price_oracle", "miss")
+            try:
+                fetch = self._fetch_bybit if venue == "bybit" else self._fetch_okx
+                table = fetch()
+            except Exception as e:
+                logger.warning(f"Price oracle: {venue} tickers failed: {e}")
+                if cached:
+                    perf.fallback(venue, "expired_prices")
+                # Serve the expired table rather than nothing
+                return cached[1] if cached else {}
+
+            self._tables[venue] = (time.monotonic(), table)
+            return table
+
+    def _build_table(self, pairs) -> dict:
+        """Map base coin -> price from (base, quote, price) triples."""
+        table = {}
+        rank = {}
+        for base, quote, price in pairs:
+            if quote not in self.USD_QUOTES or not price:
+                continue
+            preference = self.USD_QUOTES.index(quote)
+            if preference < rank.get(base, len(self.USD_QUOTES)):
+                table[base] = float(price)
+                rank[base] = preference
+        return table
+
+    def _fetch_bybit(self) -> dict:
+        rate_limiter.acquire("bybit")
+        with perf.api_call("bybit", "tickers"):
+            resp = self._session.get(
+                f"{Config.BYBIT_REST_URL}/v5/market/tickers",
+                params={"category": "spot"},
+                timeout=10,
+            )
+        resp.raise_for_status()
+        payload = resp.json()
+        if payload.get("retCode") != 0:
+            raise RuntimeError(payload.get("retMsg"))
+
+        pairs = []
+        for ticker in payload.get("result", {}).get("list", []):
+            symbol = ticker.get("symbol", "")
+            for quote in self.USD_QUOTES:
+                if symbol.endswith(quote):
+                    pairs.append(
+                        (symbol[: -len(quote)], quote, ticker.get("lastPrice"))
+                    )
+                    break
+        return self._build_table(pairs)
+
+    def _fetch_okx(self) -> dict:
+        rate_limiter.acquire("okx")
+        with perf.api_call("okx", "tickers"):
+            resp = self._session.get(
+                f"{Config.OKX_REST_URL}/api/v5/market/tickers",
+                params={"instType": "SPOT"},
+                timeout=10,
+            )
+        resp.raise_for_status()
+        payload = resp.json()
+        if payload.get("code") != "0":
+            raise RuntimeError(payload.get("msg"))
+
+        pairs = []
+        for ticker in payload.get("data", []):
+            base, _, quote = ticker.get("instId", "").partition("-")
+            pairs.append((base, quote, ticker.get("last")))
+        return self._build_table(pairs)
+
+
+_oracle: PriceOracle | None = None
+_oracle_lock = threading.Lock()
+
+
+def get_price_oracle() -> PriceOracle:
+    """Return the process-wide oracle, so every client shares one cache."""
+    global _oracle
+    with _oracle_lock:
+        if _oracle is None:
+            _oracle = PriceOracle(Config.PRICE_CACHE_TTL_SECONDS)
+        return _oracle
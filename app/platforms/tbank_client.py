@@ -1,6 +1,7 @@
 import logging
 from typing import Dict, List
 from decimal import Decimal
+import numpy as np
 from t_tech.invest import Client, RequestError
 from t_tech.invest.services import (
     InstrumentsService,
@@ -10,48 +11,134 @@ from t_tech.invest.services import (
 )
 from t_tech.invest.schemas import PortfolioResponse, PositionsResponse
 from app.config import Config
+from app.utils import perf, rate_limiter
+from app.utils.rate_limiter import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
 
 class TBankClient:
-    def __init__(self):
-        self.token = Config.TBANK_API_TOKEN
+    def __init__(self, token=None):
+        self.token = Config.TBANK_API_TOKEN if token is None else token
         self.client = None
 
         if not self.token:
             logger.warning("T-Bank API token not set.")
             return
 
-    def _get_usd_rub_rate(self, client: Client) -> float:
+    # BBG0013HGFT4 is widely known for USD/RUB ("USD000UTSTOM", TOM settlement)
+    USD_RUB_FIGI = "BBG0013HGFT4"
+    DEFAULT_USD_RUB_RATE = 90.0
+
+    # Instrument types valued from last prices; bonds (quoted in % of nominal),
+    # futures and currencies use the portfolio's own current_price instead
+    LAST_PRICE_TYPES = {"share", "etf"}
+
+    @staticmethod
+    def _client_options() -> dict:
+        """Redirect the SDK to TBANK_TARGET (e.g. a local stand-in) when set."""
+        return {"target": Config.TBANK_TARGET} if Config.TBANK_TARGET else {}
+
+    @staticmethod
+    def _to_float(value) -> float:
+        """Convert a Quotation / MoneyValue (units, nano) to float."""
+        if value is None:
+            return 0.0
+        return value.units + value.nano / 1e9
+
+    def _get_last_prices(
+        self, client: Client, figis: list[str], times: dict | None = None
+    ) -> dict:
         """
-        Fetches the current USDRUB rate using the order book or last price.
-        We look for the 'USD000UTSTOM' ticker or similar, or just 'USD' currency instrument.
-        Common figi for USD/RUB: 'BBG0013HGFT4' (Tinkoff) but better to search by ticker 'USDRUB'
+        Fetch last prices for all `figis` with ONE batched request.
+        Returns {figi: price}; missing instruments are simply absent.
+        If given, `times` is filled with {figi: time of the last price}.
         """
         try:
-            # Search for the instrument
-            instruments: InstrumentsService = client.instruments
-            # "USD000UTSTOM" is the usual ticker for TOM settlement
-            # But let's try to find it dynamically or use a known FIGI.
-            # BBG0013HGFT4 is widely known for USD/RUB
-            usd_rub_figi = "BBG0013HGFT4"
-
             market_data: MarketDataService = client.market_data
-            last_price_response = market_data.get_last_prices(figi=[usd_rub_figi])
+            rate_limiter.acquire("tbank")
+            with perf.api_call("tbank", "get_last_prices"):
+                response = market_data.get_last_prices(figi=figis)
+            if times is not None:
+                times.update(
+                    (lp.figi, getattr(lp, "time", None)) for lp in response.last_prices
+                )
+            return {
+                lp.figi: self._to_float(lp.price)
+                for lp in response.last_prices
+                if lp.price is not None
+            }
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching last prices: {e}")
+            return {}
 
-            if last_price_response.last_prices:
-                price_obj = last_price_response.last_prices[0].price
-                # Price is Quotation (units, nano)
-                price = price_obj.units + price_obj.nano / 1e9
-                return float(price)
+    def _collect_positions(self, portfolio, positions: dict) -> None:
+        """Merge a portfolio's positions into `positions`, deduplicated by FIGI."""
+        for pos in getattr(portfolio, "positions", None) or []:
+            quantity = self._to_float(pos.quantity)
+            if not quantity:
+                continue
+            entry = positions.get(pos.figi)
+            if entry is None:
+                price = pos.current_price
+                entry = positions[pos.figi] = {
+                    "figi": pos.figi,
+                    "ticker": getattr(pos, "ticker", None) or pos.figi,
+                    "type": pos.instrument_type,
+                    "currency": (price.currency if price else "rub").lower(),
+                    # Per-unit value in instrument currency, incl. accrued coupon
+                    "fallback_price": self._to_float(price)
+                    + self._to_float(getattr(pos, "current_nkd", None)),
+                    "quantity": 0.0,
+                }
+            entry["quantity"] += quantity
 
-            logger.warning("Could not fetch USDRUB rate, defaulting to 90.0")
-            return 90.0  # Fallback
+    def _value_positions(
+        self, positions: dict, last_prices: dict, usd_rub_rate: float
+    ) -> list[dict]:
+        """Value all positions at once with numpy; returns them largest first."""
+        entries = list(positions.values())
+        if not entries:
+            return []
 
-        except Exception as e:
-            logger.error(f"Error fetching FX rate: {e}")
-            return 90.0
+        quantity = np.array([e["quantity"] for e in entries])
+        fallback = np.array([e["fallback_price"] for e in entries])
+        last = np.array(
+            [
+                (
+                    last_prices.get(e["figi"], np.nan)
+                    if e["type"] in self.LAST_PRICE_TYPES
+                    else np.nan
+                )
+                for e in entries
+            ]
+        )
+        fx_to_rub = {"rub": 1.0, "usd": usd_rub_rate}
+        fx = np.array([fx_to_rub.get(e["currency"], np.nan) for e in entries])
+
+        unit_price = np.where(np.isnan(last), fallback, last)
+        value_rub = quantity * unit_price * fx
+
+        unpriced = [e["ticker"] for e, v in zip(entries, value_rub) if np.isnan(v)]
+        if unpriced:
+            logger.warning(f"T-Bank: no RUB valuation for positions {unpriced}")
+
+        valued = [
+            {
+                "figi": e["figi"],
+                "ticker": e["ticker"],
+                "type": e["type"],
+                "quantity": e["quantity"],
+                "rub": round(float(v), 2),
+                "usd": round(float(v) / usd_rub_rate, 2),
+            }
+            for e, v in zip(entries, value_rub)
+            if not np.isnan(v)
+        ]
+        valued.sort(key=lambda e: e["rub"], reverse=True)
+        return valued
 
     def get_portfolio_summary(self) -> Dict:
         """
@@ -59,37 +146,73 @@ class TBankClient:
         - total_rub: Total portfolio value in RUB
         - total_usd: Total portfolio value in USD (converted)
         - accounts: List of per-account dicts [{"name": str, "rub": float}, ...]
+        - positions: (TBANK_POSITIONS_MODE only) per-instrument values across
+          all accounts, largest first
+
+        Prices (the USD/RUB rate and, in positions mode, every instrument) are
+        fetched with a single batched get_last_prices call per snapshot.
         """
         if not self.token:
             return {"total_rub": 0.0, "total_usd": 0.0, "accounts": []}
 
         total_rub = 0.0
         accounts_list = []
+        positions_mode = Config.TBANK_POSITIONS_MODE
+        positions = {}
+        valued_positions = []
 
         try:
-            with Client(self.token) as client:
+            with Client(self.token, **self._client_options()) as client:
                 # 1. Get Accounts
                 users: UsersService = client.users
-                accounts = users.get_accounts().accounts
-
-                # 2. Get FX Rate
-                usd_rub_rate = self._get_usd_rub_rate(client)
-                if usd_rub_rate <= 0:
-                    usd_rub_rate = 90.0
+                rate_limiter.acquire("tbank")
+                with perf.api_call("tbank", "get_accounts"):
+                    accounts = users.get_accounts().accounts
 
-                # 3. Iterate accounts
+                # 2. Get portfolios (positions are part of the same response)
                 operations: OperationsService = client.operations
-
+                portfolios = []
                 for account in accounts:
-                    # Get Portfolio
-                    portfolio: PortfolioResponse = operations.get_portfolio(
-                        account_id=account.id
+                    rate_limiter.acquire("tbank")
+                    with perf.api_call("tbank", "get_portfolio", account=account.id):
+                        portfolio: PortfolioResponse = operations.get_portfolio(
+                            account_id=account.id
+                        )
+                    portfolios.append((account, portfolio))
+                    if positions_mode:
+                        self._collect_positions(portfolio, positions)
+
+                # 3. One batched price request: FX rate + unique instruments
+                figis = [self.USD_RUB_FIGI]
+                figis += [
+                    figi
+                    for figi, entry in positions.items()
+                    if entry["type"] in self.LAST_PRICE_TYPES
+                ]
+                price_times = {}
+                last_prices = self._get_last_prices(client, figis, price_times)
+
+                usd_rub_rate = last_prices.get(self.USD_RUB_FIGI, 0.0)
+                fx = {
+                    "rate": usd_rub_rate,
+                    "source": "tbank",
+                    "as_of": price_times.get(self.USD_RUB_FIGI),
+                }
+                if usd_rub_rate <= 0:
+                    logger.warning(
+                        "Could not fetch USDRUB rate, defaulting to "
+                        f"{self.DEFAULT_USD_RUB_RATE}"
                     )
+                    usd_rub_rate = self.DEFAULT_USD_RUB_RATE
+                    fx = {"rate": usd_rub_rate, "source": "default", "as_of": None}
+                    perf.fallback("tbank", "default_usd_rub_rate")
 
+                # 4. Account totals
+                for account, portfolio in portfolios:
                     account_rub = 0.0
                     if hasattr(portfolio, "total_amount_portfolio"):
                         val = portfolio.total_amount_portfolio
-                        amount = val.units + val.nano / 1e9
+                        amount = self._to_float(val)
                         currency = val.currency.upper()
 
                         if currency == "RUB":
@@ -109,6 +232,14 @@ class TBankClient:
                         )
                     total_rub += account_rub
 
+                # 5. Per-position valuation (vectorised)
+                if positions_mode:
+                    valued_positions = self._value_positions(
+                        positions, last_prices, usd_rub_rate
+                    )
+
+        except RateLimitExceeded:
+            raise
         except RequestError as e:
             logger.error(f"T-Bank API Request Error: {e}")
             return {"total_rub": 0.0, "total_usd": 0.0, "accounts": [], "error": str(e)}
@@ -118,8 +249,12 @@ class TBankClient:
 
         total_usd = total_rub / usd_rub_rate if usd_rub_rate > 0 else 0.0
 
-        return {
+        result = {
             "total_rub": round(total_rub, 2),
             "total_usd": round(total_usd, 2),
             "accounts": accounts_list,
+            "fx": fx,
         }
+        if positions_mode:
+            result["positions"] = valued_positions
+        return result
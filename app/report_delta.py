@@ -0,0 +1,69 @@
+"""
+report_delta.py — decide whether a scheduled report is worth sending.
+
+Each new snapshot is compared with the last FULL report sent. It is
+significant when the USD total moved by at least REPORT_MIN_CHANGE_USD or
+REPORT_MIN_CHANGE_PCT, or the set of failing platforms changed. Otherwise
+the report is skipped or shortened to one line (REPORT_SUPPRESS_MODE).
+The first report of each day is always sent in full as a heartbeat.
+"""
+
+import logging
+from datetime import datetime
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+FULL = "full"
+SHORT = "short"
+SKIP = "skip"
+
+
+class ReportDelta:
+    """Per-portfolio memory of the last full report sent."""
+
+    def __init__(self):
+        self.last_usd: float | None = None
+        self.last_errors: frozenset = frozenset()
+        self.last_sent_at: datetime | None = None
+
+    @staticmethod
+    def enabled() -> bool:
+        return Config.REPORT_MIN_CHANGE_USD > 0 or Config.REPORT_MIN_CHANGE_PCT > 0
+
+    def decide(self, summary: dict, usd: float, now: datetime) -> str:
+        """Return FULL, SHORT or SKIP for a snapshot with USD total `usd`."""
+        if not self.enabled() or self.last_usd is None:
+            return FULL
+        if self.last_sent_at.date() != now.date():
+            return FULL  # daily heartbeat
+        if frozenset(summary.get("errors", {})) != self.last_errors:
+            return FULL
+
+        change = abs(usd - self.last_usd)
+        pct = change / self.last_usd * 100 if self.last_usd else 100.0
+        if Config.REPORT_MIN_CHANGE_USD > 0 and change >= Config.REPORT_MIN_CHANGE_USD:
+            return FULL
+        if Config.REPORT_MIN_CHANGE_PCT > 0 and pct >= Config.REPORT_MIN_CHANGE_PCT:
+            return FULL
+
+        return SHORT if Config.REPORT_SUPPRESS_MODE == SHORT else SKIP
+
+    def record_full(self, summary: dict, usd: float, now: datetime) -> None:
+        """Make this snapshot the baseline for the next comparison."""
+        self.last_usd = usd
+        self.last_errors = frozenset(summary.get("errors", {}))
+        self.last_sent_at = now
+
+    def short_message(self, usd: float) -> str:
+        """One-line report for a change below the thresholds."""
+        change = usd - self.last_usd
+        pct = change / self.last_usd * 100 if self.last_usd else 0.0
+        total = f"${usd:,.0f}".replace(",", " ")
+        delta = f"{change:+,.0f}".replace(",", " ")
+        return (
+            f"📊 Portfolio <code>{total}</code> "
+            f"({delta} USD, {pct:+.2f}%) — no significant change since "
+            f"{self.last_sent_at:%H:%M}"
+        )
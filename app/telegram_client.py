@@ -1,28 +1,139 @@
 import asyncio
+import html
+import io
+import json
 import logging
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 from telegram import InputFile, Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.error import NetworkError, TimedOut
+from telegram.error import BadRequest, NetworkError, TimedOut
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler
 
 from app.config import Config
-from app.aggregator import Aggregator
+from app.aggregator import StaleResultError, fx_outline
 from app import history_manager
+from app import report_delta
 from app import chart as chart_module
+from app.delivery import SendQueue
+from app.tenants import TenantRegistry
+from app.utils import metrics, profiling, rate_limiter, tracing
+from app.utils.loop_monitor import get_loop_monitor
 
 logger = logging.getLogger(__name__)
 
-# Absolute path to the history JSON — used by /export
-_HISTORY_FILE = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    "data",
-    "portfolio_history.json",
-)
+
+async def _safe_edit(edit, text: str, **kwargs) -> bool:
+    """
+    Edit a message via `edit`, treating Telegram's "message is not modified"
+    as a no-op. Returns whether the message actually changed.
+    """
+    try:
+        with tracing.span("telegram.edit"):
+            await edit(text=text, **kwargs)
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return False
+        raise
+    return True
+
+
+class _DebouncedEditor:
+    """
+    Coalesce rapid edits of a single message.
+
+    Telegram throttles message edits (roughly one per second per chat), so
+    intermediate updates are sent on the leading edge and then at most once
+    per `min_interval` seconds; only the newest pending text is kept.
+    """
+
+    def __init__(self, edit, min_interval: float, current_text: str | None = None):
+        self._edit = edit  # coroutine function, e.g. Message.edit_text
+        self._min_interval = min_interval
+        self._last_edit_at = 0.0
+        # Text the message already shows; identical edits are skipped
+        self._last_text = current_text
+        self._pending = None
+        self._flush_task = None
+        # One edit on the wire at a time, so they reach Telegram in order
+        self._sending = asyncio.Lock()
+
+    async def update(self, text: str, **kwargs) -> None:
+        """Queue an intermediate edit, sending it now if the window allows."""
+        self._pending = (text, kwargs)
+        if self._flush_task:
+            return  # a delayed flush will pick up the newest text
+
+        wait = self._last_edit_at + self._min_interval - time.monotonic()
+        if wait <= 0:
+            await self._flush()
+        else:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def finish(self, text: str, **kwargs) -> None:
+        """Send the final edit, dropping any intermediate one still queued."""
+        self._pending = None
+        task, self._flush_task = self._flush_task, None
+        if task is not None:
+            # A delayed edit still waiting is dropped; one already being sent
+            # must land before the final edit, or it would overwrite it
+            if not self._sending.locked():
+                task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        wait = self._last_edit_at + self._min_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        self._pending = (text, kwargs)
+        await self._flush(final=True)
+
+    async def _flush_later(self) -> None:
+        """Send the pending text once the window allows, until none is left."""
+        try:
+            while self._pending is not None:
+                wait = self._last_edit_at + self._min_interval - time.monotonic()
+                await asyncio.sleep(max(wait, 0))
+                await self._flush()
+        except Exception as e:
+            # Nothing may await this task, so report here rather than leaving
+            # "Task exception was never retrieved"
+            logger.warning(f"Delayed status edit failed (ignored): {e}")
+        finally:
+            if self._flush_task is asyncio.current_task():
+                self._flush_task = None
+
+    async def _flush(self, final: bool = False) -> None:
+        async with self._sending:
+            if self._pending is None:
+                return
+            text, kwargs = self._pending
+            self._pending = None
+            if text == self._last_text:
+                return
+
+            # Stamped before sending, so edits issued meanwhile wait their turn
+            self._last_edit_at = time.monotonic()
+            try:
+                await _safe_edit(self._edit, text, **kwargs)
+            except (NetworkError, TimedOut) as e:
+                if final:
+                    raise
+                # Intermediate edits are best-effort; the final one carries everything
+                logger.warning(f"Progressive status edit failed (ignored): {e}")
+                return
+
+            self._last_text = text
 
 
 class TelegramBot:
+    # How many recent summaries (per chat and per status message) to keep
+    SNAPSHOT_CACHE_SIZE = 64
+    # Added to the estimated fetch time when deciding how early to prefetch
+    PREFETCH_MARGIN_SECONDS = 2.0
+
     def __init__(self):
         self.token = Config.TELEGRAM_BOT_TOKEN
         self.chat_id = Config.TELEGRAM_CHAT_ID
@@ -30,12 +141,27 @@ class TelegramBot:
             logger.warning("Telegram token not set.")
             return
 
-        self.application = Application.builder().token(self.token).build()
-        self.aggregator = Aggregator()
+        self.application = (
+            Application.builder()
+            .token(self.token)
+            .base_url(f"{Config.TELEGRAM_API_URL}/bot")
+            .base_file_url(f"{Config.TELEGRAM_API_URL}/file/bot")
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
+        # One portfolio (aggregator + history file) per authorized chat
+        self.tenants = TenantRegistry.from_config()
+        # Rate-limited fan-out of scheduled reports
+        self.delivery = SendQueue(self.application.bot)
 
         # Current poll interval (minutes) — can be changed at runtime via /frequency
         self.poll_interval_minutes = Config.POLL_INTERVAL_MINUTES
 
+        # Recent summaries keyed by (chat_id, message_id); message_id None
+        # holds the chat's latest one. Values: (monotonic time, datetime, summary)
+        self._snapshots = OrderedDict()
+
         # Add command handlers
         self.application.add_handler(CommandHandler("status", self.status_command))
         self.application.add_handler(CommandHandler("start", self.start_command))
@@ -51,12 +177,26 @@ class TelegramBot:
             CommandHandler("pie_chart", self.pie_chart_command)
         )
         self.application.add_handler(CommandHandler("export", self.export_command))
+        self.application.add_handler(CommandHandler("health", self.health_command))
+        self.application.add_handler(CommandHandler("perf", self.perf_command))
+        self.application.add_handler(CommandHandler("trace", self.trace_command))
+        self.application.add_handler(
+            CommandHandler("positions", self.positions_command)
+        )
+        if Config.ADMIN_CHAT_IDS:
+            self.application.add_handler(
+                CommandHandler("profile", self.profile_command)
+            )
+            self.application.add_handler(
+                CommandHandler("memsnap", self.memsnap_command)
+            )
         self.application.add_handler(CallbackQueryHandler(self.handle_callback))
         self.application.add_error_handler(self.error_handler)
 
         # Add scheduled job
         if self.application.job_queue:
             self._schedule_job()
+            self._schedule_ibkr_refresh()
         else:
             logger.warning("JobQueue not available.")
 
@@ -64,19 +204,20 @@ class TelegramBot:
     # Scheduling helpers
     # ------------------------------------------------------------------
 
-    def _seconds_until_next_slot(self) -> float:
+    def _seconds_until_next_slot(self, offset: float = 0.0) -> float:
         """
         Compute seconds until the next 8AM-anchored slot.
 
         Slots are:  08:00, 08:00 + interval, 08:00 + 2*interval, …
         If the current time is before 08:00 today, the first slot IS 08:00.
         If no slot remains within today, the next slot is 08:00 tomorrow.
+        `offset` (seconds) shifts every slot, to stagger tenants.
         """
         tz = Config.get_timezone_obj()
         now = datetime.now(tz)
         anchor = now.replace(
             hour=Config.WINDOW_START_HOUR, minute=0, second=0, microsecond=0
-        )
+        ) + timedelta(seconds=offset)
         interval_sec = self.poll_interval_minutes * 60
 
         if now < anchor:
@@ -90,29 +231,166 @@ class TelegramBot:
 
         return max(delay, 1.0)  # never zero to avoid immediate double-fire
 
+    def _prefetch_max_lead(self) -> float:
+        """Longest a job may start before its slot (at most half an interval)."""
+        return min(Config.PREFETCH_MAX_LEAD_SECONDS, self.poll_interval_minutes * 30)
+
     def _schedule_job(self):
-        """Schedule (or reschedule) the repeating portfolio snapshot job."""
+        """
+        Schedule (or reschedule) the repeating snapshot job of every tenant.
+        Tenants are offset evenly over TENANT_SPREAD_MINUTES (at most one
+        interval), so their fetches do not all hit the APIs at the slot.
+        Jobs fire PREFETCH_MAX_LEAD_SECONDS before their slot; see
+        scheduled_job for how the actual fetch start is chosen.
+        """
         interval_sec = self.poll_interval_minutes * 60
-        first_sec = self._seconds_until_next_slot()
+        spread_sec = min(Config.TENANT_SPREAD_MINUTES * 60, interval_sec)
+        step = spread_sec / len(self.tenants) if self.tenants else 0.0
+        max_lead = self._prefetch_max_lead()
+        job_queue = self.application.job_queue
 
         # Remove any existing jobs with our name to avoid duplicates
-        current_jobs = self.application.job_queue.get_jobs_by_name("portfolio_snapshot")
-        for job in current_jobs:
-            job.schedule_removal()
+        for job in job_queue.jobs():
+            if job.name and job.name.startswith("portfolio_snapshot"):
+                job.schedule_removal()
+
+        for i, tenant in enumerate(self.tenants):
+            offset = i * step
+            slot_sec = self._seconds_until_next_slot(offset=offset)
+            first_sec = slot_sec - max_lead
+            data = {"tenant": tenant, "offset": offset}
+            name = f"portfolio_snapshot:{tenant.chat_id}"
+            if first_sec < 1:
+                # Slot too close for the full lead: run once now (the job
+                # waits for the slot), then repeat aligned from the next one
+                job_queue.run_once(
+                    self.scheduled_job,
+                    when=1,
+                    chat_id=tenant.chat_id,
+                    data=data,
+                    name=name,
+                )
+                first_sec += interval_sec
+            job_queue.run_repeating(
+                self.scheduled_job,
+                interval=interval_sec,
+                first=first_sec,
+                chat_id=tenant.chat_id,
+                data=data,
+                name=name,
+            )
+            next_dt = datetime.now(Config.get_timezone_obj()) + timedelta(
+                seconds=slot_sec
+            )
+            logger.info(
+                f"Scheduled job for {tenant.name} every {self.poll_interval_minutes} "
+                f"min. Next slot at {next_dt.strftime('%H:%M:%S')} "
+                f"({Config.WINDOW_START_HOUR}:00–{Config.WINDOW_END_HOUR}:00 window)"
+            )
+
+    def _schedule_ibkr_refresh(self):
+        """
+        Refresh the IBKR daily cache IBKR_REFRESH_LEAD_MINUTES before
+        WINDOW_START_HOUR, instead of on the first request after it.
+        """
+        if not any("ibkr" in t.aggregator.enabled_platforms() for t in self.tenants):
+            return
+
+        now = datetime.now(Config.get_timezone_obj())
+        refresh_at = now.replace(
+            hour=Config.WINDOW_START_HOUR, minute=0, second=0, microsecond=0
+        ) - timedelta(minutes=Config.IBKR_REFRESH_LEAD_MINUTES)
+        if refresh_at <= now:
+            refresh_at += timedelta(days=1)
 
         self.application.job_queue.run_repeating(
-            self.scheduled_job,
-            interval=interval_sec,
-            first=first_sec,
-            chat_id=self.chat_id,
-            name="portfolio_snapshot",
+            self.ibkr_refresh_job,
+            interval=24 * 3600,
+            first=(refresh_at - now).total_seconds(),
+            name="ibkr_cache_refresh",
         )
-        next_dt = datetime.now(Config.get_timezone_obj()) + timedelta(seconds=first_sec)
-        logger.info(
-            f"Scheduled job every {self.poll_interval_minutes} min. "
-            f"Next fire at {next_dt.strftime('%H:%M')} "
-            f"({Config.WINDOW_START_HOUR}:00–{Config.WINDOW_END_HOUR}:00 window)"
+        logger.info(f"IBKR cache refresh scheduled daily at {refresh_at:%H:%M}")
+
+    # ------------------------------------------------------------------
+    # Application lifecycle
+    # ------------------------------------------------------------------
+
+    async def _post_init(self, application: Application) -> None:
+        """Start background tasks once the event loop is running."""
+        monitor = get_loop_monitor()
+        if monitor:
+            monitor.start()
+        for tenant in self.tenants:
+            tenant.aggregator.start_streams()
+
+    async def _post_shutdown(self, application: Application) -> None:
+        for tenant in self.tenants:
+            await tenant.aggregator.stop_streams()
+        monitor = get_loop_monitor()
+        if monitor:
+            await monitor.stop()
+
+    # ------------------------------------------------------------------
+    # Snapshot cache
+    # ------------------------------------------------------------------
+
+    def _remember_snapshot(
+        self, chat_id, message_id, summary: dict, chat_level: bool = True
+    ) -> None:
+        """
+        Keep `summary` for the message it was shown in (if given) and, unless
+        `chat_level` is False, as the chat's latest snapshot. Reports sent to
+        another tenant's chat pass False, so that tenant's /pie_chart and
+        /positions never show this portfolio.
+        """
+        entry = (
+            time.monotonic(),
+            datetime.now(Config.get_timezone_obj()),
+            summary,
         )
+        keys = {(str(chat_id), message_id)}
+        if chat_level:
+            keys.add((str(chat_id), None))
+        for key in keys:
+            self._snapshots[key] = entry
+            self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.SNAPSHOT_CACHE_SIZE:
+            self._snapshots.popitem(last=False)
+
+    def _recent_snapshot(self, chat_id, message_id=None):
+        """
+        Return (taken_at, summary) for the given message — else the chat's
+        latest snapshot — if it is younger than SNAPSHOT_MAX_AGE_SECONDS.
+        """
+        for key in ((str(chat_id), message_id), (str(chat_id), None)):
+            entry = self._snapshots.get(key)
+            if entry and time.monotonic() - entry[0] <= Config.SNAPSHOT_MAX_AGE_SECONDS:
+                return entry[1], entry[2]
+        return None
+
+    async def _get_snapshot(self, chat_id, message_id=None, force=False):
+        """Return (taken_at, summary), fetching all platforms only when stale."""
+        cached = None if force else self._recent_snapshot(chat_id, message_id)
+        if cached:
+            metrics.CACHE_REQUESTS.inc(cache="snapshot", result="hit")
+            return cached
+        metrics.CACHE_REQUESTS.inc(cache="snapshot", result="miss")
+
+        aggregator = self.tenants.get(chat_id).aggregator
+        summary = await aggregator.get_portfolio_summary_async()
+        self._remember_snapshot(chat_id, None, summary)
+        return self._recent_snapshot(chat_id)
+
+    async def _check_alerts(self, tenant, summary: dict, usd: float) -> None:
+        """Evaluate the tenant's alert rules and send any that fired right away."""
+        try:
+            with tracing.span("alerts"):
+                alerts = tenant.alerts.evaluate(summary, usd)
+            if alerts:
+                text = "🚨 <b>Portfolio alert</b>\n\n" + "\n\n".join(alerts)
+                await self.delivery.deliver(tenant.recipients, text, parse_mode="HTML")
+        except Exception as e:
+            logger.error(f"Alert evaluation for {tenant.name} failed: {e}")
 
     # ------------------------------------------------------------------
     # Global error handler
@@ -132,8 +410,19 @@ class TelegramBot:
     # Auth helper
     # ------------------------------------------------------------------
 
+    def _tenant(self, update: Update):
+        """The tenant whose portfolio this chat sees, or None."""
+        return self.tenants.get(update.effective_chat.id)
+
     def _is_authorized(self, update: Update) -> bool:
-        return str(update.effective_chat.id) == str(self.chat_id)
+        return self._tenant(update) is not None
+
+    def _is_admin(self, update: Update) -> bool:
+        """Whether this chat or user is listed in ADMIN_CHAT_IDS."""
+        ids = {str(update.effective_chat.id)}
+        if update.effective_user:
+            ids.add(str(update.effective_user.id))
+        return not ids.isdisjoint(Config.ADMIN_CHAT_IDS)
 
     # ------------------------------------------------------------------
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -172,13 +461,17 @@ class TelegramBot:
             return
 
         logger.info(f"/status from {update.effective_chat.id}")
+        with tracing.trace("/status", chat_id=str(update.effective_chat.id)):
+            await self._status(update)
 
+    async def _status(self, update: Update) -> None:
         # Send placeholder — retry on transient network errors so the command
         # doesn't silently vanish if the connection blips at this exact moment.
         status_msg = None
         for attempt in range(4):
             try:
-                status_msg = await update.message.reply_text("Fetching data...")
+                with tracing.span("telegram.send_placeholder", attempt=attempt + 1):
+                    status_msg = await update.message.reply_text("Fetching data...")
                 break
             except (NetworkError, TimedOut) as e:
                 if attempt == 3:
@@ -188,31 +481,65 @@ class TelegramBot:
                     return
                 await asyncio.sleep(2**attempt)  # 1 s, then 2 s
 
+        tenant = self._tenant(update)
         try:
-            summary = self.aggregator.get_portfolio_summary()
-            msg = self.aggregator.format_message(summary)
-            # Add timestamp to show when it was last generated
-            now = datetime.now(Config.get_timezone_obj()).strftime("%H:%M:%S")
-            msg += f"\n\n<i>Last updated: {now}</i>"
-
-            await status_msg.edit_text(
-                text=msg, parse_mode="HTML", reply_markup=self._get_status_keyboard()
+            summary = await self._render_status(
+                status_msg.edit_text, tenant.aggregator, status_msg.text
+            )
+            self._remember_snapshot(
+                update.effective_chat.id, status_msg.message_id, summary
             )
 
             # Save snapshot on manual request
-            usd, rub = self.aggregator.get_totals(summary)
-            history_manager.save_snapshot(usd, rub)
+            usd, rub = tenant.aggregator.get_totals(summary)
+            with tracing.span("history.save"):
+                history_manager.save_snapshot(usd, rub, tenant.history_file)
+            await self._check_alerts(tenant, summary, usd)
         except Exception as e:
             logger.error(f"Error in /status: {e}")
             await status_msg.edit_text(f"Error fetching status: {e}")
 
+    async def _render_status(self, edit, aggregator, current_text=None) -> dict:
+        """
+        Fetch all platforms concurrently and progressively edit the status
+        message via `edit` as each one completes. The final edit carries the
+        totals, the timestamp and the keyboard. Returns the summary.
+        """
+        editor = _DebouncedEditor(
+            edit, Config.STATUS_EDIT_INTERVAL_SECONDS, current_text
+        )
+
+        async def on_progress(partial):
+            await editor.update(aggregator.format_message(partial), parse_mode="HTML")
+
+        summary = await aggregator.get_portfolio_summary_async(on_progress)
+        msg = aggregator.format_message(summary)
+        # Add timestamp to show when it was last generated
+        now = datetime.now(Config.get_timezone_obj()).strftime("%H:%M:%S")
+        msg += f"\n\n<i>Last updated: {now}</i>"
+
+        await editor.finish(
+            msg, parse_mode="HTML", reply_markup=self._get_status_keyboard()
+        )
+        return summary
+
     async def frequency_command(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
-        """Handle /frequency <minutes> — update the scheduled scan interval."""
+        """
+        Handle /frequency <minutes> — update the scheduled scan interval.
+        The schedule is shared by every tenant, so with more than one tenant
+        only admins may change it.
+        """
         if not self._is_authorized(update):
             await update.message.reply_text("Unauthorized access.")
             return
+        if len(self.tenants) > 1 and not self._is_admin(update):
+            await update.message.reply_text(
+                "The report schedule is shared by all portfolios; "
+                "only an admin can change it."
+            )
+            return
 
         args = context.args
         if not args or len(args) != 1:
@@ -250,18 +577,34 @@ class TelegramBot:
             await update.message.reply_text("Unauthorized access.")
             return
 
+        if len(self.tenants) > 1 and not self._is_admin(update):
+            frequency = "/frequency — admins only; "
+        else:
+            frequency = "/frequency &lt;minutes&gt; — "
         msg = (
             "📋 <b>Available commands</b>\n\n"
             "/status — fetch the current portfolio snapshot\n"
-            "/frequency &lt;minutes&gt; — set how often the bot sends automatic snapshots "
+            f"{frequency}set how often the bot sends automatic snapshots "
             f"(current: every {self.poll_interval_minutes} min, anchored to "
             f"{Config.WINDOW_START_HOUR:02d}:00)\n"
             "/history — view portfolio values for the last 30 days + trend chart\n"
             "/rub_chart — send the last 30 days trend chart in RUB\n"
-            "/pie_chart — send a pie chart of current allocation by platform\n"
+            "/pie_chart [fresh] — pie chart of current allocation (reuses the last "
+            "snapshot if recent; 'fresh' refetches)\n"
             "/export — download raw portfolio history as a JSON file\n"
+            "/positions — show the largest T-Bank holdings\n"
+            "/health — show per-platform circuit breaker state and request budgets\n"
+            "/perf [n] — timing breakdown of the last n snapshots\n"
+            "/trace [n] — the last n traced commands as a Chrome trace file\n"
             "/help — show this help message"
         )
+        if Config.ADMIN_CHAT_IDS and self._is_admin(update):
+            msg += (
+                "\n\n🔧 <b>Admin</b>\n"
+                "/profile [seconds] — cProfile a snapshot, or the event loop for "
+                "a number of seconds\n"
+                "/memsnap [reset|stop] — tracemalloc growth since the first /memsnap"
+            )
         await update.message.reply_text(msg, parse_mode="HTML")
 
     async def history_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -270,11 +613,15 @@ class TelegramBot:
             await update.message.reply_text("Unauthorized access.")
             return
 
-        await self._send_history(update.message.reply_text, update.message.reply_photo)
+        await self._send_history(
+            update.message.reply_text,
+            update.message.reply_photo,
+            self._tenant(update).history_file,
+        )
 
-    async def _send_history(self, reply_text, reply_photo):
+    async def _send_history(self, reply_text, reply_photo, history_file):
         """Internal logic for sending history, usable by both commands and callbacks."""
-        entries = history_manager.get_history(30)
+        entries = history_manager.get_history(30, history_file)
         if not entries:
             await reply_text(
                 "No portfolio history recorded yet. "
@@ -319,12 +666,14 @@ class TelegramBot:
             return
 
         await self._send_rub_chart(
-            update.message.reply_text, update.message.reply_photo
+            update.message.reply_text,
+            update.message.reply_photo,
+            self._tenant(update).history_file,
         )
 
-    async def _send_rub_chart(self, reply_text, reply_photo):
+    async def _send_rub_chart(self, reply_text, reply_photo, history_file):
         """Internal logic for sending the RUB chart, usable by commands and callbacks."""
-        entries = history_manager.get_history(30)
+        entries = history_manager.get_history(30, history_file)
         if not entries:
             await reply_text(
                 "No portfolio history recorded yet. "
@@ -356,24 +705,39 @@ class TelegramBot:
     async def pie_chart_command(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
-        """Handle /pie_chart — send a pie chart showing allocation by platform."""
+        """
+        Handle /pie_chart — send a pie chart showing allocation by platform.
+        Reuses the chat's latest snapshot when fresh; `/pie_chart fresh`
+        always refetches.
+        """
         if not self._is_authorized(update):
             await update.message.reply_text("Unauthorized access.")
             return
 
+        force = bool(context.args) and context.args[0].lower() == "fresh"
         await self._send_pie_chart(
-            update.message.reply_text, update.message.reply_photo
+            update.message.reply_text,
+            update.message.reply_photo,
+            update.effective_chat.id,
+            force=force,
         )
 
-    async def _send_pie_chart(self, reply_text, reply_photo):
+    async def _send_pie_chart(
+        self, reply_text, reply_photo, chat_id, message_id=None, force=False
+    ):
         """Internal logic for sending pie chart, usable by both commands and callbacks."""
-        await reply_text("Generating pie chart…")
+        cached = None if force else self._recent_snapshot(chat_id, message_id)
+        if not cached:
+            await reply_text("Generating pie chart…")
         try:
-            summary = self.aggregator.get_portfolio_summary()
+            taken_at, summary = cached or await self._get_snapshot(chat_id, force=True)
             buf = await asyncio.to_thread(chart_module.build_pie_chart, summary)
             await reply_photo(
                 photo=buf,
-                caption="🥧 Portfolio allocation by platform",
+                caption=(
+                    "🥧 Portfolio allocation by platform "
+                    f"(as of {taken_at.strftime('%H:%M:%S')})"
+                ),
             )
         except RuntimeError as e:
             logger.warning(f"Pie chart skipped (matplotlib unavailable): {e}")
@@ -392,14 +756,15 @@ class TelegramBot:
             await update.message.reply_text("Unauthorized access.")
             return
 
-        if not os.path.exists(_HISTORY_FILE):
+        history_file = self._tenant(update).history_file
+        if not os.path.exists(history_file):
             await update.message.reply_text(
                 "No history file found yet. It is created after the first scheduled snapshot."
             )
             return
 
         try:
-            with open(_HISTORY_FILE, "rb") as f:
+            with open(history_file, "rb") as f:
                 await update.message.reply_document(
                     document=InputFile(f, filename="portfolio_history.json"),
                     caption="📦 Raw portfolio history (DD-MM-YYYY → USD / RUB)",
@@ -410,6 +775,284 @@ class TelegramBot:
             logger.error(f"Export failed: {e}")
             await update.message.reply_text("⚠️ Could not send history file.")
 
+    async def positions_command(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):
+        """Handle /positions — show the top T-Bank holdings by value."""
+        if not self._is_authorized(update):
+            await update.message.reply_text("Unauthorized access.")
+            return
+
+        if not Config.TBANK_POSITIONS_MODE:
+            await update.message.reply_text(
+                "Positions mode is off. Set TBANK_POSITIONS_MODE=true to enable it."
+            )
+            return
+        aggregator = self._tenant(update).aggregator
+        if "tbank" not in aggregator.enabled_platforms():
+            await update.message.reply_text("T-Bank is not configured.")
+            return
+
+        cached = self._recent_snapshot(update.effective_chat.id)
+        if cached and "tbank_positions" in cached[1]:
+            fields = cached[1]
+        else:
+            await update.message.reply_text("Fetching T-Bank positions…")
+            try:
+                fields = await asyncio.to_thread(aggregator.fetch_platform, "tbank")
+            except StaleResultError as e:
+                fields = e.fields
+            except Exception as e:
+                logger.error(f"Error in /positions: {e}")
+                await update.message.reply_text(f"⚠️ Could not fetch positions: {e}")
+                return
+
+        positions = fields.get("tbank_positions", [])
+        if not positions:
+            await update.message.reply_text("No T-Bank positions found.")
+            return
+
+        top_n = Config.POSITIONS_TOP_N
+        total = sum(p["rub"] for p in positions)
+        lines = [f"📊 <b>Top {min(top_n, len(positions))} T-Bank holdings</b>\n"]
+        for i, pos in enumerate(positions[:top_n], start=1):
+            rub_fmt = f"₽{pos['rub']:,.0f}".replace(",", " ")
+            share = pos["rub"] / total if total else 0.0
+            lines.append(
+                f"{i}. <b>{html.escape(pos['ticker'])}</b>  <code>{rub_fmt}</code> "
+                f"({share:.1%})"
+            )
+
+        rest = positions[top_n:]
+        if rest:
+            rest_fmt = f"₽{sum(p['rub'] for p in rest):,.0f}".replace(",", " ")
+            lines.append(f"… {len(rest)} more: <code>{rest_fmt}</code>")
+
+        await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+    async def health_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /health — show the circuit breaker state of every platform."""
+        if not self._is_authorized(update):
+            await update.message.reply_text("Unauthorized access.")
+            return
+
+        icons = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+        aggregator = self._tenant(update).aggregator
+        enabled = aggregator.enabled_platforms()
+        lines = ["🩺 <b>Platform health</b>\n"]
+        for platform, breaker in aggregator.breakers.items():
+            if platform not in enabled:
+                continue
+            info = breaker.snapshot()
+            line = f"{icons[info['state']]} <b>{info['name']}</b>: {info['state']}"
+            if info["failures"]:
+                line += f", {info['failures']} consecutive failure(s)"
+            if info["retry_in"] is not None:
+                line += f", next probe in {info['retry_in']:.0f}s"
+            if info["last_success_at"]:
+                line += f"\n    last success {info['last_success_at']:%d %b %H:%M:%S}"
+            if info["last_error"]:
+                line += f"\n    <i>{html.escape(info['last_error'][:200])}</i>"
+            lines.append(line)
+
+        if len(lines) == 1:
+            lines.append("No platforms configured.")
+
+        lines.append("\n⏱ <b>Request budgets</b>")
+        for info in rate_limiter.get_scheduler().report():
+            if info["name"] not in enabled:
+                continue
+            line = (
+                f"{info['name']}: {info['utilization']:.0%} of {info['limit']} in use, "
+                f"{info['granted']} sent"
+            )
+            if info["delayed"]:
+                line += f", {info['delayed']} queued ({info['wait_seconds']:.1f}s)"
+            if info["rejected"]:
+                line += f", {info['rejected']} served from cache"
+            lines.append(line)
+
+        await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+    async def perf_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /perf [n] — per-platform timing of the last n snapshots."""
+        if not self._is_authorized(update):
+            await update.message.reply_text("Unauthorized access.")
+            return
+
+        count = 5
+        if context.args and context.args[0].isdigit():
+            count = min(10, max(1, int(context.args[0])))
+        runs = list(self._tenant(update).aggregator.runs)[-count:]
+        if not runs:
+            await update.message.reply_text(
+                "No snapshots yet. Use /status to take one."
+            )
+            return
+
+        lines = [f"⏱ <b>Last {len(runs)} snapshot(s)</b>, newest first"]
+        monitor = get_loop_monitor()
+        lag = monitor.summary() if monitor else {"samples": 0}
+        if lag["samples"]:
+            lines.append(
+                f"Event-loop lag over {lag['window'] / 60:.1f} min: "
+                f"p50 {lag['p50'] * 1000:.0f} ms, p95 {lag['p95'] * 1000:.0f} ms, "
+                f"p99 {lag['p99'] * 1000:.0f} ms, max {lag['max'] * 1000:.0f} ms"
+            )
+            for at, seconds, handler in list(monitor.stalls)[-3:]:
+                stalled_at = datetime.fromtimestamp(at, Config.get_timezone_obj())
+                lines.append(
+                    f"⚠️ {stalled_at:%H:%M:%S} loop blocked {seconds:.1f}s+ in "
+                    f"<code>{html.escape(handler)}</code>"
+                )
+        for record in reversed(runs):
+            rows = [
+                f"{record['at']:%H:%M:%S}  total {record['seconds']:.2f}s",
+                f"FX {fx_outline(record['fx'], record['at'])}",
+            ]
+            for run in record["platforms"]:
+                row = (
+                    f"{run.platform:<6}{run.status:<6}{run.seconds:>6.2f}s "
+                    f"cache {run.cache_result():<4}"
+                )
+                if run.retries:
+                    row += f" retry×{run.retries}"
+                if run.fallbacks:
+                    row += f" ↩{','.join(run.fallbacks)}"
+                rows.append(row)
+            lines.append("<pre>" + html.escape("\n".join(rows)) + "</pre>")
+
+        await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+    async def trace_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Handle /trace [n] — send this chat's last n traces (/status, Refresh,
+        scheduled reports) as Chrome trace-event JSON, to open in
+        ui.perfetto.dev or chrome://tracing.
+        """
+        if not self._is_authorized(update):
+            await update.message.reply_text("Unauthorized access.")
+            return
+
+        count = 1
+        if context.args and context.args[0].isdigit():
+            count = min(Config.TRACE_HISTORY_SIZE, max(1, int(context.args[0])))
+        traces = tracing.recent_traces(update.effective_chat.id, count)
+        if not traces:
+            await update.message.reply_text(
+                "No traces yet. Use /status, then /trace."
+                if Config.TRACE_HISTORY_SIZE
+                else "Tracing is off (TRACE_HISTORY_SIZE=0)."
+            )
+            return
+
+        payload = json.dumps(tracing.chrome_trace(traces))
+        durations = ", ".join(
+            f"{t.root.name} {(t.root.end_ns - t.root.start_ns) / 1e9:.2f}s"
+            for t in traces[-3:]
+        )
+        await self._send_report(
+            update,
+            payload,
+            "trace.json",
+            f"🧵 {len(traces)} trace(s): {durations}. Open in ui.perfetto.dev",
+        )
+
+    async def _send_report(self, update: Update, text: str, filename: str, caption):
+        """Send `text` (a report or trace) as a document attachment."""
+        try:
+            await update.message.reply_document(
+                document=InputFile(io.BytesIO(text.encode()), filename=filename),
+                caption=caption,
+            )
+        except (TimedOut, NetworkError) as e:
+            logger.warning(f"Telegram network error sending {filename}: {e}")
+
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Handle /profile [seconds] (admins only). Without an argument, run one
+        snapshot under cProfile in a worker thread; with one, profile the
+        event loop for that many seconds. The top functions come back as a
+        text document.
+        """
+        if not self._is_admin(update):
+            await update.message.reply_text("Unauthorized access.")
+            return
+
+        top = Config.PROFILE_TOP_N
+        try:
+            if context.args:
+                arg = context.args[0]
+                if not arg.isdigit() or not 1 <= int(arg) <= Config.PROFILE_MAX_SECONDS:
+                    await update.message.reply_text(
+                        f"Usage: /profile [seconds], at most {Config.PROFILE_MAX_SECONDS}"
+                    )
+                    return
+                profiler = profiling.WindowProfiler()
+                profiler.start()
+                try:
+                    await update.message.reply_text(
+                        f"⏱ Profiling the event loop for {arg}s..."
+                    )
+                    await asyncio.sleep(int(arg))
+                finally:
+                    elapsed = profiler.stop()
+                report = await asyncio.to_thread(
+                    profiler.report, f"Event loop over {elapsed:.1f}s", top
+                )
+                caption = f"🔬 Event loop profile, {elapsed:.0f}s"
+            else:
+                tenant = self._tenant(update) or next(iter(self.tenants), None)
+                if tenant is None:
+                    await update.message.reply_text("No portfolio configured.")
+                    return
+                await update.message.reply_text("⏱ Profiling a snapshot...")
+                _, report = await asyncio.to_thread(
+                    profiling.profile_call, tenant.aggregator.get_portfolio_summary, top
+                )
+                caption = f"🔬 Snapshot profile ({tenant.name})"
+        except profiling.ProfilerBusyError as e:
+            await update.message.reply_text(f"⚠️ {e}")
+            return
+
+        logger.info(f"/profile report sent to {update.effective_chat.id}")
+        await self._send_report(update, report, "profile.txt", caption)
+
+    async def memsnap_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Handle /memsnap [reset|stop] (admins only). The first call starts
+        tracemalloc and records a baseline; later calls send the allocation
+        sites that grew since then. `reset` takes a new baseline, `stop`
+        ends tracing.
+        """
+        if not self._is_admin(update):
+            await update.message.reply_text("Unauthorized access.")
+            return
+
+        action = context.args[0].lower() if context.args else ""
+        if action == "stop":
+            stopped = await asyncio.to_thread(profiling.memsnap_stop)
+            await update.message.reply_text(
+                "tracemalloc stopped." if stopped else "tracemalloc was not running."
+            )
+            return
+        if action == "reset":
+            profiling.memsnap_reset()
+        elif action:
+            await update.message.reply_text("Usage: /memsnap [reset|stop]")
+            return
+
+        report = await asyncio.to_thread(
+            profiling.memsnap, Config.TRACEMALLOC_FRAMES, Config.PROFILE_TOP_N
+        )
+        if not report:
+            await update.message.reply_text(
+                "📸 Baseline taken. Send /memsnap again later to see what grew; "
+                "/memsnap stop ends tracing."
+            )
+            return
+        await self._send_report(update, report, "memsnap.txt", "🧠 Memory growth")
+
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button clicks from inline keyboards."""
         query = update.callback_query
@@ -420,78 +1063,164 @@ class TelegramBot:
             return
 
         data = query.data
+        tenant = self._tenant(update)
 
         if data == "refresh_status":
-            await query.answer("Refreshing data...")
-            try:
-                summary = self.aggregator.get_portfolio_summary()
-                msg = self.aggregator.format_message(summary)
-                now = datetime.now(Config.get_timezone_obj()).strftime("%H:%M:%S")
-                msg += f"\n\n<i>Last updated: {now}</i>"
-
-                await query.edit_message_text(
-                    text=msg,
-                    parse_mode="HTML",
-                    reply_markup=self._get_status_keyboard(),
-                )
-
-                # Save snapshot on manual refresh
-                usd, rub = self.aggregator.get_totals(summary)
-                history_manager.save_snapshot(usd, rub)
-            except Exception as e:
-                logger.error(f"Error refreshing status via callback: {e}")
-                # We append the error so they know it failed, but keep the keyboard so they can try again later
-                error_msg = f"<b>⚠️ Error refreshing data: {e}</b>"
-                # If they quickly click refresh twice and the text is identical, Telegram throws a BadRequest.
-                # Adding the exact time prevents identical texts.
-                import time
-
-                try:
-                    await query.edit_message_text(
-                        text=error_msg
-                        + f"\n<i>Failed at {time.strftime('%H:%M:%S')}</i>",
-                        parse_mode="HTML",
-                        reply_markup=self._get_status_keyboard(),
-                    )
-                except Exception:
-                    pass
+            with tracing.trace("refresh", chat_id=str(update.effective_chat.id)):
+                await self._refresh(update, query, tenant)
 
         elif data == "show_history":
             await query.answer()
             await self._send_history(
-                query.message.reply_text, query.message.reply_photo
+                query.message.reply_text,
+                query.message.reply_photo,
+                tenant.history_file,
             )
 
         elif data == "show_pie_chart":
             await query.answer()
             await self._send_pie_chart(
-                query.message.reply_text, query.message.reply_photo
+                query.message.reply_text,
+                query.message.reply_photo,
+                update.effective_chat.id,
+                query.message.message_id,
             )
 
+    async def _refresh(self, update: Update, query, tenant) -> None:
+        """Refresh button: re-render the status message in place."""
+        await query.answer("Refreshing data...")
+        try:
+            summary = await self._render_status(
+                query.edit_message_text,
+                tenant.aggregator,
+                query.message.text_html,
+            )
+            self._remember_snapshot(
+                update.effective_chat.id, query.message.message_id, summary
+            )
+
+            # Save snapshot on manual refresh
+            usd, rub = tenant.aggregator.get_totals(summary)
+            with tracing.span("history.save"):
+                history_manager.save_snapshot(usd, rub, tenant.history_file)
+            await self._check_alerts(tenant, summary, usd)
+        except Exception as e:
+            logger.error(f"Error refreshing status via callback: {e}")
+            # We append the error so they know it failed, but keep the keyboard so they can try again later
+            error_msg = f"<b>⚠️ Error refreshing data: {e}</b>"
+            # If they quickly click refresh twice and the text is identical, Telegram throws a BadRequest.
+            # Adding the exact time prevents identical texts.
+            import time
+
+            try:
+                await _safe_edit(
+                    query.edit_message_text,
+                    text=error_msg + f"\n<i>Failed at {time.strftime('%H:%M:%S')}</i>",
+                    parse_mode="HTML",
+                    reply_markup=self._get_status_keyboard(),
+                )
+            except Exception:
+                pass
+
     # ------------------------------------------------------------------
     # Scheduled job
     # ------------------------------------------------------------------
 
     async def scheduled_job(self, context: ContextTypes.DEFAULT_TYPE):
-        """Periodic portfolio report — only fires within the configured time window."""
-        now = datetime.now(Config.get_timezone_obj())
-        if not (Config.WINDOW_START_HOUR <= now.hour <= Config.WINDOW_END_HOUR):
+        """
+        Periodic portfolio report — only fires within the configured time window.
+
+        The job wakes up to PREFETCH_MAX_LEAD_SECONDS before its slot, starts
+        fetching as late as the recent p95 fetch time (slowest platform) allows,
+        then holds the ready report until the slot, so it goes out on time.
+        """
+        tenant = context.job.data["tenant"]
+        max_lead = self._prefetch_max_lead()
+        tz = Config.get_timezone_obj()
+
+        to_slot = self._seconds_until_next_slot(context.job.data["offset"])
+        if to_slot > max_lead + 1:
+            # No prefetch window (or the job fired late): the slot is now
+            to_slot = 0.0
+        slot = datetime.now(tz) + timedelta(seconds=to_slot)
+        if not (Config.WINDOW_START_HOUR <= slot.hour <= Config.WINDOW_END_HOUR):
             logger.info("Outside configured time window. Skipping report.")
             return
 
-        chat_id = context.job.chat_id
-        logger.info("Running scheduled report...")
+        estimate = tenant.aggregator.estimated_fetch_seconds(default=max_lead)
+        lead = min(estimate + self.PREFETCH_MARGIN_SECONDS, max_lead)
+        await asyncio.sleep(max(0.0, to_slot - lead))
+
+        logger.info(
+            f"Running scheduled report for {tenant.name} "
+            f"(slot {slot:%H:%M:%S}, lead {lead:.1f}s)..."
+        )
+        with tracing.trace(
+            "scheduled report", chat_id=tenant.chat_id, tenant=tenant.name
+        ):
+            await self._scheduled_report(tenant, slot)
+
+    async def _scheduled_report(self, tenant, slot: datetime) -> None:
+        """Fetch, decide and deliver one tenant's report at `slot`."""
+        tz = Config.get_timezone_obj()
         try:
-            summary = self.aggregator.get_portfolio_summary()
-            msg = self.aggregator.format_message(summary)
-            await context.bot.send_message(chat_id=chat_id, text=msg, parse_mode="HTML")
-            logger.info("Scheduled report sent.")
-
-            # Save today's snapshot (overwrites — last run of day wins)
-            usd, rub = self.aggregator.get_totals(summary)
-            history_manager.save_snapshot(usd, rub)
+            # Fetched and formatted once, however many recipients there are
+            summary = await tenant.aggregator.get_portfolio_summary_async()
+            usd, rub = tenant.aggregator.get_totals(summary)
+            await self._check_alerts(tenant, summary, usd)
+            decision = tenant.delta.decide(summary, usd, slot)
+            if decision == report_delta.SKIP:
+                logger.info(
+                    f"Report for {tenant.name} suppressed: change below thresholds."
+                )
+                return
+            if decision == report_delta.SHORT:
+                msg = tenant.delta.short_message(usd)
+            else:
+                msg = tenant.aggregator.format_message(summary)
+
+            early = (slot - datetime.now(tz)).total_seconds()
+            if early > 0:
+                await asyncio.sleep(early)
+            else:
+                logger.info(f"Report for {tenant.name} ready {-early:.1f}s after slot")
+
+            with tracing.span("telegram.deliver", recipients=len(tenant.recipients)):
+                results = await self.delivery.deliver(
+                    tenant.recipients, msg, parse_mode="HTML"
+                )
+            delivered = 0
+            for chat_id, sent in results.items():
+                if not isinstance(sent, Exception):
+                    delivered += 1
+                    self._remember_snapshot(
+                        chat_id,
+                        sent.message_id,
+                        summary,
+                        chat_level=self.tenants.get(chat_id) is tenant,
+                    )
+            logger.info(
+                f"Scheduled {decision} report sent to {delivered}/{len(results)} "
+                "recipient(s)."
+            )
+
+            if decision == report_delta.FULL:
+                if delivered:
+                    tenant.delta.record_full(summary, usd, slot)
+                # Save today's snapshot (overwrites — last run of day wins);
+                # below-threshold changes do not rewrite history
+                with tracing.span("history.save"):
+                    history_manager.save_snapshot(usd, rub, tenant.history_file)
         except Exception as e:
-            logger.error(f"Error in scheduled job: {e}")
+            logger.error(f"Error in scheduled job for {tenant.name}: {e}")
+
+    async def ibkr_refresh_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Daily pre-window IBKR report download for every tenant using IBKR."""
+        for tenant in self.tenants:
+            try:
+                await asyncio.to_thread(tenant.aggregator.refresh_ibkr_cache)
+            except Exception as e:
+                logger.error(f"IBKR cache refresh for {tenant.name} failed: {e}")
 
     # ------------------------------------------------------------------
     # Entrypoint
@@ -503,6 +1232,24 @@ class TelegramBot:
             logger.error("Application not initialized.")
             return
 
+        if Config.WEBHOOK_URL:
+            # Telegram pushes updates to our reverse proxy, which forwards them
+            # to this local server; requests without the secret header get 403
+            logger.info(
+                f"Starting Telegram Bot webhook on {Config.WEBHOOK_LISTEN}:"
+                f"{Config.WEBHOOK_PORT}/{Config.WEBHOOK_PATH}..."
+            )
+            self.application.run_webhook(
+                listen=Config.WEBHOOK_LISTEN,
+                port=Config.WEBHOOK_PORT,
+                url_path=Config.WEBHOOK_PATH,
+                webhook_url=Config.webhook_endpoint(),
+                secret_token=Config.WEBHOOK_SECRET_TOKEN,
+                allowed_updates=Update.ALL_TYPES,
+                bootstrap_retries=5,
+            )
+            return
+
         logger.info("Starting Telegram Bot polling...")
         self.application.run_polling(
             allowed_updates=Update.ALL_TYPES,
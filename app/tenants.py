@@ -0,0 +1,139 @@
+"""
+tenants.py — several portfolios (one per chat) served by one bot process.
+
+TENANTS_FILE is a JSON object keyed by chat ID:
+
+    {
+      "123456789": {
+        "name": "alice",
+        "bybit_accounts": [{"name": "Main", "api_key": "...", "api_secret": "..."}],
+        "okx_accounts": [{"name": "Main", "api_key": "...", "api_secret": "...",
+                          "passphrase": "..."}],
+        "tbank_token": "...",
+        "ibkr_flex_token": "...",
+        "ibkr_query_id": "...",
+        "history_file": "data/alice_history.json",
+        "recipients": ["123456789", "-1001234567890"],
+        "alert_rules": "total_below:50000;drawdown:5%:7d"
+      }
+    }
+
+Every key except the chat ID is optional. Each tenant gets its own clients,
+circuit breakers, history file and IBKR cache; the price cache, request
+budgets, account thread pool and HTTP connection pool are shared. The .env
+portfolio stays available as the tenant for TELEGRAM_CHAT_ID unless the
+file defines that chat.
+"""
+
+import logging
+import os
+
+from app.aggregator import Aggregator
+from app.alerts import AlertEngine
+from app.config import Config
+from app.history_manager import _HISTORY_FILE, DATA_DIR
+from app.report_delta import ReportDelta
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_FIELDS = {
+    "bybit_accounts": ("api_key", "api_secret"),
+    "okx_accounts": ("api_key", "api_secret", "passphrase"),
+}
+
+
+class Tenant:
+    """One chat's portfolio: its credentials, aggregator and history file."""
+
+    def __init__(
+        self,
+        chat_id,
+        name: str,
+        credentials: dict | None = None,
+        history_file: str = _HISTORY_FILE,
+        recipients: list | None = None,
+        alert_rules: str | None = None,
+    ):
+        self.chat_id = str(chat_id)
+        self.name = name
+        self.history_file = history_file
+        # Chats that receive the scheduled report (the tenant's own by default)
+        self.recipients = [str(r) for r in recipients or [self.chat_id]]
+        # Last full scheduled report, for threshold-based suppression
+        self.delta = ReportDelta()
+        self.alerts = AlertEngine(
+            Config.ALERT_RULES if alert_rules is None else alert_rules, history_file
+        )
+        self.aggregator = Aggregator(credentials)
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.name!r}, chat_id={self.chat_id})"
+
+
+def _tenant_credentials(chat_id: str, entry: dict) -> dict:
+    """Validate one registry entry and add its per-tenant IBKR cache path."""
+    credentials = {}
+    for key, fields in ACCOUNT_FIELDS.items():
+        accounts = []
+        for i, account in enumerate(entry.get(key, [])):
+            missing = [f for f in fields if not account.get(f)]
+            if missing:
+                raise ValueError(
+                    f"Tenant {chat_id}: {key}[{i}] is missing {', '.join(missing)}"
+                )
+            accounts.append({"name": account.get("name", f"#{i + 1}"), **account})
+        credentials[key] = accounts
+
+    for key in ("tbank_token", "ibkr_flex_token", "ibkr_query_id"):
+        credentials[key] = entry.get(key)
+    credentials["ibkr_cache_file"] = os.path.join(
+        DATA_DIR, f"ibkr_cache_{chat_id}.json"
+    )
+    return credentials
+
+
+class TenantRegistry:
+    """Chat ID → Tenant lookup; also the list of portfolios to schedule."""
+
+    def __init__(self, tenants: list[Tenant]):
+        self._tenants = {tenant.chat_id: tenant for tenant in tenants}
+
+    @classmethod
+    def from_config(cls) -> "TenantRegistry":
+        tenants = []
+        for chat_id, entry in Config.TENANTS.items():
+            history_file = entry.get("history_file") or os.path.join(
+                DATA_DIR, f"portfolio_history_{chat_id}.json"
+            )
+            tenants.append(
+                Tenant(
+                    chat_id,
+                    entry.get("name", chat_id),
+                    _tenant_credentials(chat_id, entry),
+                    history_file,
+                    entry.get("recipients"),
+                    entry.get("alert_rules"),
+                )
+            )
+
+        if (
+            Config.TELEGRAM_CHAT_ID
+            and str(Config.TELEGRAM_CHAT_ID) not in Config.TENANTS
+        ):
+            # The .env portfolio, with the original history file and IBKR cache
+            recipients = [Config.TELEGRAM_CHAT_ID] + Config.REPORT_RECIPIENTS
+            tenants.append(
+                Tenant(Config.TELEGRAM_CHAT_ID, "default", recipients=recipients)
+            )
+
+        logger.info(f"Serving {len(tenants)} portfolio(s)")
+        return cls(tenants)
+
+    def get(self, chat_id) -> Tenant | None:
+        return self._tenants.get(str(chat_id))
+
+    def __iter__(self):
+        return iter(self._tenants.values())
+
+    def __len__(self) -> int:
+        return len(self._tenants)
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a platform whose circuit is open."""
+
+    def __init__(self, breaker: "CircuitBreaker", retry_in: float):
+        self.name = breaker.name
+        self.last_value = breaker.last_value
+        self.last_success_at = breaker.last_success_at
+        self.retry_in = retry_in
+        super().__init__(
+            f"{breaker.name} circuit open after {breaker.failures} consecutive "
+            f"failures (next probe in {retry_in:.0f}s): {breaker.last_error}"
+        )
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one platform client.
+
+    closed    — calls go through; `failure_threshold` consecutive failures open it.
+    open      — calls fail fast with CircuitOpenError (carrying the last good
+                value) until the backoff expires.
+    half_open — exactly one probe call is let through; success closes the
+                circuit, failure re-opens it with a doubled backoff
+                (capped at `max_backoff`).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        base_backoff: float = 60.0,
+        max_backoff: float = 1800.0,
+        excluded_exceptions: tuple = (),
+    ):
+        self.name = name
+        # Errors that say nothing about platform health (e.g. our own
+        # rate limiting) propagate without counting as failures
+        self.excluded_exceptions = excluded_exceptions
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.last_error = None
+        self.last_value = None
+        self.last_success_at: datetime | None = None
+
+        self._trips = 0  # consecutive openings, drives the backoff exponent
+        self._next_probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn` through the breaker. Raises CircuitOpenError when open."""
+        with self._lock:
+            if self.state == self.OPEN:
+                retry_in = self._next_probe_at - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpenError(self, retry_in)
+                # Backoff elapsed — let this caller probe
+                self.state = self.HALF_OPEN
+                logger.info(f"{self.name} circuit half-open, probing for recovery")
+            elif self.state == self.HALF_OPEN:
+                # Another caller is already probing
+                raise CircuitOpenError(self, 0.0)
+
+        try:
+            result = fn(*args, **kwargs)
+        except self.excluded_exceptions:
+            self._release_probe()
+            raise
+        except Exception as e:
+            self._record_failure(e)
+            raise
+
+        self._record_success(result)
+        return result
+
+    def _record_success(self, result) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} circuit closed, platform recovered")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trips = 0
+            self.last_error = None
+            self.last_value = result
+            self.last_success_at = datetime.now()
+
+    def _release_probe(self) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                # The probe never reached the platform; allow the next one
+                self.state = self.OPEN
+
+    def _record_failure(self, error: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._trips += 1
+                backoff = min(
+                    self.base_backoff * 2 ** (self._trips - 1), self.max_backoff
+                )
+                self._next_probe_at = time.monotonic() + backoff
+                self.state = self.OPEN
+                logger.warning(
+                    f"{self.name} circuit opened after {self.failures} consecutive "
+                    f"failures; next probe in {backoff:.0f}s"
+                )
+
+    def snapshot(self) -> dict:
+        """Return a point-in-time view of the breaker for display."""
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self._next_probe_at - time.monotonic())
+            return {
+                "name": self.name,
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": retry_in,
+                "last_success_at": self.last_success_at,
+                "last_error": str(self.last_error) if self.last_error else None,
+            }
@@ -0,0 +1,29 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import Config
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide requests session. Every HTTP client (all tenants'
+    exchange clients, IBKR, the price oracle) shares its keep-alive pool, so
+    repeated snapshots reuse connections instead of opening new ones.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=Config.HTTP_POOL_SIZE,
+                pool_maxsize=Config.HTTP_POOL_SIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
@@ -1,25 +1,33 @@
+import atexit
+import json
 import logging
+import queue
 import re
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from app.config import Config
 
+REDACTED = "[REDACTED]"
+# Shorter values are not credentials (IDs, placeholders); masking them would
+# mangle numbers and words all over the logs
+MIN_SECRET_LENGTH = 8
+# Record attributes (passed by call sites in `extra`) that JSON lines carry
+STRUCTURED_FIELDS = (
+    "platform",
+    "account",
+    "call",
+    "duration_ms",
+    "attempt",
+    "cache_hit",
+    "suppressed",
+)
 
-class RedactionFilter(logging.Filter):
-    def __init__(self, patterns=None):
-        super().__init__()
-        self.patterns = patterns or []
-
-    def filter(self, record):
-        if not isinstance(record.msg, str):
-            return True
-        for pattern in self.patterns:
-            record.msg = re.sub(pattern, "[REDACTED]", record.msg)
-        return True
+_listener: QueueListener | None = None
 
 
-def setup_logging():
-    level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
-
-    # keys to redact
+def configured_secrets() -> list[str]:
+    """Every credential the bot knows of: .env values and all tenants' keys."""
     secrets = [
         Config.TELEGRAM_BOT_TOKEN,
         Config.BYBIT_API_KEY,
@@ -27,26 +35,174 @@ def setup_logging():
         Config.OKX_API_KEY,
         Config.OKX_API_SECRET,
         Config.OKX_API_PASSPHRASE,
+        Config.TBANK_API_TOKEN,
+        Config.IBKR_FLEX_TOKEN,
+        Config.WEBHOOK_SECRET_TOKEN,
     ]
+    for account in Config.BYBIT_ACCOUNTS + Config.OKX_ACCOUNTS:
+        secrets.extend(v for k, v in account.items() if k != "name")
+    for tenant in Config.TENANTS.values():
+        for key in ("tbank_token", "ibkr_flex_token"):
+            secrets.append(tenant.get(key))
+        for account in tenant.get("bybit_accounts", []) + tenant.get(
+            "okx_accounts", []
+        ):
+            secrets.extend(v for k, v in account.items() if k != "name")
     # Filter out None values
-    secrets = [s for s in secrets if s]
+    return [str(s) for s in secrets if s]
+
+
+def build_pattern(secrets) -> re.Pattern | None:
+    """
+    One compiled alternation of all secrets, so a record is redacted in a
+    single pass however many there are. Longest first, so a secret that
+    contains another one is replaced whole. Values shorter than
+    MIN_SECRET_LENGTH are skipped. None if there is nothing to hide.
+    """
+    unique = sorted(
+        {s for s in secrets if len(s) >= MIN_SECRET_LENGTH}, key=len, reverse=True
+    )
+    if not unique:
+        return None
+    return re.compile("|".join(re.escape(s) for s in unique))
+
+
+class RedactingQueueHandler(QueueHandler):
+    """
+    Hands records to the logging thread without blocking the caller.
+
+    prepare() (on the calling thread) merges msg with args and appends any
+    traceback, so the single `pattern.sub` below covers all three before the
+    record leaves the thread; the listener only writes finished text.
+    """
+
+    def __init__(self, log_queue, pattern: re.Pattern | None):
+        super().__init__(log_queue)
+        self.pattern = pattern
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            record.msg += f" (+{suppressed} similar suppressed)"
+        if self.pattern is not None:
+            record.msg = self.pattern.sub(REDACTED, record.msg)
+        record.message = record.msg
+        return record
+
 
-    # Simple heuristic to avoid redacting common words if a secret is suspiciously short or empty
-    # But API keys are usually long enough.
+class LogSampler(logging.Filter):
+    """
+    Rate-limits repetitive INFO and DEBUG records: each call site (logger
+    and message template) gets `burst` records per `window` seconds, the
+    rest are dropped before they are formatted. The first record of the
+    next window carries the number dropped as `suppressed`. Warnings and
+    errors always pass. f-string messages differ on every call, so only
+    %-style call sites are actually sampled.
+    """
 
-    patterns = [re.escape(s) for s in secrets]
+    _MAX_SITES = 1000
 
-    redaction_filter = RedactionFilter(patterns)
+    def __init__(self, window: float, burst: int):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._sites = {}  # (logger, template) -> [window start, passed, dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        key = (record.name, str(record.msg))
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                dropped = site[2] if site else 0
+                if site is None and len(self._sites) >= self._MAX_SITES:
+                    self._prune(now)
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.burst:
+                site[1] += 1
+                dropped = 0
+            else:
+                site[2] += 1
+                return False
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+    def _prune(self, now: float) -> None:
+        """Forget sites whose window has ended (their drop counts are lost)."""
+        self._sites = {k: v for k, v in self._sites.items() if now - v[0] < self.window}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg and STRUCTURED_FIELDS."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            # Already merged with args and any traceback by the queue handler
+            "msg": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging():
+    """
+    Route all logging through an unbounded queue to a QueueListener thread
+    that owns the (blocking) StreamHandler, redacting every configured secret.
+    LOG_FORMAT picks text or JSON lines; repetitive INFO/DEBUG records are
+    sampled per LOG_SAMPLE_WINDOW_SECONDS / LOG_SAMPLE_BURST.
+    """
+    global _listener
+    level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
 
     handler = logging.StreamHandler()
-    handler.setFormatter(
-        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if Config.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+
+    log_queue = queue.SimpleQueue()  # put() never blocks
+    queue_handler = RedactingQueueHandler(
+        log_queue, build_pattern(configured_secrets())
     )
-    handler.addFilter(redaction_filter)
+    if Config.LOG_SAMPLE_WINDOW_SECONDS > 0:
+        # On the queue handler, so dropped records are never formatted
+        queue_handler.addFilter(
+            LogSampler(
+                Config.LOG_SAMPLE_WINDOW_SECONDS, max(Config.LOG_SAMPLE_BURST, 1)
+            )
+        )
 
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
-    root_logger.handlers = [handler]  # Replace existing handlers
+    root_logger.handlers = [queue_handler]  # Replace existing handlers
+
+    _stop_listener()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_stop_listener)
 
     # Suppress chatty libraries if needed
     logging.getLogger("httpx").setLevel(logging.WARNING)
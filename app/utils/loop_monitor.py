@@ -0,0 +1,174 @@
+"""
+Event-loop lag monitor and stall detector.
+
+A heartbeat task on the loop sleeps LOOP_MONITOR_INTERVAL_SECONDS at a
+time and records how late it wakes up: that delay is the scheduling lag
+every handler sees. A watchdog thread checks the heartbeat; when it is
+overdue by more than LOOP_STALL_SECONDS, something is blocking the loop
+and the watchdog logs the loop thread's current stack (taken with
+sys._current_frames while it is still blocked) and the handler or job it
+belongs to. Lag goes to the portfolio_event_loop_lag_seconds histogram
+and to /perf; stalls are counted per handler.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from app.config import Config
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_LAG_SECONDS = metrics.histogram(
+    "portfolio_event_loop_lag_seconds",
+    "How late the event loop ran a callback scheduled for a given time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+_STALLS = metrics.counter(
+    "portfolio_event_loop_stalls_total",
+    "Times the event loop was blocked longer than LOOP_STALL_SECONDS",
+    ("handler",),
+)
+
+# Frames of our own code, used to name the handler in a stack sample
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LOOP_DISPATCH = asyncio.events.__file__  # Handle._run calls every callback
+_STACK_LIMIT = 25
+# Lag samples kept for /perf (five minutes at the default interval)
+_SAMPLES = 1200
+
+
+def handler_name(frame) -> str:
+    """
+    The outermost function of this package in the callback running at
+    `frame`, e.g. 'telegram_client.TelegramBot.status_command', or '?' if
+    none is. The walk stops at the loop's callback dispatch, so frames that
+    started the loop itself (app.main) do not count.
+    """
+    name = "?"
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == _LOOP_DISPATCH:
+            break
+        if code.co_filename.startswith(_APP_DIR):
+            module = os.path.splitext(os.path.relpath(code.co_filename, _APP_DIR))[0]
+            name = f"{module.replace(os.sep, '.')}.{code.co_qualname}"
+        frame = frame.f_back
+    return name
+
+
+class LoopMonitor:
+    """Measures the running loop's lag and reports what blocks it."""
+
+    def __init__(self, interval: float, stall_seconds: float):
+        self.interval = interval
+        self.stall_seconds = stall_seconds
+        self.samples = deque(maxlen=_SAMPLES)
+        self.stalls = deque(maxlen=20)  # (wall time, seconds, handler)
+        self._last_beat = time.monotonic()
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self) -> None:
+        """Start the heartbeat and watchdog; call from the running loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Event-loop monitor: heartbeat every {self.interval}s, "
+            f"stalls over {self.stall_seconds}s are logged"
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self.samples.append(lag)
+            _LAG_SECONDS.observe(lag)
+
+    def _watch(self) -> None:
+        """Watchdog thread: sample the loop's stack once per stall."""
+        reported = None  # heartbeat time of the stall already logged
+        while not self._stop.wait(self.interval / 2):
+            last_beat = self._last_beat
+            overdue = time.monotonic() - last_beat - self.interval
+            if overdue < self.stall_seconds or reported == last_beat:
+                continue
+            reported = last_beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            handler = handler_name(frame)
+            stack = "".join(traceback.format_stack(frame, limit=_STACK_LIMIT))
+            del frame
+            _STALLS.inc(handler=handler)
+            self.stalls.append((time.time(), overdue, handler))
+            logger.warning(
+                f"Event loop blocked for {overdue:.2f}s+ in {handler}; "
+                f"loop thread stack:\n{stack}"
+            )
+
+    def summary(self) -> dict:
+        """Lag percentiles (seconds) over the recent samples, and stall count."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"samples": 0}
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+        return {
+            "samples": len(ordered),
+            "window": len(ordered) * self.interval,
+            "p50": pct(50),
+            "p95": pct(95),
+            "p99": pct(99),
+            "max": ordered[-1],
+            "stalls": len(self.stalls),
+        }
+
+
+_monitor: LoopMonitor | None = None
+_monitor_lock = threading.Lock()
+
+
+def get_loop_monitor() -> LoopMonitor | None:
+    """The process-wide monitor, or None if LOOP_MONITOR_INTERVAL_SECONDS is 0."""
+    global _monitor
+    if Config.LOOP_MONITOR_INTERVAL_SECONDS <= 0:
+        return None
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = LoopMonitor(
+                Config.LOOP_MONITOR_INTERVAL_SECONDS, Config.LOOP_STALL_SECONDS
+            )
+        return _monitor
@@ -0,0 +1,110 @@
+"""
+Per-snapshot timing breakdown for /perf.
+
+While a platform is fetched, `platform_run(platform)` makes a PlatformRun
+current (a context variable, so it follows asyncio.to_thread and pool
+tasks submitted with `in_context`). Clients report what happened through
+`cache_lookup`, `fallback` and `retry`, which also update the Prometheus
+metrics and mark the current trace span, and time each API request with
+`api_call`. The aggregator keeps the finished runs of each snapshot in a
+ring buffer.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from app.utils import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("perf_platform_run", default=None)
+
+_RETRIES = metrics.counter(
+    "portfolio_retries_total", "Platform requests retried after an error", ("platform",)
+)
+
+
+class PlatformRun:
+    """What one platform fetch did: duration, status, caches, retries, fallbacks."""
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.seconds = 0.0
+        self.status = "ok"  # ok | error | stale
+        self.caches = {}  # cache name -> "hit" / "miss"
+        self.retries = 0
+        self.fallbacks = []
+        self._lock = threading.Lock()  # accounts of one platform run in parallel
+
+    def cache_result(self) -> str:
+        """'hit' only if every cache consulted was a hit; '-' if none was."""
+        if not self.caches:
+            return "-"
+        return "hit" if all(r == "hit" for r in self.caches.values()) else "miss"
+
+
+@contextmanager
+def platform_run(platform: str):
+    run = PlatformRun(platform)
+    token = _current.set(run)
+    try:
+        yield run
+    finally:
+        _current.reset(token)
+
+
+def in_context(fn):
+    """Wrap `fn` to run in a copy of the caller's context (for thread pools)."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+@contextmanager
+def api_call(platform: str, call: str, **attributes):
+    """Time one platform API request: metrics, a trace span and a DEBUG log."""
+    started = time.perf_counter()
+    try:
+        with tracing.span(f"{platform}.{call}", platform=platform, **attributes):
+            with metrics.API_REQUEST_SECONDS.time(platform=platform, call=call):
+                yield
+    finally:
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.debug(
+            "%s %s took %.1f ms",
+            platform,
+            call,
+            duration_ms,
+            extra={"platform": platform, "call": call, "duration_ms": duration_ms},
+        )
+
+
+def cache_lookup(cache: str, result: str) -> None:
+    metrics.CACHE_REQUESTS.inc(cache=cache, result=result)
+    tracing.add_event(f"cache {result}", cache=cache)
+    run = _current.get()
+    if run is not None:
+        with run._lock:
+            # A miss anywhere in the fetch outweighs hits on other lookups
+            if run.caches.get(cache) != "miss":
+                run.caches[cache] = result
+
+
+def fallback(platform: str, path: str) -> None:
+    metrics.FALLBACKS.inc(platform=platform, path=path)
+    tracing.add_event("fallback", platform=platform, path=path)
+    run = _current.get()
+    if run is not None:
+        with run._lock:
+            run.fallbacks.append(path)
+
+
+def retry(platform: str) -> None:
+    _RETRIES.inc(platform=platform)
+    tracing.add_event("retry", platform=platform)
+    run = _current.get()
+    if run is not None:
+        with run._lock:
+            run.retries += 1
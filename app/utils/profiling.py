@@ -0,0 +1,186 @@
+"""
+On-demand profiling for the admin /profile and /memsnap commands.
+
+Nothing here runs until an admin asks for it: cProfile is enabled only for
+the duration of one profiled snapshot or time window, and tracemalloc only
+between `/memsnap` and `/memsnap stop`. Outside a profiled snapshot,
+`propagate(fn)` returns `fn` unchanged.
+
+cProfile hooks a single thread, so a profiled snapshot collects one
+profile per thread it touches: the worker running the snapshot and, via
+`propagate`, the pool threads fetching exchange accounts. The reports
+merge them.
+"""
+
+import contextvars
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+_session = contextvars.ContextVar("profiling_session", default=None)
+_busy = threading.Lock()  # one cProfile session at a time
+_baseline = None  # tracemalloc snapshot that /memsnap compares against
+_baseline_at = None
+_memsnap_lock = threading.Lock()
+
+# Traces of the import machinery and of tracemalloc itself are noise
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Another profiling session is already running."""
+
+
+class _Session:
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def new_profile(self) -> cProfile.Profile:
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        return profile
+
+
+def _report(profiles: list, title: str, top: int) -> str:
+    """Top `top` functions by cumulative and by own time, as plain text."""
+    buffer = io.StringIO()
+    buffer.write(f"{title}\n\n")
+    stats = pstats.Stats(*profiles, stream=buffer)
+    stats.strip_dirs()
+    for sort, label in (("cumulative", "cumulative"), ("tottime", "own")):
+        buffer.write(f"=== Top {top} by {label} time ===\n")
+        stats.sort_stats(sort).print_stats(top)
+    return buffer.getvalue()
+
+
+def propagate(fn):
+    """Wrap pool work `fn` so the active session, if any, profiles it too."""
+    session = _session.get()
+    if session is None:
+        return fn
+
+    def profiled(*args, **kwargs):
+        return session.new_profile().runcall(fn, *args, **kwargs)
+
+    return profiled
+
+
+def profile_call(fn, top: int, *args, **kwargs) -> tuple:
+    """
+    Run `fn(*args, **kwargs)` under cProfile in the calling thread, plus any
+    pool work it hands out through `propagate`. Blocking; returns
+    (result, report text). Raises ProfilerBusyError if a session is running.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusyError("A profiling session is already running.")
+    try:
+        session = _Session()
+        token = _session.set(session)
+        started = time.perf_counter()
+        try:
+            result = session.new_profile().runcall(fn, *args, **kwargs)
+        finally:
+            _session.reset(token)
+        elapsed = time.perf_counter() - started
+        title = (
+            f"{getattr(fn, '__qualname__', fn)} in {elapsed:.2f}s "
+            f"({len(session.profiles)} thread profile(s) merged)"
+        )
+        return result, _report(session.profiles, title, top)
+    finally:
+        _busy.release()
+
+
+class WindowProfiler:
+    """
+    cProfile of the calling thread between start() and stop(). Started from
+    the event loop it sees every handler and job that runs on the loop,
+    which is where slow or blocking code shows up as bot latency.
+    """
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self._started = None
+
+    def start(self) -> None:
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusyError("A profiling session is already running.")
+        try:
+            self._profile.enable()
+        except ValueError as e:  # another profiler owns this thread
+            _busy.release()
+            raise ProfilerBusyError(str(e)) from e
+        self._started = time.perf_counter()
+
+    def stop(self) -> float:
+        """Stop profiling; returns the window length in seconds."""
+        self._profile.disable()
+        _busy.release()
+        return time.perf_counter() - self._started
+
+    def report(self, title: str, top: int) -> str:
+        """Blocking; call from a worker thread."""
+        return _report([self._profile], title, top)
+
+
+def memsnap(frames: int, top: int) -> str:
+    """
+    Take a tracemalloc snapshot and report the growth since the baseline.
+    The first call starts tracing and only records the baseline; later calls
+    compare against it without moving it. Blocking.
+    """
+    global _baseline, _baseline_at
+    with _memsnap_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            _baseline = None
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        now = time.time()
+        if _baseline is None:
+            _baseline, _baseline_at = snapshot, now
+            return ""
+
+        stats = snapshot.compare_to(_baseline, "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        minutes = (now - _baseline_at) / 60
+        lines = [
+            f"Memory growth over {minutes:.1f} min since the baseline",
+            f"Traced now {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB, "
+            f"tracemalloc overhead {tracemalloc.get_tracemalloc_memory() / 1e6:.1f} MB",
+        ]
+        pyplot = sys.modules.get("matplotlib.pyplot")
+        if pyplot is not None:
+            lines.append(f"Open matplotlib figures: {len(pyplot.get_fignums())}")
+        lines.append("")
+        lines.append(f"=== Top {top} allocation sites by growth ===")
+        lines += [str(stat) for stat in stats[:top]]
+        return "\n".join(lines) + "\n"
+
+
+def memsnap_reset() -> None:
+    """Make the next /memsnap take a new baseline."""
+    global _baseline
+    with _memsnap_lock:
+        _baseline = None
+
+
+def memsnap_stop() -> bool:
+    """Stop tracing and drop the baseline; False if tracing was off."""
+    global _baseline
+    with _memsnap_lock:
+        _baseline = None
+        if not tracemalloc.is_tracing():
+            return False
+        tracemalloc.stop()
+        return True
@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+from app.config import Config
+from app.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(RuntimeError):
+    """A call would have to wait longer than allowed for its platform's budget."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `capacity` requests per `per_seconds`, refilled
+    continuously. Callers block until a token is free, up to `max_wait`.
+    """
+
+    def __init__(self, name: str, capacity: int, per_seconds: float):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.per_seconds = per_seconds
+        self.rate = self.capacity / per_seconds  # tokens per second
+
+        self.tokens = float(self.capacity)
+        self.granted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait: float) -> float:
+        """Take one token, sleeping if needed. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.granted += 1
+                    if waited:
+                        self.delayed += 1
+                        self.wait_seconds += waited
+                    return waited
+
+                wait = (1 - self.tokens) / self.rate
+                if waited + wait > max_wait:
+                    self.rejected += 1
+                    raise RateLimitExceeded(
+                        f"{self.name} rate limit reached "
+                        f"({self.capacity} per {self.per_seconds:g}s)"
+                    )
+
+            time.sleep(wait)
+            waited += wait
+
+    def utilization(self) -> float:
+        """Fraction of the burst budget currently in use (0.0–1.0)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return 1 - self.tokens / self.capacity
+
+
+class RateLimitScheduler:
+    """Registry of per-platform token buckets that every client routes through."""
+
+    def __init__(self, limits: dict[str, tuple[int, float]], max_wait: float):
+        self.max_wait = max_wait
+        self.buckets = {
+            name: TokenBucket(name, capacity, per_seconds)
+            for name, (capacity, per_seconds) in limits.items()
+        }
+
+    def acquire(self, platform: str) -> None:
+        bucket = self.buckets.get(platform)
+        if bucket is None:
+            return
+        waited = bucket.acquire(self.max_wait)
+        if waited:
+            logger.info(
+                "%s: waited %.2fs for rate limit budget",
+                platform,
+                waited,
+                extra={"platform": platform, "duration_ms": round(waited * 1000, 1)},
+            )
+            tracing.add_event("rate_limit_wait", platform=platform, seconds=waited)
+
+    def report(self) -> list[dict]:
+        """Per-platform budget usage and counters, for display."""
+        return [
+            {
+                "name": name,
+                "limit": f"{bucket.capacity}/{bucket.per_seconds:g}s",
+                "utilization": bucket.utilization(),
+                "granted": bucket.granted,
+                "delayed": bucket.delayed,
+                "rejected": bucket.rejected,
+                "wait_seconds": bucket.wait_seconds,
+            }
+            for name, bucket in self.buckets.items()
+        ]
+
+
+def parse_limit(value: str) -> tuple[int, float]:
+    """Parse a "<requests>/<seconds>" limit string, e.g. "10/60"."""
+    count, _, seconds = value.partition("/")
+    return int(count), float(seconds or 1)
+
+
+_scheduler: RateLimitScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """Return the process-wide scheduler, built from Config on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            limits = {}
+            for platform, value in Config.RATE_LIMITS.items():
+                try:
+                    limits[platform] = parse_limit(value)
+                except ValueError:
+                    logger.error(f"Invalid rate limit for {platform}: {value!r}")
+            _scheduler = RateLimitScheduler(limits, Config.RATE_LIMIT_MAX_WAIT_SECONDS)
+        return _scheduler
+
+
+def acquire(platform: str) -> None:
+    """Block until `platform` has request budget; raise RateLimitExceeded if too long."""
+    get_scheduler().acquire(platform)
@@ -0,0 +1,322 @@
+"""
+Lightweight spans across the snapshot pipeline.
+
+A command or job opens a trace with `trace(name)`; code below it opens
+child spans with `span(name)`. The current span is a context variable, so
+spans follow asyncio tasks, asyncio.to_thread and pool work submitted
+through perf.in_context; outside a trace `span` does nothing. Finished
+traces are kept in a ring buffer of TRACE_HISTORY_SIZE entries (0 turns
+tracing off) for /trace, which sends them as Chrome trace-event JSON
+(chrome://tracing, ui.perfetto.dev). With OTLP_ENDPOINT set they are also
+posted as OTLP/HTTP JSON to `<OTLP_ENDPOINT>/v1/traces` from a background
+thread.
+"""
+
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("trace_span", default=None)
+_traces = deque(maxlen=max(Config.TRACE_HISTORY_SIZE, 1))
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation; times are time.time_ns() values."""
+
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "events",
+        "thread_id",
+        "thread_name",
+        "error",
+    )
+
+    def __init__(self, trace, name: str, parent_id: str | None, attributes: dict):
+        thread = threading.current_thread()
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.events = []  # (time_ns, name, attributes)
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+
+class Trace:
+    """All spans of one command or job, root first."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def finished_spans(self) -> list:
+        with self._lock:
+            return [s for s in self.spans if s.end_ns is not None]
+
+
+@contextmanager
+def _run(span: Span):
+    token = _current.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current.reset(token)
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Open a new trace whose root span is `name`; yields the root (or None)."""
+    if Config.TRACE_HISTORY_SIZE <= 0:
+        yield None
+        return
+    new = Trace()
+    root = Span(new, name, None, attributes)
+    new.add(root)
+    try:
+        with _run(root):
+            yield root
+    finally:
+        _traces.append(new)
+        if Config.OTLP_ENDPOINT:
+            _get_exporter().submit(new)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child of the current span; yields None (and records nothing) outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    parent.trace.add(child)
+    with _run(child):
+        yield child
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def add_event(name: str, **attributes) -> None:
+    """Mark a point in time (a retry, a fallback) on the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.add_event(name, **attributes)
+
+
+def recent_traces(chat_id=None, count: int = 1) -> list:
+    """The last `count` finished traces, oldest first, optionally of one chat."""
+    traces = [
+        t
+        for t in list(_traces)
+        if chat_id is None or t.root.attributes.get("chat_id") == str(chat_id)
+    ]
+    return traces[-count:]
+
+
+# ----------------------------------------------------------------------
+# Export formats
+# ----------------------------------------------------------------------
+
+
+def chrome_trace(traces: list) -> dict:
+    """
+    Chrome trace-event JSON for `traces`. Each trace is its own process lane
+    (named after its root span), with one track per thread that worked on it.
+    """
+    events = []
+    for pid, t in enumerate(traces, start=1):
+        spans = t.finished_spans()
+        if not spans:
+            continue
+        root = t.root
+        started = time.strftime("%H:%M:%S", time.localtime(root.start_ns / 1e9))
+        events.append(
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": f"{root.name} {started}"},
+            }
+        )
+        threads = {}
+        for s in spans:
+            threads[s.thread_id] = s.thread_name
+            args = dict(s.attributes, span_id=s.span_id, trace_id=t.trace_id)
+            if s.error:
+                args["error"] = s.error
+            events.append(
+                {
+                    "name": s.name,
+                    "cat": "error" if s.error else "span",
+                    "ph": "X",
+                    "ts": s.start_ns / 1000,
+                    "dur": (s.end_ns - s.start_ns) / 1000,
+                    "pid": pid,
+                    "tid": s.thread_id,
+                    "args": args,
+                }
+            )
+            for at, name, attributes in s.events:
+                events.append(
+                    {
+                        "name": name,
+                        "ph": "i",
+                        "s": "t",
+                        "ts": at / 1000,
+                        "pid": pid,
+                        "tid": s.thread_id,
+                        "args": attributes,
+                    }
+                )
+        events += [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": n},
+            }
+            for tid, n in threads.items()
+        ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def otlp_payload(traces: list) -> dict:
+    """OTLP/HTTP JSON ExportTraceServiceRequest for `traces`."""
+    spans = []
+    for t in traces:
+        for s in t.finished_spans():
+            attributes = dict(s.attributes, **{"thread.name": s.thread_name})
+            spans.append(
+                {
+                    "traceId": t.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": 1,  # SPAN_KIND_INTERNAL
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": _otlp_attributes(attributes),
+                    "events": [
+                        {
+                            "timeUnixNano": str(at),
+                            "name": name,
+                            "attributes": _otlp_attributes(attrs),
+                        }
+                        for at, name, attrs in s.events
+                    ],
+                    # STATUS_CODE_ERROR / STATUS_CODE_UNSET
+                    "status": (
+                        {"code": 2, "message": s.error} if s.error else {"code": 0}
+                    ),
+                }
+            )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes(
+                        {
+                            "service.name": Config.OTLP_SERVICE_NAME,
+                            "process.pid": os.getpid(),
+                        }
+                    )
+                },
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class _OtlpExporter:
+    """Posts finished traces to the collector from a daemon thread."""
+
+    def __init__(self, endpoint: str):
+        self.url = f"{endpoint.rstrip('/')}/v1/traces"
+        self._queue = queue.Queue(maxsize=100)
+        threading.Thread(target=self._run, name="otlp-export", daemon=True).start()
+
+    def submit(self, t: Trace) -> None:
+        try:
+            self._queue.put_nowait(t)
+        except queue.Full:
+            logger.warning("OTLP export queue full, dropping a trace")
+
+    def _run(self) -> None:
+        from app.utils.http import get_session
+
+        session = get_session()
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty() and len(batch) < 20:
+                batch.append(self._queue.get_nowait())
+            try:
+                response = session.post(self.url, json=otlp_payload(batch), timeout=5)
+                response.raise_for_status()
+            except Exception as e:
+                logger.warning(f"OTLP export to {self.url} failed: {e}")
+
+
+def _get_exporter() -> _OtlpExporter:
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = _OtlpExporter(Config.OTLP_ENDPOINT)
+        return _exporter
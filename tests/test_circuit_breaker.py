@@ -0,0 +1,122 @@
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def fail():
+    raise ConnectionError("platform down")
+
+
+def trip(breaker, times):
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("okx", failure_threshold=3, base_backoff=60)
+    trip(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    trip(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("okx", failure_threshold=3)
+    trip(breaker, 2)
+    assert breaker.call(lambda: 42) == 42
+    trip(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_circuit_fails_fast_with_last_value(clock):
+    breaker = CircuitBreaker("okx", failure_threshold=1, base_backoff=60)
+    breaker.call(lambda: {"okx_usd": 10.0})
+    trip(breaker, 1)
+
+    called = []
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(lambda: called.append(True))
+    assert not called
+    assert excinfo.value.last_value == {"okx_usd": 10.0}
+    assert excinfo.value.retry_in == pytest.approx(60)
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = CircuitBreaker("okx", failure_threshold=1, base_backoff=60)
+    trip(breaker, 1)
+    clock.now += 60
+
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_probe_failure_doubles_backoff(clock):
+    breaker = CircuitBreaker("okx", failure_threshold=1, base_backoff=60)
+    trip(breaker, 1)
+    clock.now += 60
+    trip(breaker, 1)  # the probe
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()["retry_in"] == pytest.approx(120)
+
+
+def test_backoff_is_capped(clock):
+    breaker = CircuitBreaker(
+        "okx", failure_threshold=1, base_backoff=60, max_backoff=90
+    )
+    trip(breaker, 1)
+    for _ in range(3):
+        clock.now += 1000
+        trip(breaker, 1)
+    assert breaker.snapshot()["retry_in"] == pytest.approx(90)
+
+
+def test_only_one_probe_at_a_time(clock):
+    breaker = CircuitBreaker("okx", failure_threshold=1, base_backoff=60)
+    trip(breaker, 1)
+    clock.now += 60
+
+    def probe():
+        # A second caller while the probe is in flight is turned away
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: None)
+        return "ok"
+
+    assert breaker.call(probe) == "ok"
+
+
+def test_excluded_exceptions_do_not_count(clock):
+    breaker = CircuitBreaker(
+        "ibkr", failure_threshold=1, excluded_exceptions=(TimeoutError,)
+    )
+
+    def throttled():
+        raise TimeoutError("own rate limit")
+
+    with pytest.raises(TimeoutError):
+        breaker.call(throttled)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_excluded_exception_releases_the_probe(clock):
+    breaker = CircuitBreaker(
+        "ibkr",
+        failure_threshold=1,
+        base_backoff=60,
+        excluded_exceptions=(TimeoutError,),
+    )
+    trip(breaker, 1)
+    clock.now += 60
+
+    def throttled():
+        raise TimeoutError("own rate limit")
+
+    with pytest.raises(TimeoutError):
+        breaker.call(throttled)
+    # The probe never reached the platform, so the next caller may probe
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
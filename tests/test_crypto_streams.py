@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+
+from app.platforms.crypto_streams import (
+    UNVALUED,
+    BybitWalletStream,
+    OkxAccountStream,
+)
+
+
+class FakeBybitClient:
+    api_key = api_secret = "x"
+    name = "main"
+
+    def __init__(self, total=150.0, unified=100.0, fail=False):
+        self.total = total
+        self.unified = unified
+        self.fail = fail
+
+    def get_balance_usd(self):
+        if self.fail:
+            raise ConnectionError("REST down")
+        return self.total
+
+    def _get_unified_balance_usd(self):
+        return self.unified
+
+    def _get_unified_holdings(self):
+        return {"BTC": 1.0}
+
+    def _get_fund_holdings(self):
+        return {"USDT": 50.0}
+
+
+class FakeOkxClient:
+    api_key = api_secret = passphrase = "x"
+    name = "main"
+
+    def get_account_snapshot(self, include_coins=False):
+        return 200.0, ({"ETH": 2.0, "SOL": 5.0} if include_coins else {})
+
+
+def bybit_push(**account):
+    return json.dumps(
+        {"topic": "wallet", "data": [{"accountType": "UNIFIED", **account}]}
+    )
+
+
+def okx_push(**account):
+    return json.dumps({"arg": {"channel": "account"}, "data": [account]})
+
+
+def synced(stream):
+    """Resync over (fake) REST and mark the stream connected."""
+    asyncio.run(stream._resync())
+    stream.connected = True
+    return stream
+
+
+@pytest.mark.parametrize("equity", [None, ""])
+def test_empty_equity_is_unvalued_not_zero(equity):
+    bybit = synced(BybitWalletStream(FakeBybitClient()))
+    okx = synced(OkxAccountStream(FakeOkxClient()))
+    assert bybit._parse_equity(json.loads(bybit_push(totalEquity=equity))) is UNVALUED
+    assert okx._parse_equity(json.loads(okx_push(totalEq=equity))) is UNVALUED
+    # Parsing leaves the stream's state alone
+    assert (bybit.get_equity(), okx.get_equity()) == (150.0, 200.0)
+
+
+def test_bybit_push_adds_rest_only_offset():
+    stream = synced(BybitWalletStream(FakeBybitClient()))
+    assert stream.get_equity() == 150.0
+
+    stream._handle_raw(bybit_push(totalEquity="110"))
+    assert stream.get_equity() == 160.0
+
+
+def test_bybit_empty_push_falls_back_to_rest():
+    stream = synced(BybitWalletStream(FakeBybitClient()))
+    stream._handle_raw(bybit_push(totalEquity=""))
+    assert stream.get_equity() is None
+
+
+def test_bybit_not_ready_until_resync_succeeds():
+    client = FakeBybitClient(fail=True)
+    stream = synced(BybitWalletStream(client))
+    stream._handle_raw(bybit_push(totalEquity="110"))
+    # Without the Funding offset the streamed value would be too low
+    assert stream.get_equity() is None
+
+    client.fail = False
+    asyncio.run(stream._resync())
+    assert stream.get_equity() == 150.0
+
+
+def test_push_during_resync_is_not_overwritten():
+    stream = synced(OkxAccountStream(FakeOkxClient()))
+
+    async def push_while_resyncing():
+        resync = asyncio.create_task(stream._resync())
+        await asyncio.sleep(0)  # the REST read is now running in a thread
+        stream._handle_raw(okx_push(totalEq="250"))
+        await resync
+
+    asyncio.run(push_while_resyncing())
+    # The REST reading (200) started before the push and is older
+    assert stream.get_equity() == 250.0
+
+
+def test_bybit_offset_applies_even_after_a_newer_push():
+    client = FakeBybitClient()
+    stream = synced(BybitWalletStream(client))
+    client.total = 180.0  # Funding wallet grew to 80
+
+    async def push_while_resyncing():
+        resync = asyncio.create_task(stream._resync())
+        await asyncio.sleep(0)
+        stream._handle_raw(bybit_push(totalEquity="110"))
+        await resync
+
+    asyncio.run(push_while_resyncing())
+    assert stream.get_equity() == 190.0
+
+
+def test_bybit_coins_include_funding_wallet(monkeypatch):
+    monkeypatch.setattr(
+        "app.platforms.crypto_streams.Config.INCLUDE_CRYPTO_BREAKDOWN", True
+    )
+    stream = synced(BybitWalletStream(FakeBybitClient()))
+    stream._handle_raw(
+        bybit_push(totalEquity="110", coin=[{"coin": "btc", "walletBalance": "1.5"}])
+    )
+    assert stream.get_coins() == {"BTC": 1.5, "USDT": 50.0}
+
+
+@pytest.mark.parametrize("equity", [None, ""])
+def test_okx_empty_equity_falls_back_to_rest(equity):
+    stream = synced(OkxAccountStream(FakeOkxClient()))
+    assert stream.get_equity() == 200.0
+
+    stream._handle_raw(okx_push(totalEq=equity, details=[]))
+    assert stream.get_equity() is None
+
+
+def test_okx_push_updates_equity():
+    stream = synced(OkxAccountStream(FakeOkxClient()))
+    stream._handle_raw(okx_push(totalEq="210.5"))
+    assert stream.get_equity() == 210.5
+
+
+def test_okx_partial_details_are_merged(monkeypatch):
+    monkeypatch.setattr(
+        "app.platforms.crypto_streams.Config.INCLUDE_CRYPTO_BREAKDOWN", True
+    )
+    stream = synced(OkxAccountStream(FakeOkxClient()))
+    stream._handle_raw(
+        okx_push(
+            totalEq="210",
+            details=[{"ccy": "SOL", "eq": "0"}, {"ccy": "eth", "eq": "2.5"}],
+        )
+    )
+    assert stream.get_coins() == {"ETH": 2.5}
+
+
+def test_disconnected_stream_is_not_trusted():
+    stream = synced(OkxAccountStream(FakeOkxClient()))
+    stream.connected = False
+    assert stream.get_equity() is None
+    assert stream.get_coins() is None
+
+
+def test_other_topics_are_ignored():
+    stream = BybitWalletStream(FakeBybitClient())
+    assert stream._parse_equity({"topic": "order", "data": []}) is None
+    stream._handle_raw("pong")
+    stream._handle_raw("not json")
+    assert stream._live is None
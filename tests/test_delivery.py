@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from telegram.error import NetworkError, TimedOut
+
+from app import delivery
+from app.delivery import SendQueue
+
+
+class FakeBot:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"message to {chat_id}"
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    async def sleep(seconds):
+        pass
+
+    monkeypatch.setattr(delivery.asyncio, "sleep", sleep)
+    monkeypatch.setattr(delivery.Config, "DELIVERY_MAX_ATTEMPTS", 3)
+
+
+def test_connection_errors_are_retried():
+    bot = FakeBot(NetworkError("connection reset"))
+    assert asyncio.run(SendQueue(bot).send("1", "report")) == "message to 1"
+    assert bot.calls == 2
+
+
+def test_timeouts_are_not_retried():
+    bot = FakeBot(TimedOut())
+    with pytest.raises(TimedOut):
+        asyncio.run(SendQueue(bot).send("1", "report"))
+    # Telegram may have delivered the first one
+    assert bot.calls == 1
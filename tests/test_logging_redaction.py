@@ -0,0 +1,147 @@
+import json
+import logging
+import queue
+
+from app.utils import logging_redaction
+from app.utils.logging_redaction import (
+    REDACTED,
+    JsonFormatter,
+    LogSampler,
+    RedactingQueueHandler,
+    build_pattern,
+    configured_secrets,
+)
+
+SECRET = "sk-live-0123456789abcdef"
+
+
+def make_record(msg, *args, exc_info=None, name="app.test", level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+
+def handled(handler, record):
+    """The record as the listener thread receives it."""
+    handler.handle(record)
+    return handler.queue.get_nowait()
+
+
+def redacting_handler(*secrets):
+    return RedactingQueueHandler(queue.SimpleQueue(), build_pattern(secrets))
+
+
+def test_redacts_message_and_args():
+    handler = redacting_handler(SECRET)
+    record = handled(handler, make_record(f"key {SECRET} and %s", SECRET))
+    assert record.getMessage() == f"key {REDACTED} and {REDACTED}"
+    assert record.args is None
+
+
+def test_redacts_tracebacks():
+    handler = redacting_handler(SECRET)
+    try:
+        raise RuntimeError(f"auth failed for {SECRET}")
+    except RuntimeError as e:
+        record = make_record("request failed", exc_info=(type(e), e, e.__traceback__))
+
+    message = handled(handler, record).getMessage()
+    assert SECRET not in message
+    assert f"RuntimeError: auth failed for {REDACTED}" in message
+
+
+def test_longest_secret_wins():
+    handler = redacting_handler("abcdefgh", "abcdefgh-ijkl")
+    record = handled(handler, make_record("token abcdefgh-ijkl"))
+    assert record.getMessage() == f"token {REDACTED}"
+
+
+def test_short_values_are_not_secrets():
+    assert build_pattern(["1234567", ""]) is None
+    handler = redacting_handler("1234567", SECRET)
+    record = handled(handler, make_record("query 1234567 total %s", "1234567.89"))
+    assert record.getMessage() == "query 1234567 total 1234567.89"
+
+
+def test_query_ids_are_not_collected(monkeypatch):
+    config = logging_redaction.Config
+    monkeypatch.setattr(config, "IBKR_FLEX_TOKEN", "flex-token-123456")
+    monkeypatch.setattr(config, "IBKR_QUERY_ID", "987654321")
+    monkeypatch.setattr(
+        config,
+        "TENANTS",
+        {"1": {"ibkr_flex_token": "tenant-flex-token", "ibkr_query_id": "55555555"}},
+    )
+
+    secrets = configured_secrets()
+    assert "flex-token-123456" in secrets
+    assert "tenant-flex-token" in secrets
+    assert "987654321" not in secrets
+    assert "55555555" not in secrets
+
+
+def test_without_secrets_records_pass_unchanged():
+    handler = RedactingQueueHandler(queue.SimpleQueue(), None)
+    record = handled(handler, make_record("balance %s", 42))
+    assert record.getMessage() == "balance 42"
+
+
+def sampled(sampler, msg, *args, at, level=logging.INFO, name="app.test"):
+    record = make_record(msg, *args, level=level, name=name)
+    record.created = at
+    return record if sampler.filter(record) else None
+
+
+def test_sampler_passes_a_burst_per_window():
+    sampler = LogSampler(window=60, burst=2)
+    passed = [sampled(sampler, "hit %s", i, at=100 + i) for i in range(5)]
+    assert [r is not None for r in passed] == [True, True, False, False, False]
+
+
+def test_sampler_reports_suppressed_count_in_next_window():
+    sampler = LogSampler(window=60, burst=1)
+    for i in range(4):
+        sampled(sampler, "hit %s", i, at=100 + i)
+
+    record = sampled(sampler, "hit %s", 9, at=160)
+    assert record.suppressed == 3
+    # The queue handler appends the count to the message
+    message = handled(redacting_handler(SECRET), record).getMessage()
+    assert message == "hit 9 (+3 similar suppressed)"
+
+
+def test_sampler_keys_on_logger_and_template():
+    sampler = LogSampler(window=60, burst=1)
+    assert sampled(sampler, "a %s", 1, at=100)
+    assert sampled(sampler, "b %s", 1, at=100)
+    assert sampled(sampler, "a %s", 1, at=100, name="app.other")
+    assert sampled(sampler, "a %s", 2, at=101) is None
+
+
+def test_sampler_never_drops_warnings():
+    sampler = LogSampler(window=60, burst=1)
+    for i in range(5):
+        assert sampled(sampler, "retry %s", i, at=100, level=logging.WARNING)
+
+
+def test_sampler_forgets_expired_sites_when_full(monkeypatch):
+    monkeypatch.setattr(LogSampler, "_MAX_SITES", 3)
+    sampler = LogSampler(window=60, burst=1)
+    for i in range(3):
+        sampled(sampler, f"unique {i}", at=100)
+    sampled(sampler, "late", at=200)
+    assert len(sampler._sites) == 1
+
+
+def test_json_formatter_emits_structured_fields():
+    handler = redacting_handler(SECRET)
+    record = make_record("%s took %.1f ms", "bybit", 12.34, level=logging.DEBUG)
+    record.platform = "bybit"
+    record.duration_ms = 12.3
+    record.cache_hit = False
+
+    entry = json.loads(JsonFormatter().format(handled(handler, record)))
+    assert entry["msg"] == "bybit took 12.3 ms"
+    assert entry["level"] == "DEBUG"
+    assert entry["logger"] == "app.test"
+    assert (entry["platform"], entry["duration_ms"]) == ("bybit", 12.3)
+    assert entry["cache_hit"] is False
+    assert "attempt" not in entry
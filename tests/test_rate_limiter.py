@@ -0,0 +1,67 @@
+import pytest
+
+from app.utils.rate_limiter import (
+    RateLimitExceeded,
+    RateLimitScheduler,
+    TokenBucket,
+    parse_limit,
+)
+
+
+def test_burst_is_granted_without_waiting(clock):
+    bucket = TokenBucket("okx", capacity=3, per_seconds=3)
+    assert [bucket.acquire(max_wait=0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.granted == 3
+    assert bucket.utilization() == pytest.approx(1.0)
+
+
+def test_waits_for_the_next_token(clock):
+    bucket = TokenBucket("okx", capacity=2, per_seconds=10)  # one per 5 s
+    bucket.acquire(max_wait=0)
+    bucket.acquire(max_wait=0)
+
+    assert bucket.acquire(max_wait=10) == pytest.approx(5)
+    assert bucket.delayed == 1
+    assert bucket.wait_seconds == pytest.approx(5)
+
+
+def test_rejects_when_the_wait_is_too_long(clock):
+    bucket = TokenBucket("ibkr", capacity=1, per_seconds=60)
+    bucket.acquire(max_wait=0)
+
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire(max_wait=5)
+    assert bucket.rejected == 1
+    assert clock.slept == []  # gave up without sleeping
+
+
+def test_refills_over_time_up_to_capacity(clock):
+    bucket = TokenBucket("bybit", capacity=2, per_seconds=2)
+    bucket.acquire(max_wait=0)
+    bucket.acquire(max_wait=0)
+
+    clock.now += 100
+    assert bucket.utilization() == pytest.approx(0.0)
+    bucket.acquire(max_wait=0)
+    bucket.acquire(max_wait=0)
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire(max_wait=0)
+
+
+def test_scheduler_skips_unlimited_platforms(clock):
+    scheduler = RateLimitScheduler({"ibkr": (1, 60)}, max_wait=0)
+    scheduler.acquire("ibkr")
+    scheduler.acquire("tbank")  # no bucket, never limited
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire("ibkr")
+
+    [report] = scheduler.report()
+    assert report["limit"] == "1/60s"
+    assert (report["granted"], report["rejected"]) == (1, 1)
+
+
+def test_parse_limit():
+    assert parse_limit("10/60") == (10, 60.0)
+    assert parse_limit("5") == (5, 1.0)
+    with pytest.raises(ValueError):
+        parse_limit("many/60")
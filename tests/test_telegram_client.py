@@ -0,0 +1,89 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+# app.telegram_client imports every platform client, including the T-Bank SDK
+pytest.importorskip("t_tech.invest")
+
+from app import history_manager, report_delta  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.telegram_client import TelegramBot  # noqa: E402
+from app.tenants import TenantRegistry  # noqa: E402
+
+
+class FakeAggregator:
+    def __init__(self, usd):
+        self.summary = {"total_usd": usd}
+
+    async def get_portfolio_summary_async(self):
+        return self.summary
+
+    def get_totals(self, summary):
+        return summary["total_usd"], 0.0
+
+    def format_message(self, summary):
+        return f"total {summary['total_usd']}"
+
+
+class FakeDelta:
+    def decide(self, summary, usd, slot):
+        return report_delta.FULL
+
+    def record_full(self, summary, usd, slot):
+        pass
+
+
+class FakeDelivery:
+    def __init__(self):
+        self.message_ids = iter(range(100, 200))
+
+    async def deliver(self, chat_ids, text, **kwargs):
+        return {
+            str(c): SimpleNamespace(message_id=next(self.message_ids)) for c in chat_ids
+        }
+
+
+def tenant(chat_id, usd, recipients=None):
+    return SimpleNamespace(
+        chat_id=str(chat_id),
+        name=f"tenant {chat_id}",
+        recipients=[str(r) for r in recipients or [chat_id]],
+        aggregator=FakeAggregator(usd),
+        delta=FakeDelta(),
+        history_file=None,
+    )
+
+
+def make_bot(*tenants):
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.tenants = TenantRegistry(list(tenants))
+    bot.delivery = FakeDelivery()
+    bot._snapshots = OrderedDict()
+
+    async def no_alerts(tenant, summary, usd):
+        pass
+
+    bot._check_alerts = no_alerts
+    return bot
+
+
+def test_report_to_another_tenant_does_not_replace_its_snapshot(monkeypatch):
+    monkeypatch.setattr(history_manager, "save_snapshot", lambda *args: None)
+    alice = tenant("1", 100.0, recipients=["1", "2", "3"])
+    bob = tenant("2", 200.0)
+    bot = make_bot(alice, bob)
+    bot._remember_snapshot("2", None, bob.aggregator.summary)
+
+    slot = datetime.now(Config.get_timezone_obj())
+    asyncio.run(bot._scheduled_report(alice, slot))
+
+    # Bob's /pie_chart and /positions still see Bob's portfolio
+    assert bot._recent_snapshot("2")[1] == {"total_usd": 200.0}
+    # The buttons under each delivered report still find Alice's summary
+    assert bot._recent_snapshot("2", 101)[1] == {"total_usd": 100.0}
+    # Alice's own chat and a plain recipient get her chat-level snapshot
+    assert bot._recent_snapshot("1")[1] == {"total_usd": 100.0}
+    assert bot._recent_snapshot("3", 102)[1] == {"total_usd": 100.0}
@@ -0,0 +1,313 @@
+"""
+Benchmark suite for the snapshot pipeline, run against the local stand-ins.
+
+    python -m tools.bench --output bench.json --baseline bench_baseline.json
+
+Starts the fake Bybit/OKX REST and IBKR Flex servers from
+tools.fake_exchanges (T-Bank too with --tbank-target, see below), points
+a fresh Aggregator at them and times each stage:
+
+    platform.<name>       Aggregator.fetch_platform per platform
+    ibkr.cached           IBKR served from its daily cache
+    snapshot.end_to_end   get_portfolio_summary_async incl. crypto breakdown
+    format_message / get_totals
+    history.save_snapshot.<n> / history.get_history.<n>   n = 30, 1k, 100k
+    ibkr.parse_report.<n> Flex XML with n open positions
+    chart.portfolio / chart.pie
+
+Results (median, min, mean, p95 in ms) are written as JSON. With
+--baseline, each median is compared with the stored one and anything more
+than --tolerance slower (and at least --min-delta-ms) is reported as a
+regression; the exit status is 1 if there is any. --save-baseline writes
+the current results as the new baseline.
+
+The T-Bank stand-in needs TLS: start tools.fake_exchanges.tbank_grpc with a
+certificate, export GRPC_DEFAULT_SSL_ROOTS_FILE_PATH=cert.pem and pass
+--tbank-target 127.0.0.1:8782.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from tools.fake_exchanges.flex import build_statement, serve_flex
+from tools.fake_exchanges.http import serve_exchanges
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZES = (30, 1_000, 100_000)
+XML_SIZES = (10, 1_000, 10_000)
+
+
+def measure(fn, repeat: int, warmup: int = 1, setup=None) -> dict:
+    """Time `fn` `repeat` times (after `warmup` untimed calls); stats in ms."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(samples[0], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+        "runs": repeat,
+    }
+
+
+def _write_history(path: str, entries: int) -> None:
+    start = datetime.now() - timedelta(days=entries)
+    data = {
+        (start + timedelta(days=i)).strftime("%d-%m-%Y"): {
+            "USD": 100_000.0 + i,
+            "RUB": 9_000_000.0 + i,
+        }
+        for i in range(entries)
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _configure_env(exchanges_url: str, flex_url: str, args) -> None:
+    """Point the app at the stand-ins; must run before app modules are imported."""
+    os.environ.update(
+        BYBIT_REST_URL=exchanges_url,
+        OKX_REST_URL=exchanges_url,
+        IBKR_FLEX_BASE_URL=f"{flex_url}/Universal/servlet",
+        CRYPTO_STREAMING="false",
+        # Benchmark the code, not the request budgets
+        RATE_LIMIT_BYBIT="100000/1",
+        RATE_LIMIT_OKX="100000/1",
+        RATE_LIMIT_TBANK="100000/1",
+        RATE_LIMIT_IBKR="100000/1",
+    )
+    if args.tbank_target:
+        os.environ["TBANK_TARGET"] = args.tbank_target
+
+
+def run(args, workdir: str) -> dict:
+    exchanges = serve_exchanges(
+        port=0, coins=args.coins, latency=args.latency, error_rate=args.error_rate
+    )
+    flex = serve_flex(
+        port=0,
+        positions=args.positions,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    _configure_env(exchanges.url(), flex.url(), args)
+
+    from app import chart, history_manager
+    from app.aggregator import Aggregator
+    from app.platforms.ibkr_client import IBKRClient
+
+    cache_file = os.path.join(workdir, "ibkr_cache.json")
+    aggregator = Aggregator(
+        {
+            "bybit_accounts": [
+                {"name": "Bench", "api_key": "bench", "api_secret": "bench"}
+            ],
+            "okx_accounts": [
+                {
+                    "name": "Bench",
+                    "api_key": "bench",
+                    "api_secret": "bench",
+                    "passphrase": "bench",
+                }
+            ],
+            "tbank_token": "bench" if args.tbank_target else "",
+            "ibkr_flex_token": "bench",
+            "ibkr_query_id": "bench",
+            "ibkr_cache_file": cache_file,
+        }
+    )
+    repeat = args.repeat
+    results = {}
+
+    def drop_ibkr_cache():
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+
+    for name in aggregator.enabled_platforms():
+        setup = drop_ibkr_cache if name == "ibkr" else None
+        results[f"platform.{name}"] = measure(
+            lambda name=name: aggregator.fetch_platform(name), repeat, setup=setup
+        )
+    results["ibkr.cached"] = measure(lambda: aggregator.fetch_platform("ibkr"), repeat)
+
+    summary = None
+
+    def snapshot():
+        nonlocal summary
+        summary = asyncio.run(aggregator.get_portfolio_summary_async())
+
+    results["snapshot.end_to_end"] = measure(snapshot, repeat, setup=drop_ibkr_cache)
+    results["format_message"] = measure(
+        lambda: aggregator.format_message(summary), repeat * 10
+    )
+    results["get_totals"] = measure(lambda: aggregator.get_totals(summary), repeat * 10)
+
+    for size in HISTORY_SIZES:
+        path = os.path.join(workdir, f"history_{size}.json")
+        _write_history(path, size)
+        results[f"history.save_snapshot.{size}"] = measure(
+            lambda path=path: history_manager.save_snapshot(1.0, 90.0, path), repeat
+        )
+        results[f"history.get_history.{size}"] = measure(
+            lambda path=path: history_manager.get_history(30, path), repeat
+        )
+
+    parser = IBKRClient("bench", "bench", cache_file)
+    for size in XML_SIZES:
+        xml = build_statement(positions=size)
+        results[f"ibkr.parse_report.{size}"] = measure(
+            lambda xml=xml: parser._parse_report(xml), repeat
+        )
+
+    entries = history_manager.get_history(
+        30, os.path.join(workdir, f"history_{HISTORY_SIZES[0]}.json")
+    )
+    results["chart.portfolio"] = measure(
+        lambda: chart.build_portfolio_chart(entries), repeat
+    )
+    results["chart.pie"] = measure(lambda: chart.build_pie_chart(summary), repeat)
+
+    exchanges.stop()
+    flex.stop()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float):
+    """Per-benchmark ratio of current to baseline medians, and the regressions."""
+    comparison = {}
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        ratio = (
+            current["median_ms"] / before["median_ms"] if before["median_ms"] else 1.0
+        )
+        delta = current["median_ms"] - before["median_ms"]
+        regressed = ratio > 1 + tolerance and delta >= min_delta
+        comparison[name] = {
+            "baseline_median_ms": before["median_ms"],
+            "median_ms": current["median_ms"],
+            "ratio": round(ratio, 3),
+            "regression": regressed,
+        }
+        if regressed:
+            regressions.append(name)
+    return comparison, regressions
+
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        results = run(args, workdir)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "latency": args.latency,
+            "coins": args.coins,
+            "positions": args.positions,
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        report["comparison"], regressions = compare(
+            results, baseline, args.tolerance, args.min_delta_ms
+        )
+
+    width = max(len(name) for name in results)
+    for name, stats in results.items():
+        line = f"{name:<{width}}  {stats['median_ms']:>10.3f} ms"
+        if name in report.get("comparison", {}):
+            entry = report["comparison"][name]
+            line += f"  x{entry['ratio']:.2f} vs baseline"
+            if entry["regression"]:
+                line += "  REGRESSION"
+        print(line)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the baseline instead of comparing",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown of the median counted as a regression",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.5,
+        help="ignore slowdowns smaller than this (timer noise)",
+    )
+    parser.add_argument("--coins", type=int, default=20)
+    parser.add_argument("--positions", type=int, default=50)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="stand-in latency (seconds)"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tbank-target", help="host:port of the T-Invest stand-in")
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main(parser.parse_args()))
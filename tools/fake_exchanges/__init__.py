@@ -0,0 +1,4 @@
+"""
+Local stand-ins for the exchange APIs the bot talks to, so the pipeline can
+be exercised without credentials or network access.
+"""
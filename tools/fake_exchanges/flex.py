@@ -0,0 +1,166 @@
+"""
+Fake IBKR Flex Web Service.
+
+    python -m tools.fake_exchanges.flex --port 8781 --positions 200 --days 30
+
+Then run the bot with:
+
+    IBKR_FLEX_BASE_URL=http://127.0.0.1:8781/Universal/servlet
+
+SendRequest answers with a reference code and the GetStatement URL on this
+server; GetStatement returns a Flex statement with `days` daily
+EquitySummaryByReportDateInBase rows and `positions` OpenPosition rows (the
+payload size). With --token, other tokens get IBKR's "token is invalid"
+error. Latency and error injection work as in tools.fake_exchanges.http.
+"""
+
+import argparse
+import itertools
+import logging
+import random
+import threading
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import quoteattr
+
+from tools.fake_exchanges.http import FakeHTTPServer
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_ID = "U1234567"
+
+_references = itertools.count(1_000_000_001)
+
+
+def build_statement(
+    positions: int = 50, days: int = 30, seed: int = 1, nav: float = 236_000.0
+) -> bytes:
+    """A Flex statement XML with `days` NAV rows and `positions` positions."""
+    rng = random.Random(seed)
+    today = date.today()
+    lines = [
+        '<FlexQueryResponse queryName="bot" type="AF">',
+        '<FlexStatements count="1">',
+        f'<FlexStatement accountId="{ACCOUNT_ID}" '
+        f'fromDate="{(today - timedelta(days=days)):%d/%m/%Y}" '
+        f'toDate="{today:%d/%m/%Y}" period="LastNCalendarDays">',
+        f'<AccountInformation accountId="{ACCOUNT_ID}" currency="USD" />',
+        "<EquitySummaryInBase>",
+    ]
+    for offset in range(days, 0, -1):
+        nav *= 1 + rng.uniform(-0.01, 0.01)
+        lines.append(
+            f'<EquitySummaryByReportDateInBase accountId="{ACCOUNT_ID}" '
+            f'reportDate="{(today - timedelta(days=offset)):%d/%m/%Y}" '
+            f'total="{nav:.6f}" />'
+        )
+    lines.append("</EquitySummaryInBase>")
+    lines.append("<OpenPositions>")
+    for i in range(positions):
+        quantity = rng.randint(1, 500)
+        price = rng.uniform(5, 500)
+        lines.append(
+            f'<OpenPosition accountId="{ACCOUNT_ID}" symbol={quoteattr(f"SYM{i:04d}")} '
+            f'assetCategory="STK" currency="USD" position="{quantity}" '
+            f'markPrice="{price:.4f}" positionValue="{quantity * price:.2f}" />'
+        )
+    lines.append("</OpenPositions>")
+    lines += ["</FlexStatement>", "</FlexStatements>", "</FlexQueryResponse>"]
+    return "\n".join(lines).encode()
+
+
+class FlexService:
+    def __init__(self, positions: int, days: int, token: str | None = None):
+        self.token = token
+        self.statement = build_statement(positions, days)
+
+    def _params(self, handler) -> dict:
+        return {k: v[0] for k, v in parse_qs(urlsplit(handler.path).query).items()}
+
+    def _error(self, code: int, message: str):
+        body = (
+            "<FlexStatementResponse>"
+            "<Status>Fail</Status>"
+            f"<ErrorCode>{code}</ErrorCode>"
+            f"<ErrorMessage>{message}</ErrorMessage>"
+            "</FlexStatementResponse>"
+        )
+        return body.encode(), "text/xml"
+
+    def send_request(self, handler):
+        params = self._params(handler)
+        if self.token and params.get("t") != self.token:
+            return self._error(1015, "Token is invalid.")
+        host = handler.headers.get("Host")
+        servlet = urlsplit(handler.path).path.rsplit("/", 1)[0]
+        url = f"http://{host}{servlet}/FlexStatementService.GetStatement"
+        body = (
+            "<FlexStatementResponse>"
+            "<Status>Success</Status>"
+            f"<ReferenceCode>{next(_references)}</ReferenceCode>"
+            f"<Url>{url}</Url>"
+            "</FlexStatementResponse>"
+        )
+        return body.encode(), "text/xml"
+
+    def get_statement(self, handler):
+        if self.token and self._params(handler).get("t") != self.token:
+            return self._error(1015, "Token is invalid.")
+        return self.statement, "text/xml"
+
+    def routes(self) -> dict:
+        return {
+            "FlexStatementService.SendRequest": self.send_request,
+            "FlexStatementService.GetStatement": self.get_statement,
+        }
+
+
+def serve_flex(
+    host: str = "127.0.0.1",
+    port: int = 8781,
+    positions: int = 50,
+    days: int = 30,
+    token: str | None = None,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    seed: int | None = None,
+) -> FakeHTTPServer:
+    """Start the Flex stand-in in a background thread (port 0 = any)."""
+    service = FlexService(positions, days, token)
+    server = FakeHTTPServer(
+        (host, port), service.routes(), latency, error_rate, error_status, seed
+    )
+    return server.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8781)
+    parser.add_argument("--positions", type=int, default=50, help="payload size")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--token", help="accept only this Flex token")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = serve_flex(
+        args.host,
+        args.port,
+        args.positions,
+        args.days,
+        args.token,
+        args.latency,
+        args.error_rate,
+        args.error_status,
+        args.seed,
+    )
+    logger.info(f"Fake IBKR Flex on {server.url()}/Universal/servlet")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
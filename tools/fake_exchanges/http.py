@@ -0,0 +1,259 @@
+"""
+Fake Bybit and OKX REST APIs on one port.
+
+    python -m tools.fake_exchanges.http --port 8780 --latency 0.2 --error-rate 0.05 --coins 50
+
+Then run the bot with:
+
+    BYBIT_REST_URL=http://127.0.0.1:8780
+    OKX_REST_URL=http://127.0.0.1:8780
+
+Any credentials are accepted (signatures are not checked). The two venues
+use disjoint paths, so one server answers both: wallet and funding
+balances, the asset overview and spot tickers for Bybit, the account
+balance and spot tickers for OKX. Balances are a fixed random portfolio
+of `coins` coins (plus BTC, ETH and USDT) that the tickers price
+consistently, so totals add up whichever code path values them.
+
+`latency` (seconds, with up to 50% jitter) is added to every response and
+`error_rate` of the requests fail with `error_status`, which exercises
+retries, fallbacks and circuit breakers.
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+BASE_PRICES = {"BTC": 65_000.0, "ETH": 3_200.0, "USDT": 1.0}
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Shared plumbing: latency, error injection and JSON/XML replies."""
+
+    server: "FakeHTTPServer"
+
+    def do_GET(self):
+        self.server.requests += 1
+        path = urlsplit(self.path).path
+        self.server.delay()
+        if self.server.should_fail():
+            self._reply(self.server.error_status, b"injected failure", "text/plain")
+            return
+        route = self.server.routes.get(path) or self.server.route_for(path)
+        if route is None:
+            self._reply(404, b"not found", "text/plain")
+            return
+        body, content_type = route(self)
+        self._reply(200, body, content_type)
+
+    do_POST = do_GET
+
+    def _reply(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with configurable latency and failure rate."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        routes: dict,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int | None = None,
+    ):
+        super().__init__(address, FakeHandler)
+        self.routes = routes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def route_for(self, path: str):
+        """Fallback lookup by path suffix (e.g. Flex servlet names)."""
+        for suffix, route in self.routes.items():
+            if path.endswith(suffix):
+                return route
+        return None
+
+    def delay(self) -> None:
+        if self.latency > 0:
+            with self._random_lock:
+                jitter = self._random.uniform(0.5, 1.5)
+            time.sleep(self.latency * jitter)
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def start(self) -> "FakeHTTPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def _json(payload: dict):
+    return json.dumps(payload).encode(), "application/json"
+
+
+class FakePortfolio:
+    """A fixed portfolio of `coins` coins, priced consistently by the tickers."""
+
+    def __init__(self, coins: int = 20, seed: int = 1):
+        rng = random.Random(seed)
+        self.prices = dict(BASE_PRICES)
+        for i in range(coins):
+            self.prices[f"C{i:04d}"] = round(rng.uniform(0.01, 50.0), 4)
+        self.unified = {c: round(rng.uniform(0.1, 10.0), 6) for c in self.prices}
+        self.funding = {c: round(rng.uniform(0.1, 10.0), 6) for c in self.prices}
+        self.okx = {c: round(rng.uniform(0.1, 10.0), 6) for c in self.prices}
+
+    def value(self, holdings: dict) -> float:
+        return sum(qty * self.prices[coin] for coin, qty in holdings.items())
+
+    # --- Bybit ---
+
+    def bybit(self, result: dict):
+        return _json(
+            {
+                "retCode": 0,
+                "retMsg": "OK",
+                "result": result,
+                "retExtInfo": {},
+                "time": int(time.time() * 1000),
+            }
+        )
+
+    def bybit_wallet_balance(self, handler):
+        coins = [
+            {"coin": c, "walletBalance": str(q), "usdValue": str(q * self.prices[c])}
+            for c, q in self.unified.items()
+        ]
+        account = {
+            "accountType": "UNIFIED",
+            "totalEquity": f"{self.value(self.unified):.2f}",
+            "coin": coins,
+        }
+        return self.bybit({"list": [account]})
+
+    def bybit_fund_balance(self, handler):
+        balance = [
+            {"coin": c, "walletBalance": str(q), "transferBalance": str(q)}
+            for c, q in self.funding.items()
+        ]
+        return self.bybit({"accountType": "FUND", "balance": balance})
+
+    def bybit_asset_overview(self, handler):
+        total = self.value(self.unified) + self.value(self.funding)
+        return self.bybit({"totalEquity": f"{total:.2f}", "list": []})
+
+    def bybit_tickers(self, handler):
+        tickers = [
+            {"symbol": f"{c}USDT", "lastPrice": str(p)}
+            for c, p in self.prices.items()
+            if c != "USDT"
+        ]
+        return self.bybit({"category": "spot", "list": tickers})
+
+    # --- OKX ---
+
+    def okx_balance(self, handler):
+        details = [
+            {"ccy": c, "eq": str(q), "eqUsd": f"{q * self.prices[c]:.2f}"}
+            for c, q in self.okx.items()
+        ]
+        account = {"totalEq": f"{self.value(self.okx):.2f}", "details": details}
+        return _json({"code": "0", "msg": "", "data": [account]})
+
+    def okx_tickers(self, handler):
+        tickers = [
+            {"instId": f"{c}-USDT", "last": str(p)}
+            for c, p in self.prices.items()
+            if c != "USDT"
+        ]
+        return _json({"code": "0", "msg": "", "data": tickers})
+
+    def routes(self) -> dict:
+        return {
+            "/v5/account/wallet-balance": self.bybit_wallet_balance,
+            "/v5/asset/transfer/query-account-coins-balance": self.bybit_fund_balance,
+            "/v5/asset/asset-overview": self.bybit_asset_overview,
+            "/v5/market/tickers": self.bybit_tickers,
+            "/api/v5/account/balance": self.okx_balance,
+            "/api/v5/market/tickers": self.okx_tickers,
+        }
+
+
+def serve_exchanges(
+    host: str = "127.0.0.1",
+    port: int = 8780,
+    coins: int = 20,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    seed: int | None = None,
+) -> FakeHTTPServer:
+    """Start the Bybit + OKX stand-in in a background thread (port 0 = any)."""
+    portfolio = FakePortfolio(coins)
+    server = FakeHTTPServer(
+        (host, port), portfolio.routes(), latency, error_rate, error_status, seed
+    )
+    server.portfolio = portfolio
+    return server.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--coins", type=int, default=20, help="payload size")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = serve_exchanges(
+        args.host,
+        args.port,
+        args.coins,
+        args.latency,
+        args.error_rate,
+        args.error_status,
+        args.seed,
+    )
+    logger.info(f"Fake Bybit/OKX REST on {server.url()}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
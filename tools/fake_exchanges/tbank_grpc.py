@@ -0,0 +1,247 @@
+"""
+Fake T-Invest gRPC API (the services TBankClient uses).
+
+    python -m tools.fake_exchanges.tbank_grpc --port 8782 --cert cert.pem --key key.pem \
+        --accounts 3 --positions 100 --latency 0.1 --error-rate 0.05
+
+The SDK always opens a TLS channel, so the server needs a certificate for
+127.0.0.1 (a self-signed one is fine) and the bot has to trust it:
+
+    openssl req -x509 -newkey rsa:2048 -nodes -days 365 -subj /CN=127.0.0.1 \
+        -addext subjectAltName=IP:127.0.0.1 -keyout key.pem -out cert.pem
+    TBANK_TARGET=127.0.0.1:8782
+    GRPC_DEFAULT_SSL_ROOTS_FILE_PATH=cert.pem
+
+Implements UsersService.GetAccounts, OperationsService.GetPortfolio and
+MarketDataService.GetLastPrices with the SDK's generated servicers. Each
+account holds `positions` share positions priced in RUB plus a USD cash
+position; GetLastPrices answers for every FIGI it knows, including the
+USD/RUB rate. Failed requests abort with UNAVAILABLE. With --token, other
+tokens are rejected with UNAUTHENTICATED.
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from t_tech.invest.grpc import (
+    common_pb2,
+    marketdata_pb2,
+    marketdata_pb2_grpc,
+    operations_pb2,
+    operations_pb2_grpc,
+    users_pb2,
+    users_pb2_grpc,
+)
+
+logger = logging.getLogger(__name__)
+
+USD_RUB_FIGI = "BBG0013HGFT4"
+USD_RUB_RATE = 92.5
+
+
+def _split(value: float) -> tuple[int, int]:
+    units = int(value)
+    return units, int(round((value - units) * 1e9))
+
+
+def _quotation(value: float):
+    units, nano = _split(value)
+    return common_pb2.Quotation(units=units, nano=nano)
+
+
+def _money(value: float, currency: str = "rub"):
+    units, nano = _split(value)
+    return common_pb2.MoneyValue(currency=currency, units=units, nano=nano)
+
+
+class FakeTInvest:
+    """Portfolio data plus the latency / failure / auth checks for every call."""
+
+    def __init__(
+        self,
+        accounts: int = 2,
+        positions: int = 20,
+        token: str | None = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.token = token
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        rng = random.Random(1)
+        self.prices = {USD_RUB_FIGI: USD_RUB_RATE}
+        self.tickers = {}
+        for i in range(positions):
+            figi = f"FAKE{i:08d}"
+            self.prices[figi] = round(rng.uniform(10, 5_000), 2)
+            self.tickers[figi] = f"T{i:04d}"
+        self.accounts = {
+            f"20000000{n:02d}": {figi: rng.randint(1, 100) for figi in self.tickers}
+            for n in range(accounts)
+        }
+        self.cash_usd = {account: rng.uniform(100, 5_000) for account in self.accounts}
+
+    def check(self, context) -> None:
+        """Apply latency, auth and injected failures to one call."""
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.uniform(0.5, 1.5)
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+        if self.latency > 0:
+            time.sleep(self.latency * jitter)
+        if self.token:
+            metadata = dict(context.invocation_metadata())
+            if metadata.get("authorization") != f"Bearer {self.token}":
+                context.abort(grpc.StatusCode.UNAUTHENTICATED, "40003")
+        if fail:
+            context.abort(grpc.StatusCode.UNAVAILABLE, "injected failure")
+
+    def portfolio(self, account_id: str):
+        holdings = self.accounts.get(account_id, {})
+        has_ticker = (
+            "ticker" in operations_pb2.PortfolioPosition.DESCRIPTOR.fields_by_name
+        )
+        positions = []
+        total_rub = 0.0
+        for figi, quantity in holdings.items():
+            price = self.prices[figi]
+            total_rub += quantity * price
+            position = operations_pb2.PortfolioPosition(
+                figi=figi,
+                instrument_type="share",
+                quantity=_quotation(quantity),
+                current_price=_money(price),
+            )
+            if has_ticker:
+                position.ticker = self.tickers[figi]
+            positions.append(position)
+
+        cash = self.cash_usd.get(account_id, 0.0)
+        positions.append(
+            operations_pb2.PortfolioPosition(
+                figi=USD_RUB_FIGI,
+                instrument_type="currency",
+                quantity=_quotation(cash),
+                current_price=_money(USD_RUB_RATE),
+            )
+        )
+        total_rub += cash * USD_RUB_RATE
+        return operations_pb2.PortfolioResponse(
+            account_id=account_id,
+            total_amount_portfolio=_money(total_rub),
+            positions=positions,
+        )
+
+
+class _Users(users_pb2_grpc.UsersServiceServicer):
+    def __init__(self, data: FakeTInvest):
+        self.data = data
+
+    def GetAccounts(self, request, context):
+        self.data.check(context)
+        return users_pb2.GetAccountsResponse(
+            accounts=[
+                users_pb2.Account(id=account_id, name=f"Fake {n + 1}")
+                for n, account_id in enumerate(self.data.accounts)
+            ]
+        )
+
+
+class _Operations(operations_pb2_grpc.OperationsServiceServicer):
+    def __init__(self, data: FakeTInvest):
+        self.data = data
+
+    def GetPortfolio(self, request, context):
+        self.data.check(context)
+        return self.data.portfolio(request.account_id)
+
+
+class _MarketData(marketdata_pb2_grpc.MarketDataServiceServicer):
+    def __init__(self, data: FakeTInvest):
+        self.data = data
+
+    def GetLastPrices(self, request, context):
+        self.data.check(context)
+        figis = list(request.figi) + list(request.instrument_id)
+        return marketdata_pb2.GetLastPricesResponse(
+            last_prices=[
+                marketdata_pb2.LastPrice(
+                    figi=figi, price=_quotation(self.data.prices[figi])
+                )
+                for figi in figis
+                if figi in self.data.prices
+            ]
+        )
+
+
+def serve_tbank(
+    cert_file: str,
+    key_file: str,
+    host: str = "127.0.0.1",
+    port: int = 8782,
+    workers: int = 8,
+    **kwargs,
+):
+    """Start the T-Invest stand-in; returns (grpc server, FakeTInvest)."""
+    data = FakeTInvest(**kwargs)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    users_pb2_grpc.add_UsersServiceServicer_to_server(_Users(data), server)
+    operations_pb2_grpc.add_OperationsServiceServicer_to_server(
+        _Operations(data), server
+    )
+    marketdata_pb2_grpc.add_MarketDataServiceServicer_to_server(
+        _MarketData(data), server
+    )
+
+    with open(cert_file, "rb") as f:
+        cert = f.read()
+    with open(key_file, "rb") as f:
+        key = f.read()
+    credentials = grpc.ssl_server_credentials([(key, cert)])
+    server.add_secure_port(f"{host}:{port}", credentials)
+    server.start()
+    return server, data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8782)
+    parser.add_argument("--cert", required=True, help="PEM certificate")
+    parser.add_argument("--key", required=True, help="PEM private key")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--positions", type=int, default=20, help="per account")
+    parser.add_argument("--token", help="accept only this API token")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server, _ = serve_tbank(
+        args.cert,
+        args.key,
+        args.host,
+        args.port,
+        accounts=args.accounts,
+        positions=args.positions,
+        token=args.token,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    logger.info(f"Fake T-Invest gRPC on {args.host}:{args.port}")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=1)
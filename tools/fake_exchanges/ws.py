@@ -0,0 +1,126 @@
+"""
+Fake Bybit / OKX private WebSocket server.
+
+    python -m tools.fake_exchanges.ws --port 8765 --interval 1 --drop-after 30
+
+Then run the bot with:
+
+    CRYPTO_STREAMING=true
+    BYBIT_WS_URL=ws://127.0.0.1:8765/bybit
+    OKX_WS_URL=ws://127.0.0.1:8765/okx
+
+Any credentials are accepted. After subscribing, clients receive a random
+walk of equity updates every `interval` seconds; `drop_after` closes each
+connection after that many seconds to exercise reconnect + REST resync.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+
+from websockets.asyncio.server import serve
+
+logger = logging.getLogger(__name__)
+
+
+class FakeStreamServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        interval: float = 1.0,
+        drop_after: float | None = None,
+        start_equity: float = 10_000.0,
+    ):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.drop_after = drop_after
+        self.start_equity = start_equity
+        self.connections = 0
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await serve(self._handle, self.host, self.port)
+        # Port 0 picks a free port; expose the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake stream server on ws://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def url(self, venue: str) -> str:
+        return f"ws://{self.host}:{self.port}/{venue}"
+
+    async def _handle(self, ws) -> None:
+        self.connections += 1
+        venue = "okx" if ws.request.path.startswith("/okx") else "bybit"
+        pusher = None
+        if self.drop_after:
+            asyncio.get_running_loop().call_later(
+                self.drop_after, lambda: asyncio.ensure_future(ws.close())
+            )
+
+        try:
+            async for raw in ws:
+                if raw == "ping":
+                    await ws.send("pong")
+                    continue
+                message = json.loads(raw)
+                op = message.get("op")
+                if op == "ping":
+                    await ws.send(json.dumps({"op": "pong", "success": True}))
+                elif op == "auth":
+                    await ws.send(json.dumps({"op": "auth", "success": True}))
+                elif op == "login":
+                    await ws.send(json.dumps({"event": "login", "code": "0"}))
+                elif op == "subscribe":
+                    if venue == "okx":
+                        reply = {"event": "subscribe", "arg": {"channel": "account"}}
+                    else:
+                        reply = {"op": "subscribe", "success": True}
+                    await ws.send(json.dumps(reply))
+                    if pusher is None:
+                        pusher = asyncio.create_task(self._push(ws, venue))
+        finally:
+            if pusher:
+                pusher.cancel()
+
+    async def _push(self, ws, venue: str) -> None:
+        equity = self.start_equity
+        while True:
+            await asyncio.sleep(self.interval)
+            equity *= 1 + random.uniform(-0.002, 0.002)
+            if venue == "okx":
+                message = {
+                    "arg": {"channel": "account"},
+                    "data": [{"totalEq": f"{equity:.2f}"}],
+                }
+            else:
+                message = {
+                    "topic": "wallet",
+                    "data": [
+                        {"accountType": "UNIFIED", "totalEquity": f"{equity:.2f}"}
+                    ],
+                }
+            await ws.send(json.dumps(message))
+
+
+async def _main(args) -> None:
+    server = FakeStreamServer(args.host, args.port, args.interval, args.drop_after)
+    await server.start()
+    await asyncio.Future()  # run forever
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--drop-after", type=float, default=None)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
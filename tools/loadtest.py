@@ -0,0 +1,267 @@
+"""
+Load test: bursts of synthetic updates through the real TelegramBot handlers.
+
+    python -m tools.loadtest --updates 200 --concurrency 20 --mix status,refresh,history,pie_chart
+
+Everything runs in one process without network access: the stub Bot API
+from tools.webhook_harness answers the bot's requests, the stand-ins from
+tools.fake_exchanges serve Bybit, OKX and IBKR, and the portfolio is a
+throwaway tenant (a group chat) whose history and IBKR cache live in a
+temporary directory. Updates are built as real telegram.Update objects
+(/status, /history, /pie_chart messages and Refresh button taps) and fed
+to Application.process_update, `concurrency` at a time, as a busy group
+chat would.
+
+Reported per update kind and overall: throughput, p50/p95/p99 handler
+latency and event-loop lag (how late a 10 ms ticker wakes up). Lag well
+above a few milliseconds means a handler is blocking the loop; the
+app's loop monitor names the handlers that blocked it for longer than
+LOOP_STALL_SECONDS (stacks are logged at WARNING).
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+from tools.fake_exchanges.flex import serve_flex
+from tools.fake_exchanges.http import serve_exchanges
+from tools.webhook_harness import BOT_USER, BotApiHandler, fake_update
+
+logger = logging.getLogger(__name__)
+
+CHAT_ID = -1001234567890
+LAG_TICK = 0.01
+
+_ids = itertools.count(500_000)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0.0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def _stats(samples: list[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples, default=0.0) * 1000, 2),
+    }
+
+
+def _refresh_tap(chat_id: int) -> dict:
+    """A tap on the Refresh button under an earlier status message."""
+    chat_type = "supergroup" if chat_id < 0 else "private"
+    return {
+        "update_id": next(_ids),
+        "callback_query": {
+            "id": str(next(_ids)),
+            "from": {"id": 42, "is_bot": False, "first_name": "Loadtest"},
+            "chat_instance": "loadtest",
+            "data": "refresh_status",
+            "message": {
+                "message_id": next(_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": chat_type},
+                "from": BOT_USER,
+                "text": "📊 Portfolio",
+            },
+        },
+    }
+
+
+UPDATES = {
+    "status": lambda chat_id: fake_update(chat_id, "/status"),
+    "history": lambda chat_id: fake_update(chat_id, "/history"),
+    "pie_chart": lambda chat_id: fake_update(chat_id, "/pie_chart"),
+    "refresh": _refresh_tap,
+}
+
+
+def _write_history(path: str, days: int = 30) -> None:
+    today = datetime.now()
+    data = {
+        (today - timedelta(days=i)).strftime("%d-%m-%Y"): {
+            "USD": 100_000.0 + i * 10,
+            "RUB": 9_000_000.0 + i * 900,
+        }
+        for i in range(days)
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _configure_env(workdir: str, api_url: str, exchanges_url: str, flex_url: str):
+    """Point the bot at the stubs; must run before app modules are imported."""
+    history_file = os.path.join(workdir, "history.json")
+    _write_history(history_file)
+    tenants_file = os.path.join(workdir, "tenants.json")
+    tenant = {
+        "name": "loadtest",
+        "bybit_accounts": [{"name": "Main", "api_key": "k", "api_secret": "s"}],
+        "okx_accounts": [
+            {"name": "Main", "api_key": "k", "api_secret": "s", "passphrase": "p"}
+        ],
+        "ibkr_flex_token": "loadtest",
+        "ibkr_query_id": "loadtest",
+        "history_file": history_file,
+    }
+    with open(tenants_file, "w", encoding="utf-8") as f:
+        json.dump({str(CHAT_ID): tenant}, f)
+
+    os.environ.update(
+        TELEGRAM_BOT_TOKEN="123456:loadtest",
+        TELEGRAM_CHAT_ID=str(CHAT_ID),
+        TELEGRAM_API_URL=api_url,
+        TENANTS_FILE=tenants_file,
+        BYBIT_REST_URL=exchanges_url,
+        OKX_REST_URL=exchanges_url,
+        IBKR_FLEX_BASE_URL=f"{flex_url}/Universal/servlet",
+        CRYPTO_STREAMING="false",
+        ALERT_RULES="",
+        STATUS_EDIT_INTERVAL_SECONDS="0",
+    )
+
+
+async def _measure_lag(samples: list[float], stop: asyncio.Event) -> None:
+    """Record how late each LAG_TICK sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(LAG_TICK)
+        samples.append(max(0.0, loop.time() - started - LAG_TICK))
+
+
+async def run(args, workdir: str) -> dict:
+    api = ThreadingHTTPServer(("127.0.0.1", 0), BotApiHandler)
+    api.daemon_threads = True
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    exchanges = serve_exchanges(port=0, coins=args.coins, latency=args.latency)
+    flex = serve_flex(port=0, latency=args.latency)
+    api_url = f"http://127.0.0.1:{api.server_address[1]}"
+    _configure_env(workdir, api_url, exchanges.url(), flex.url())
+
+    from telegram import Update
+
+    from app.telegram_client import TelegramBot
+    from app.utils.loop_monitor import get_loop_monitor
+
+    bot = TelegramBot()
+    tenant = bot.tenants.get(CHAT_ID)
+    tenant.aggregator.ibkr.cache_file = os.path.join(workdir, "ibkr_cache.json")
+    application = bot.application
+    await application.initialize()
+
+    kinds = [k.strip() for k in args.mix.split(",") if k.strip()]
+    unknown = set(kinds) - set(UPDATES)
+    if unknown:
+        raise SystemExit(f"Unknown update kinds: {', '.join(sorted(unknown))}")
+
+    latencies = {kind: [] for kind in kinds}
+    lag = []
+    monitor = get_loop_monitor()
+    if monitor:
+        monitor.start()
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_lag(lag, stop))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def fire(kind: str) -> None:
+        update = Update.de_json(UPDATES[kind](CHAT_ID), application.bot)
+        async with semaphore:
+            started = time.perf_counter()
+            await application.process_update(update)
+            latencies[kind].append(time.perf_counter() - started)
+
+    calls_before = len(BotApiHandler.calls)
+    started = time.perf_counter()
+    await asyncio.gather(*(fire(kinds[i % len(kinds)]) for i in range(args.updates)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    stalls = {}
+    if monitor:
+        await monitor.stop()
+        for _, _, handler in monitor.stalls:
+            stalls[handler] = stalls.get(handler, 0) + 1
+
+    await application.shutdown()
+    api.shutdown()
+    exchanges.stop()
+    flex.stop()
+
+    every = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "updates": args.updates,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_second": round(len(every) / wall, 2) if wall else 0.0,
+        "bot_api_calls": len(BotApiHandler.calls) - calls_before,
+        "platform_requests": exchanges.requests + flex.requests,
+        "latency": {
+            "all": _stats(every),
+            **{k: _stats(v) for k, v in latencies.items()},
+        },
+        "loop_lag": _stats(lag),
+        "loop_stalls": stalls,
+    }
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        report = asyncio.run(run(args, workdir))
+
+    print(
+        f"{report['updates']} updates, concurrency {report['concurrency']}: "
+        f"{report['wall_seconds']:.2f}s, {report['throughput_per_second']:.1f} updates/s, "
+        f"{report['bot_api_calls']} Bot API calls, "
+        f"{report['platform_requests']} platform requests"
+    )
+    print(
+        f"{'':<10} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    rows = dict(report["latency"], loop_lag=report["loop_lag"])
+    for name, stats in rows.items():
+        print(
+            f"{name:<10} {stats['count']:>6} {stats['p50_ms']:>9.1f} "
+            f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+        )
+
+    for handler, count in report["loop_stalls"].items():
+        print(f"loop blocked {count}x in {handler}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--mix",
+        default="status,refresh,history,pie_chart",
+        help="comma-separated update kinds, sent round-robin",
+    )
+    parser.add_argument("--coins", type=int, default=20)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="stand-in latency (seconds)"
+    )
+    parser.add_argument("--output", help="also write the report as JSON")
+    logging.basicConfig(level=logging.WARNING)
+    main(parser.parse_args())
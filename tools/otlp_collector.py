@@ -0,0 +1,169 @@
+"""
+Local stand-in for an OpenTelemetry collector (OTLP/HTTP, JSON encoding).
+
+    python -m tools.otlp_collector --port 4318 --output spans.jsonl
+
+Start the bot with OTLP_ENDPOINT=http://127.0.0.1:4318. Every batch it
+posts to /v1/traces is acknowledged, each trace is printed as an indented
+span tree with durations, retries and other span events, and with
+--output every span is appended to a JSON-lines file. Protobuf-encoded
+requests are rejected with 415: the bot only sends JSON.
+"""
+
+import argparse
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+def _attributes(items: list) -> dict:
+    """OTLP key/value list to a plain dict."""
+    result = {}
+    for item in items or []:
+        value = item.get("value", {})
+        result[item["key"]] = next(iter(value.values()), None) if value else None
+    return result
+
+
+def _flatten(payload: dict) -> list[dict]:
+    """Spans of an ExportTraceServiceRequest with attributes as dicts."""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        resource = _attributes(resource_spans.get("resource", {}).get("attributes"))
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                spans.append(
+                    {
+                        "service": resource.get("service.name"),
+                        "trace_id": span["traceId"],
+                        "span_id": span["spanId"],
+                        "parent_id": span.get("parentSpanId") or None,
+                        "name": span["name"],
+                        "start_ns": int(span["startTimeUnixNano"]),
+                        "end_ns": int(span["endTimeUnixNano"]),
+                        "attributes": _attributes(span.get("attributes")),
+                        "events": [
+                            {"name": e["name"], **_attributes(e.get("attributes"))}
+                            for e in span.get("events", [])
+                        ],
+                        "error": span.get("status", {}).get("message"),
+                    }
+                )
+    return spans
+
+
+def format_tree(spans: list[dict]) -> str:
+    """One trace's spans as an indented tree, children in start order."""
+    children = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+    ids = {span["span_id"] for span in spans}
+    # Spans whose parent is missing (not exported yet) are shown as roots too
+    roots = [s for s in spans if s["parent_id"] is None or s["parent_id"] not in ids]
+    lines = []
+
+    def walk(span, depth):
+        ms = (span["end_ns"] - span["start_ns"]) / 1e6
+        attributes = {
+            k: v
+            for k, v in span["attributes"].items()
+            if k not in ("thread.name", "chat_id")
+        }
+        line = f"{'  ' * depth}{span['name']:<{40 - 2 * depth}} {ms:>9.1f} ms"
+        if attributes:
+            line += "  " + " ".join(f"{k}={v}" for k, v in attributes.items())
+        for event in span["events"]:
+            line += f"  [{event['name']}]"
+        if span["error"]:
+            line += f"  ERROR {span['error']}"
+        lines.append(line)
+        for child in sorted(
+            children.get(span["span_id"], []), key=lambda s: s["start_ns"]
+        ):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s["start_ns"]):
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    """Accepts OTLP/HTTP JSON trace exports."""
+
+    spans = []  # every span received, flattened
+    output = None  # path of the JSON-lines file, if any
+    quiet = False
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/v1/traces":
+            self.send_error(404)
+            return
+        if not self.headers.get("Content-Type", "").startswith("application/json"):
+            self.send_error(415, "Only the JSON encoding is supported")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            spans = _flatten(json.loads(self.rfile.read(length) or b"{}"))
+        except (ValueError, KeyError) as e:
+            self.send_error(400, f"Malformed export request: {e}")
+            return
+
+        with self._lock:
+            self.spans.extend(spans)
+            if self.output:
+                with open(self.output, "a", encoding="utf-8") as f:
+                    for span in spans:
+                        f.write(json.dumps(span) + "\n")
+        if not self.quiet:
+            traces = {}
+            for span in spans:
+                traces.setdefault(span["trace_id"], []).append(span)
+            for trace_id, trace_spans in traces.items():
+                print(f"--- trace {trace_id} ({len(trace_spans)} spans)")
+                print(format_tree(trace_spans))
+
+        body = b"{}"  # ExportTraceServiceResponse without partial_success
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve_collector(
+    host: str = "127.0.0.1", port: int = 4318, output: str | None = None, quiet=False
+) -> ThreadingHTTPServer:
+    """Start the collector in a daemon thread; received spans are in `.spans`."""
+    handler = type(
+        "Collector",
+        (CollectorHandler,),
+        {"spans": [], "output": output, "quiet": quiet},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.spans = handler.spans
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", help="append received spans to this JSONL file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = serve_collector(args.host, args.port, args.output)
+    logger.info(f"OTLP collector on http://{args.host}:{args.port}/v1/traces")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
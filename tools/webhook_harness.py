@@ -0,0 +1,181 @@
+"""
+Offline test harness for webhook mode.
+
+    python -m tools.webhook_harness --chat-id 123456789 /status /pie_chart
+
+Runs a stub Bot API server (default :8081) and posts fake updates to the
+bot's webhook. Start the bot against it with:
+
+    TELEGRAM_API_URL=http://127.0.0.1:8081
+    WEBHOOK_URL=http://127.0.0.1:8443
+    WEBHOOK_SECRET_TOKEN=harness-secret
+
+The stub answers every Bot API method with a plausible result and prints
+what the bot sent back. Each update is posted with the
+X-Telegram-Bot-Api-Secret-Token header; one extra request with a wrong
+token checks that the webhook rejects it (403).
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Harness", "username": "harness_bot"}
+
+_ids = itertools.count(1000)
+
+
+class BotApiHandler(BaseHTTPRequestHandler):
+    """Minimal Bot API: every method succeeds; replies are recorded."""
+
+    calls = []  # (monotonic time, method, params)
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            params = json.loads(body or b"{}")
+        elif content_type.startswith("application/x-www-form-urlencoded"):
+            params = dict(parse_qsl(body.decode()))
+        else:
+            params = {"<multipart>": f"{len(body)} bytes"}
+        self.calls.append((time.monotonic(), method, params))
+
+        result = self._result(method, params)
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    @staticmethod
+    def _result(method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method.startswith(("send", "edit")):
+            chat_id = params.get("chat_id", 0)
+            return {
+                "message_id": next(_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def fake_update(chat_id: int, text: str) -> dict:
+    update_id = next(_ids)
+    chat_type = "supergroup" if chat_id < 0 else "private"
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": chat_type},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Harness"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [
+            {"type": "bot_command", "offset": 0, "length": len(command)}
+        ]
+    return {"update_id": update_id, "message": message}
+
+
+def post_update(url: str, secret: str, update: dict) -> int:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode(),
+        headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": secret,
+        },
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main(args) -> None:
+    api = ThreadingHTTPServer(("127.0.0.1", args.api_port), BotApiHandler)
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    logger.info(f"Stub Bot API on http://127.0.0.1:{args.api_port}")
+
+    if args.wait:
+        input("Start the bot against the stub, then press Enter to post updates…")
+
+    status = post_update(
+        args.webhook, "wrong-secret", fake_update(args.chat_id, "/help")
+    )
+    print(
+        f"wrong secret token -> HTTP {status} ({'ok' if status == 403 else 'UNEXPECTED'})"
+    )
+
+    for text in args.commands:
+        seen = len(BotApiHandler.calls)
+        started = time.monotonic()
+        status = post_update(args.webhook, args.secret, fake_update(args.chat_id, text))
+        print(
+            f"{text!r} -> HTTP {status} in {(time.monotonic() - started) * 1000:.0f} ms"
+        )
+
+        # Report the bot's first reply, i.e. the latency the user perceives
+        deadline = started + args.timeout
+        while time.monotonic() < deadline:
+            replies = [
+                c
+                for c in BotApiHandler.calls[seen:]
+                if c[1].startswith(("send", "edit"))
+            ]
+            if replies:
+                at, method, params = replies[0]
+                preview = str(params.get("text", ""))[:60].replace("\n", " ")
+                print(
+                    f"  first reply {method} after {(at - started) * 1000:.0f} ms: {preview}"
+                )
+                break
+            time.sleep(0.01)
+        else:
+            print(f"  no reply within {args.timeout:.0f}s")
+
+    if args.linger:
+        time.sleep(args.linger)
+    api.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("commands", nargs="*", default=["/help", "/status"])
+    parser.add_argument("--chat-id", type=int, required=True)
+    parser.add_argument("--webhook", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", default="harness-secret")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="pause before posting so the bot can be started against the stub",
+    )
+    parser.add_argument(
+        "--linger", type=float, default=0.0, help="keep the stub API up this long"
+    )
+    logging.basicConfig(level=logging.INFO)
+    main(parser.parse_args())